@@ -0,0 +1,59 @@
+"""add availability indexes
+
+Revision ID: 5c1e8f0a7d42
+Revises: 9da85c0c28d9
+Create Date: 2026-10-17 10:12:40.118305
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e8f0a7d42"
+down_revision: str | Sequence[str] | None = "9da85c0c28d9"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+LIVE_BATCHES = "NOT is_deleted AND volume_liters > 0"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_batches_live_expiry",
+        "batches",
+        ["expiry", "id"],
+        unique=False,
+        postgresql_where=sa.text(LIVE_BATCHES),
+        sqlite_where=sa.text(LIVE_BATCHES),
+    )
+    op.create_index(
+        "ix_consumption_records_batch_id_consumed_at",
+        "consumption_records",
+        ["batch_id", "consumed_at"],
+        unique=False,
+    )
+    # batch_id is the leading column of the new index
+    op.drop_index(
+        op.f("ix_consumption_records_batch_id"),
+        table_name="consumption_records",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        op.f("ix_consumption_records_batch_id"),
+        "consumption_records",
+        ["batch_id"],
+        unique=False,
+    )
+    op.drop_index(
+        "ix_consumption_records_batch_id_consumed_at",
+        table_name="consumption_records",
+    )
+    op.drop_index("ix_batches_live_expiry", table_name="batches")
@@ -0,0 +1,56 @@
+"""add volume ledger
+
+Revision ID: 7e4b2d9c1a36
+Revises: 5c1e8f0a7d42
+Create Date: 2026-10-17 21:05:12.402117
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7e4b2d9c1a36"
+down_revision: str | Sequence[str] | None = "5c1e8f0a7d42"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "batches",
+        sa.Column(
+            "ledger_seq",
+            sa.Integer(),
+            nullable=False,
+            server_default=sa.text("0"),
+        ),
+    )
+    op.add_column(
+        "consumption_records", sa.Column("seq", sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        "consumption_records",
+        sa.Column("balance", sa.Float(), nullable=True),
+    )
+    op.create_index(
+        "ux_consumption_records_batch_id_seq",
+        "consumption_records",
+        ["batch_id", "seq"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ux_consumption_records_batch_id_seq",
+        table_name="consumption_records",
+    )
+    op.drop_column("consumption_records", "balance")
+    op.drop_column("consumption_records", "seq")
+    op.drop_column("batches", "ledger_seq")
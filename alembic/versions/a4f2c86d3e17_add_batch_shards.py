@@ -0,0 +1,39 @@
+"""add batch shards
+
+Revision ID: a4f2c86d3e17
+Revises: 7e4b2d9c1a36
+Create Date: 2026-10-17 23:12:40.118532
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a4f2c86d3e17"
+down_revision: str | Sequence[str] | None = "7e4b2d9c1a36"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "batch_shards",
+        sa.Column("batch_id", sa.Integer(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("volume_liters", sa.Float(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["batch_id"], ["batches.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("batch_id", "shard"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("batch_shards")
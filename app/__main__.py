@@ -1,15 +1,80 @@
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Any
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.openapi.utils import get_openapi
+from starlette.concurrency import run_in_threadpool
 
 from app.api.admin_endpoints import router as admin_router
 from app.api.batch_endpoints import router as batch_router
+from app.api.metrics_endpoints import router as metrics_router
+from app.config.dependency_injection import (
+    get_audit_writer,
+    get_ledger_compactor,
+    get_settings_cached,
+)
+from app.observability.middleware import RequestMetricsMiddleware
+from app.observability.pool import async_warm_up, warm_up
+from app.observability.profiling import ProfilingMiddleware
+from app.repositories.db.session import (
+    async_engine,
+    async_read_engine,
+    engine,
+    read_engine,
+)
 
-app = FastAPI()
+settings = get_settings_cached()
+logger = logging.getLogger(__name__)
+
+
+async def warm_up_pool() -> None:
+    """Connect the pools up to their size before the first request."""
+    try:
+        # Without a replica the read engine is the primary one
+        if settings.env == "db":
+            for pool_engine in {engine, read_engine}:
+                await run_in_threadpool(
+                    warm_up, pool_engine, settings.db_pool_size
+                )
+        elif settings.env == "async_db":
+            for pool_engine in {async_engine, async_read_engine}:
+                await async_warm_up(pool_engine, settings.db_pool_size)
+    except Exception:
+        # Start anyway: the pool connects on demand, as without warm-up
+        logger.exception("connection pool warm-up failed")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    if settings.db_pool_warm_up:
+        await warm_up_pool()
+    compactor = get_ledger_compactor()
+    if compactor is not None:
+        compactor.start()
+    yield
+    if compactor is not None:
+        await compactor.stop()
+    writer = get_audit_writer()
+    if writer is not None:
+        # Records acknowledged without waiting are still in the queue
+        await writer.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(batch_router)
 app.include_router(admin_router)
+if settings.metrics_enabled:
+    app.add_middleware(RequestMetricsMiddleware)
+    app.include_router(metrics_router)
+if settings.profiling_enabled:
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=settings.profiling_dir,
+        sample_rate=settings.profiling_sample_rate,
+    )
 
 
 def custom_openapi() -> dict[str, Any]:
@@ -1,11 +1,51 @@
-from fastapi import APIRouter
+from datetime import UTC, datetime
+from typing import Annotated, Literal
 
-from app.config.dependency_injection import AdminServiceDep
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.dispatch import call_service
+from app.api.json_response import (
+    BATCH_LIST,
+    RECORD_LIST,
+    json_list_response,
+)
+from app.api.streaming import (
+    EXPORT_FORMATS,
+    encode_record_chunks,
+    json_array,
+)
+from app.config.dependency_injection import (
+    AdminServiceDep,
+    BatchRepoDep,
+    get_settings_cached,
+)
+from app.observability.pool import pool_stats
+from app.repositories.cached_batch_repo import (
+    AsyncCachedBatchRepository,
+    CachedBatchRepository,
+)
+from app.repositories.db.session import (
+    async_engine,
+    async_read_engine,
+    engine,
+    read_engine,
+)
 from app.schemas.batches_schema import Batch
 from app.schemas.consumption_record import ConsumptionRecord
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 1000
+NEXT_AFTER_HEADER = "X-Next-After"
+
+
+def _next_after(page: list, limit: int) -> dict[str, str]:
+    # A full page means there may be more; the last id is the next cursor
+    if len(page) == limit:
+        return {NEXT_AFTER_HEADER: str(page[-1].id)}
+    return {}
+
 
 @router.get(
     "/admin/records",
@@ -13,8 +53,74 @@ router = APIRouter()
 )
 async def list_all_records(
     service: AdminServiceDep,
+    request: Request,
+    limit: int | None = Query(
+        default=None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Page size; omit to stream every record",
+    ),
+    after: int | None = Query(
+        default=None, ge=0, description="Return records with id > after"
+    ),
 ) -> list[ConsumptionRecord]:
-    return service.list_all_consumption_recors()
+    """
+    Without `limit` the whole table is streamed as a JSON array from a
+    server-side cursor. With `limit` one keyset page is returned and, if
+    it is full, the `X-Next-After` header carries the cursor for the next.
+    """
+    if limit is None:
+        return StreamingResponse(
+            json_array(service.iter_consumption_records()),
+            media_type="application/json",
+        )
+    page = await call_service(
+        service.list_consumption_records_page, limit=limit, after=after
+    )
+    return await json_list_response(
+        request, page, RECORD_LIST, headers=_next_after(page, limit)
+    )
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    # Naive query params are taken as UTC, like the schema validators do
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=UTC)
+
+
+@router.get("/admin/records/export")
+async def export_records(
+    service: AdminServiceDep,
+    export_format: Literal["ndjson", "csv"] = Query(
+        default="ndjson", alias="format"
+    ),
+    since: Annotated[
+        datetime | None, Query(description="consumed_at >= since")
+    ] = None,
+    until: Annotated[
+        datetime | None, Query(description="consumed_at < until")
+    ] = None,
+    batch_id: int | None = None,
+) -> StreamingResponse:
+    """
+    Stream the consumption audit trail as NDJSON or CSV. Rows are read in
+    fixed-size chunks from a server-side cursor and encoded directly to
+    bytes, so memory use does not depend on the size of the export.
+    """
+    media_type = EXPORT_FORMATS[export_format][0]
+    chunks = service.export_consumption_records(
+        _as_utc(since), _as_utc(until), batch_id
+    )
+    return StreamingResponse(
+        encode_record_chunks(chunks, export_format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename=consumption_records.{export_format}"
+            )
+        },
+    )
 
 
 @router.get(
@@ -23,5 +129,59 @@ async def list_all_records(
 )
 async def list_all_batches(
     service: AdminServiceDep,
+    request: Request,
+    limit: int | None = Query(
+        default=None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Page size; omit to stream every batch",
+    ),
+    after: int | None = Query(
+        default=None, ge=0, description="Return batches with id > after"
+    ),
 ) -> list[Batch]:
-    return service.list_all_batches()
+    """Same contract as /admin/records, including deleted batches."""
+    if limit is None:
+        return StreamingResponse(
+            json_array(service.iter_batches()),
+            media_type="application/json",
+        )
+    page = await call_service(
+        service.list_batches_page, limit=limit, after=after
+    )
+    return await json_list_response(
+        request, page, BATCH_LIST, headers=_next_after(page, limit)
+    )
+
+
+@router.get("/admin/cache/batches")
+async def batch_cache_stats(batch_repo: BatchRepoDep) -> dict[str, int]:
+    """Hit/miss/eviction counters of the batch read cache (this worker)."""
+    if not isinstance(
+        batch_repo, CachedBatchRepository | AsyncCachedBatchRepository
+    ):
+        raise HTTPException(404, "Batch cache is disabled")
+    return batch_repo.cache.stats()
+
+
+@router.get("/admin/pool")
+async def pool_health() -> dict[str, float | dict[str, float]]:
+    """
+    Connections checked in, checked out and in overflow, and checkout
+    waits and timeouts of the database pool (this worker); those of the
+    read replica's pool, if there is one, under "replica".
+    """
+    env = get_settings_cached().env
+    if env == "db":
+        stats = pool_stats(engine, "sync")
+        if read_engine is not engine:
+            stats["replica"] = pool_stats(read_engine, "sync_read")
+        return stats
+    if env == "async_db":
+        stats = pool_stats(async_engine.sync_engine, "async")
+        if async_read_engine is not async_engine:
+            stats["replica"] = pool_stats(
+                async_read_engine.sync_engine, "async_read"
+            )
+        return stats
+    raise HTTPException(404, "No database pool in this mode")
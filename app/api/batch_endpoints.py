@@ -1,11 +1,28 @@
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from pydantic import BaseModel, Field
+from sqlalchemy.exc import OperationalError
 
+from app.api.dispatch import call_service
+from app.api.json_response import BATCH_LIST, json_list_response
 from app.config.dependency_injection import BatchServiceDep
+from app.domain.batch_port import ConcurrencyError
+from app.domain.batch_service import (
+    FefoShortfallError,
+    InsufficientVolumeError,
+    ResourceNotFoundError,
+)
 from app.schemas.batches_schema import Batch
+from app.schemas.bulk_schema import BulkCreateResult
+from app.schemas.consumption_record import (
+    ORDER_ID_PATTERN,
+    ConsumptionRecord,
+)
 
 router = APIRouter()
 
+# Conflicts clear within the retry policy's max delay; ask for a short wait
+RETRY_AFTER = {"Retry-After": "1"}
+
 
 # Request body for POST /api/batches/{id}/consume
 class ConsumeRequest(BaseModel):
@@ -13,7 +30,18 @@ class ConsumeRequest(BaseModel):
         ...,
         ge=0,
     )
-    order_id: str | None = None
+    order_id: str | None = Field(default=None, pattern=ORDER_ID_PATTERN)
+
+
+# Request body for POST /api/batches/consume
+class FefoConsumeRequest(BaseModel):
+    qty: float = Field(
+        ...,
+        gt=0,
+    )
+    order_id: str | None = Field(default=None, pattern=ORDER_ID_PATTERN)
+    min_fat_percent: float | None = Field(default=None, ge=0, le=100)
+    max_fat_percent: float | None = Field(default=None, ge=0, le=100)
 
 
 @router.post(
@@ -25,7 +53,33 @@ async def create(
     request: Batch,
     service: BatchServiceDep,
 ) -> Batch:
-    return service.create(request)
+    return await call_service(service.create, request)
+
+
+@router.post(
+    "/api/batches/bulk",
+    response_model=BulkCreateResult,
+    status_code=status.HTTP_200_OK,
+)
+async def create_bulk(
+    request: list[Batch],
+    service: BatchServiceDep,
+) -> BulkCreateResult:
+    """
+    Register a truckload manifest of batches in one transaction.
+    Items whose batch_code is repeated or already stored are listed in
+    `errors` (with their manifest index); all others are created.
+    409 with Retry-After if concurrent inserts of the same codes kept
+    winning.
+    """
+    try:
+        return await call_service(service.create_many, request)
+    except ConcurrencyError as error:
+        raise HTTPException(
+            409,
+            "Batch codes are being inserted concurrently, try again later",
+            headers=RETRY_AFTER,
+        ) from error
 
 
 @router.get(
@@ -34,8 +88,54 @@ async def create(
 )
 async def list_all(
     service: BatchServiceDep,
+    request: Request,
 ) -> list[Batch]:
-    return service.list_all()
+    batches = await call_service(service.list_all)
+    return await json_list_response(request, batches, BATCH_LIST)
+
+
+@router.post(
+    "/api/batches/consume",
+    response_model=list[ConsumptionRecord],
+    status_code=status.HTTP_200_OK,
+)
+async def consume_fefo(
+    request: FefoConsumeRequest,
+    service: BatchServiceDep,
+) -> list[ConsumptionRecord]:
+    """
+    Consume an order's quantity across batches, first-expiry-first-out.
+    Returns one consumption record per batch drawn from; 409 if the
+    matching batches cannot cover the quantity (nothing is consumed).
+
+    Body example:
+    {
+        "qty": 2500,
+        "order_id": "ORDER-20251204-1234",
+        "min_fat_percent": 3.0
+    }
+    """
+    try:
+        return await call_service(
+            service.consume_fefo,
+            qty=request.qty,
+            order_id=request.order_id,
+            min_fat_percent=request.min_fat_percent,
+            max_fat_percent=request.max_fat_percent,
+        )
+    except FefoShortfallError as error:
+        raise HTTPException(409, str(error)) from error
+    except ConcurrencyError as error:
+        raise HTTPException(
+            409,
+            "Batches are being consumed concurrently, try again later",
+            headers=RETRY_AFTER,
+        ) from error
+    except OperationalError as error:
+        # Lock or busy timeout in the database: transient
+        raise HTTPException(
+            503, "Batches are locked, try again later", headers=RETRY_AFTER
+        ) from error
 
 
 @router.get(
@@ -44,10 +144,12 @@ async def list_all(
 )
 async def list_near_expiry(
     service: BatchServiceDep,
+    request: Request,
     n_days: int = Query(ge=1, description="Number of days until expiry"),
 ) -> list[Batch]:
     """List batches that will expire within the next n_days."""
-    return service.list_near_expiry(n_days=n_days)
+    batches = await call_service(service.list_near_expiry, n_days=n_days)
+    return await json_list_response(request, batches, BATCH_LIST)
 
 
 @router.get(
@@ -59,7 +161,7 @@ async def read_by_id(
     service: BatchServiceDep,
 ) -> Batch:
     try:
-        batch = service.read_by_id(id)
+        batch = await call_service(service.read_by_id, id)
     except Exception as error:
         raise HTTPException(404, f"Batch {id} not found") from error
     return batch
@@ -78,21 +180,36 @@ async def consume(
     """
     Safely consume liters from a batch.
 
+    404 if the batch is not available, 409 if it holds less than qty or
+    if concurrent updates kept winning until the retry policy gave up,
+    503 on a database lock timeout; the last two carry Retry-After.
+
     Body example:
     {
         "qty": 10.5,
-        "order_id": "ORD-12345"
+        "order_id": "ORDER-20251204-1234"
     }
     """
     try:
-        return service.consume(
+        return await call_service(
+            service.consume,
             batch_id=id,
             qty=request.qty,
             order_id=request.order_id,
         )
-    except Exception as error:
+    except ResourceNotFoundError as error:
+        raise HTTPException(404, f"Batch {id} not found") from error
+    except InsufficientVolumeError as error:
+        raise HTTPException(409, str(error)) from error
+    except ConcurrencyError as error:
+        raise HTTPException(
+            409,
+            f"Batch {id} is being updated concurrently, try again later",
+            headers=RETRY_AFTER,
+        ) from error
+    except OperationalError as error:
         raise HTTPException(
-            500, f"Batch {id} is locked, try again later"
+            503, f"Batch {id} is locked, try again later", headers=RETRY_AFTER
         ) from error
 
 
@@ -108,4 +225,4 @@ async def delete(
     Soft-delete a batch by id.
     Returns 204 No Content on success.
     """
-    service.delete(id)
+    await call_service(service.delete, id)
@@ -0,0 +1,16 @@
+import inspect
+from collections.abc import Callable
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+
+async def call_service(method: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Call a service method from an async endpoint without blocking the loop.
+    Async services are awaited directly; synchronous services (in-memory or
+    SessionLocal-backed) are pushed to the threadpool.
+    """
+    if inspect.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+    return await run_in_threadpool(method, *args, **kwargs)
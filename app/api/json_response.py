@@ -0,0 +1,89 @@
+import gzip
+from collections.abc import Sequence
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+
+from app.config.dependency_injection import get_settings_cached
+from app.schemas.batches_schema import Batch
+from app.schemas.consumption_record import ConsumptionRecord
+
+try:
+    import brotli
+except ImportError:  # optional extra: without it only gzip is offered
+    brotli = None
+
+BATCH_LIST = TypeAdapter(list[Batch])
+RECORD_LIST = TypeAdapter(list[ConsumptionRecord])
+INLINE_ROWS = 500  # larger lists are encoded in the threadpool
+# Fastest settings: on these bodies higher levels gain <10% for 2-5x CPU
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 1
+
+
+def _accepted_encoding(accept_encoding: str) -> str | None:
+    """Pick br or gzip from an Accept-Encoding header (q=0 means no)."""
+    offered = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00"):
+            offered.add(coding.strip().lower())
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+def encode_list(
+    rows: Sequence,
+    adapter: TypeAdapter,
+    encoding: str | None = None,
+    min_bytes: int = 0,
+) -> tuple[bytes, str | None]:
+    """
+    Serialize rows once, straight to bytes, and compress the body with
+    `encoding` if it is at least min_bytes long. Returns the body and the
+    content coding actually applied.
+    """
+    body = adapter.dump_json(rows)
+    if encoding is None or len(body) < min_bytes:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY), encoding
+    return gzip.compress(body, compresslevel=GZIP_LEVEL), encoding
+
+
+async def json_list_response(
+    request: Request,
+    rows: Sequence,
+    adapter: TypeAdapter,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """
+    JSON response for a list the service already produced as schemas.
+
+    Skips FastAPI's response_model round trip (validate, then serialize
+    through jsonable data); the endpoint keeps its response_model for the
+    OpenAPI schema. With response compression enabled, bodies over the
+    threshold are sent as br or gzip when the client accepts it.
+    """
+    min_bytes = get_settings_cached().response_compression_min_bytes
+    encoding = None
+    if min_bytes > 0:
+        encoding = _accepted_encoding(
+            request.headers.get("accept-encoding", "")
+        )
+    if len(rows) > INLINE_ROWS:
+        body, encoding = await run_in_threadpool(
+            encode_list, rows, adapter, encoding, min_bytes
+        )
+    else:
+        body, encoding = encode_list(rows, adapter, encoding, min_bytes)
+    response = Response(body, media_type="application/json", headers=headers)
+    if min_bytes > 0:
+        response.headers["Vary"] = "Accept-Encoding"
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Response
+
+from app.observability.metrics import REGISTRY
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Prometheus scrape endpoint (values are per worker process)."""
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Iterator, Sequence
+from datetime import UTC, datetime
+
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool
+
+from app.domain.record_port import RECORD_EXPORT_COLUMNS, RecordRow
+
+FLUSH_BYTES = 64 * 1024  # coalesce rows into chunks of roughly this size
+
+
+async def json_array(
+    rows: Iterator[BaseModel] | AsyncIterator[BaseModel],
+) -> AsyncIterator[bytes]:
+    """
+    Encode rows as one JSON array, chunk by chunk, as they are produced.
+    Synchronous iterators (which may hold a DB cursor) are advanced in the
+    threadpool so the event loop is never blocked.
+    """
+    if isinstance(rows, Iterator):
+        rows = iterate_in_threadpool(rows)
+    buffer = bytearray(b"[")
+    first = True
+    async for row in rows:
+        if not first:
+            buffer += b","
+        first = False
+        buffer += row.__pydantic_serializer__.to_json(row)
+        if len(buffer) >= FLUSH_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b"]"
+    yield bytes(buffer)
+
+
+def _utc_iso(value: datetime) -> str:
+    # Same wire format as the API schemas: UTC, "Z" suffix
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.astimezone(UTC).isoformat().replace("+00:00", "Z")
+
+
+def _ndjson_chunk(rows: Sequence[RecordRow]) -> bytes:
+    dumps = json.dumps
+    return "".join(
+        f'{{"id":{id_},"batch_id":{batch_id},'
+        f'"consumed_at":"{_utc_iso(consumed_at)}",'
+        f'"order_id":{dumps(order_id)},"qty":{dumps(qty)}}}\n'
+        for id_, batch_id, consumed_at, order_id, qty in rows
+    ).encode()
+
+
+def _csv_chunk(rows: Sequence[RecordRow]) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerows(
+        (id_, batch_id, _utc_iso(consumed_at), order_id or "", qty)
+        for id_, batch_id, consumed_at, order_id, qty in rows
+    )
+    return out.getvalue().encode()
+
+
+EXPORT_FORMATS = {
+    # format -> (media type, header line, chunk encoder)
+    "ndjson": ("application/x-ndjson", b"", _ndjson_chunk),
+    "csv": (
+        "text/csv",
+        ",".join(RECORD_EXPORT_COLUMNS).encode() + b"\n",
+        _csv_chunk,
+    ),
+}
+
+
+async def encode_record_chunks(
+    chunks: Iterator[Sequence[RecordRow]] | AsyncIterator[Sequence[RecordRow]],
+    export_format: str,
+) -> AsyncIterator[bytes]:
+    """
+    Encode consumption record tuples straight to NDJSON or CSV bytes, one
+    cursor chunk at a time (no Pydantic models in between).
+    """
+    _, header, encode = EXPORT_FORMATS[export_format]
+    if header:
+        yield header
+    if isinstance(chunks, Iterator):
+        chunks = iterate_in_threadpool(chunks)
+    async for rows in chunks:
+        yield encode(rows)
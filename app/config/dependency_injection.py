@@ -1,17 +1,57 @@
-from functools import lru_cache
+from collections.abc import AsyncIterator
+from contextlib import nullcontext
+from functools import lru_cache, partial
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Request
+from starlette.concurrency import run_in_threadpool
 
 from app.config.settings import Settings
-from app.domain.admin_service import AdminService
-from app.domain.batch_port import BatchPort
-from app.domain.batch_service import BatchService
-from app.domain.record_port import RecordPort
+from app.domain.admin_service import AdminService, AsyncAdminService
+from app.domain.batch_port import AsyncBatchPort, BatchPort
+from app.domain.batch_service import AsyncBatchService, BatchService
+from app.domain.consume_combiner import AsyncConsumeCombiner, ConsumeCombiner
+from app.domain.record_port import AsyncRecordPort, RecordPort
+from app.domain.retry_policy import RetryPolicy
+from app.repositories.async_db_batch_repo import AsyncDBBatchRepository
+from app.repositories.async_db_record_repo import AsyncDBRecordRepository
+from app.repositories.async_ledger_batch_repo import AsyncLedgerBatchRepository
+from app.repositories.async_sharded_batch_repo import (
+    AsyncShardedBatchRepository,
+)
 from app.repositories.batch_repository import BatchRepository
+from app.repositories.buffered_record_repo import (
+    AsyncAuditWriter,
+    AsyncBufferedRecordRepository,
+    AuditWriter,
+    BufferedRecordRepository,
+)
+from app.repositories.cached_batch_repo import (
+    AsyncCachedBatchRepository,
+    BatchCache,
+    CachedBatchRepository,
+)
+from app.repositories.db.session import AsyncReadSessionLocal, ReadSessionLocal
+from app.repositories.db.unit_of_work import (
+    async_request_unit_of_work,
+    read_from_primary,
+    request_unit_of_work,
+    unit_of_work,
+)
 from app.repositories.db_batch_repo import DBBatchRepository
 from app.repositories.db_record_repo import DBRecordRepository
+from app.repositories.ledger_batch_repo import (
+    LedgerBatchRepository,
+    LedgerCompactor,
+)
+from app.repositories.near_expiry_view import (
+    AsyncNearExpiryBatchRepository,
+    NearExpiryBatchRepository,
+    NearExpiryView,
+)
 from app.repositories.record_repository import RecordRepository
+from app.repositories.sharded_batch_repo import ShardedBatchRepository
+from app.repositories.timed_repo import TimedRepository
 
 
 @lru_cache
@@ -19,45 +59,239 @@ def get_settings_cached() -> Settings:
     return Settings()
 
 
+# env -> (plain, ledger mode, sharded mode) batch repository
+_DB_BATCH_REPOS = {
+    "db": (
+        DBBatchRepository,
+        LedgerBatchRepository,
+        ShardedBatchRepository,
+    ),
+    "async_db": (
+        AsyncDBBatchRepository,
+        AsyncLedgerBatchRepository,
+        AsyncShardedBatchRepository,
+    ),
+}
+
+
+def _make_batch_repo(settings: Settings) -> BatchPort | AsyncBatchPort:
+    if settings.env not in _DB_BATCH_REPOS:
+        return BatchRepository(get_record_repo_singleton())
+    plain, ledger, sharded = _DB_BATCH_REPOS[settings.env]
+    if settings.ledger_enabled:
+        return ledger(fefo_lock=settings.fefo_lock)
+    if settings.batch_shards > 1:
+        return sharded(
+            fefo_lock=settings.fefo_lock,
+            shards=settings.batch_shards,
+            min_liters=settings.batch_shard_min_liters,
+        )
+    return plain(fefo_lock=settings.fefo_lock)
+
+
 @lru_cache
-def get_batch_repo_singleton() -> BatchPort:
+def get_batch_repo_singleton() -> BatchPort | AsyncBatchPort:
     settings = get_settings_cached()
-    if settings.env == "dev":
-        return BatchRepository()
+    repo = _make_batch_repo(settings)
+    if settings.metrics_enabled:
+        # Time the storage itself; cache and view hits are request latency
+        repo = TimedRepository(repo)
+    if settings.near_expiry_view_enabled:
+        view = NearExpiryView(settings.near_expiry_refresh_seconds)
+        if settings.env == "async_db":
+            repo = AsyncNearExpiryBatchRepository(repo, view)
+        else:
+            repo = NearExpiryBatchRepository(repo, view)
+    if not settings.batch_cache_enabled:
+        return repo
+    cache = BatchCache(
+        settings.batch_cache_size, settings.batch_cache_ttl_seconds
+    )
+    if settings.env == "async_db":
+        return AsyncCachedBatchRepository(repo, cache)
+    return CachedBatchRepository(repo, cache)
+
+
+@lru_cache
+def get_ledger_compactor() -> LedgerCompactor | None:
+    """Background snapshots for ledger mode, on a repository of its own."""
+    settings = get_settings_cached()
+    if not settings.ledger_enabled:
+        return None
     if settings.env == "db":
-        return DBBatchRepository()
-    return BatchRepository()
+        repo = LedgerBatchRepository()
+        compact = partial(run_in_threadpool, repo.compact)
+    elif settings.env == "async_db":
+        compact = AsyncLedgerBatchRepository().compact
+    else:
+        return None
+    return LedgerCompactor(compact, settings.ledger_snapshot_interval_seconds)
 
 
-BatchRepoDep = Annotated[BatchPort, Depends(get_batch_repo_singleton)]
+BatchRepoDep = Annotated[
+    BatchPort | AsyncBatchPort, Depends(get_batch_repo_singleton)
+]
 
 
-@lru_cache
-def get_record_repo_singleton() -> RecordPort:
-    settings = get_settings_cached()
+def _make_record_repo(settings: Settings) -> RecordPort | AsyncRecordPort:
     if settings.env == "dev":
         return RecordRepository()
     if settings.env == "db":
         return DBRecordRepository()
+    if settings.env == "async_db":
+        return AsyncDBRecordRepository()
     return RecordRepository()
 
 
-RecordRepoDep = Annotated[RecordPort, Depends(get_record_repo_singleton)]
+@lru_cache
+def get_audit_writer() -> AuditWriter | AsyncAuditWriter | None:
+    """
+    Process-wide group-commit writer for consumption records, writing
+    through a record repository of its own in units of work of its own.
+    """
+    settings = get_settings_cached()
+    if not settings.audit_writer_enabled:
+        return None
+    options = {
+        "max_batch": settings.audit_writer_max_batch,
+        "interval": settings.audit_writer_flush_interval_seconds,
+    }
+    if settings.env == "db":
+        return AuditWriter(DBRecordRepository(), unit_of_work, **options)
+    if settings.env == "async_db":
+        return AsyncAuditWriter(
+            AsyncDBRecordRepository(), async_request_unit_of_work, **options
+        )
+    return None
+
+
+@lru_cache
+def get_record_repo_singleton() -> RecordPort | AsyncRecordPort:
+    settings = get_settings_cached()
+    repo = _make_record_repo(settings)
+    if settings.metrics_enabled:
+        repo = TimedRepository(repo)
+    writer = get_audit_writer()
+    wait = settings.audit_writer_wait
+    if isinstance(writer, AsyncAuditWriter):
+        return AsyncBufferedRecordRepository(repo, writer, wait)
+    if writer is not None:
+        return BufferedRecordRepository(repo, writer, wait)
+    return repo
+
+
+RecordRepoDep = Annotated[
+    RecordPort | AsyncRecordPort, Depends(get_record_repo_singleton)
+]
+
+
+def _reads_primary(request: Request) -> bool:
+    # Consumes and every other request that can write read what they are
+    # about to change, so they never read a replica that may lag behind
+    return (
+        request.method not in ("GET", "HEAD")
+        or request.headers.get("x-read-primary") == "1"
+    )
+
+
+async def get_unit_of_work(request: Request) -> AsyncIterator[None]:
+    """
+    Request-scoped unit of work: every DB repository call made while
+    serving the request shares one session and commits once, before the
+    response is sent. Any exception rolls the whole request back.
+    Read-only queries of GET requests go to the replica, if configured.
+    """
+    env = get_settings_cached().env
+    with read_from_primary() if _reads_primary(request) else nullcontext():
+        if env == "db":
+            async with request_unit_of_work(
+                read_session_factory=ReadSessionLocal
+            ):
+                yield
+        elif env == "async_db":
+            async with async_request_unit_of_work(
+                read_session_factory=AsyncReadSessionLocal
+            ):
+                yield
+        else:
+            yield
+
+
+# scope="function": commit before the response goes out, not after
+UnitOfWorkDep = Annotated[None, Depends(get_unit_of_work, scope="function")]
 
 
 def get_admin_service(
-    batch_repo: BatchRepoDep, record_repo: RecordRepoDep
-) -> AdminService:
+    batch_repo: BatchRepoDep, record_repo: RecordRepoDep, _: UnitOfWorkDep
+) -> AdminService | AsyncAdminService:
+    if get_settings_cached().env == "async_db":
+        return AsyncAdminService(batch_repo, record_repo)
     return AdminService(batch_repo, record_repo)
 
 
-AdminServiceDep = Annotated[AdminService, Depends(get_admin_service)]
+AdminServiceDep = Annotated[
+    AdminService | AsyncAdminService, Depends(get_admin_service)
+]
+
+
+@lru_cache
+def get_retry_policy() -> RetryPolicy:
+    settings = get_settings_cached()
+    return RetryPolicy(
+        attempts=settings.consume_retry_attempts,
+        base_delay=settings.consume_retry_base_delay,
+        max_delay=settings.consume_retry_max_delay,
+        deadline=settings.consume_retry_deadline,
+    )
+
+
+@lru_cache
+def get_consume_combiner() -> ConsumeCombiner | AsyncConsumeCombiner:
+    """
+    Process-wide, so concurrent requests for a batch meet in one group.
+    Each group commits in a unit of work of its own, not a request's.
+    """
+    settings = get_settings_cached()
+    options = {
+        "window": settings.consume_combine_window_seconds,
+        "max_group": settings.consume_combine_max_group,
+        "retry_policy": get_retry_policy(),
+    }
+    batch_repo = get_batch_repo_singleton()
+    if settings.env == "async_db":
+        return AsyncConsumeCombiner(
+            batch_repo, async_request_unit_of_work, **options
+        )
+    transaction = unit_of_work if settings.env == "db" else nullcontext
+    return ConsumeCombiner(batch_repo, transaction, **options)
 
 
 def get_batch_service(
-    batch_repo: BatchRepoDep, record_repo: RecordRepoDep
-) -> BatchService:
-    return BatchService(batch_repo, record_repo)
+    batch_repo: BatchRepoDep, record_repo: RecordRepoDep, _: UnitOfWorkDep
+) -> BatchService | AsyncBatchService:
+    settings = get_settings_cached()
+    combiner = None
+    if settings.consume_strategy == "combined":
+        combiner = get_consume_combiner()
+    if settings.env == "async_db":
+        return AsyncBatchService(
+            batch_repo,
+            record_repo,
+            consume_strategy=settings.consume_strategy,
+            retry_policy=get_retry_policy(),
+            lock_nowait=settings.consume_lock_nowait,
+            combiner=combiner,
+        )
+    return BatchService(
+        batch_repo,
+        record_repo,
+        consume_strategy=settings.consume_strategy,
+        retry_policy=get_retry_policy(),
+        lock_nowait=settings.consume_lock_nowait,
+        combiner=combiner,
+    )
 
 
-BatchServiceDep = Annotated[BatchService, Depends(get_batch_service)]
+BatchServiceDep = Annotated[
+    BatchService | AsyncBatchService, Depends(get_batch_service)
+]
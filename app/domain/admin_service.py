@@ -1,5 +1,8 @@
-from app.domain.batch_port import BatchPort
-from app.domain.record_port import RecordPort
+from collections.abc import AsyncIterator, Iterator, Sequence
+from datetime import datetime
+
+from app.domain.batch_port import AsyncBatchPort, BatchPort
+from app.domain.record_port import AsyncRecordPort, RecordPort, RecordRow
 from app.schemas.batches_schema import Batch
 from app.schemas.consumption_record import ConsumptionRecord
 
@@ -14,3 +17,65 @@ class AdminService:
 
     def list_all_batches(self) -> list[Batch]:
         return self._batch_port.list_all()
+
+    def list_consumption_records_page(
+        self, limit: int, after: int | None = None
+    ) -> list[ConsumptionRecord]:
+        return self._record_port.list_page(limit, after)
+
+    def list_batches_page(
+        self, limit: int, after: int | None = None
+    ) -> list[Batch]:
+        return self._batch_port.list_page(limit, after)
+
+    def iter_consumption_records(self) -> Iterator[ConsumptionRecord]:
+        return self._record_port.iter_all()
+
+    def iter_batches(self) -> Iterator[Batch]:
+        return self._batch_port.iter_all()
+
+    def export_consumption_records(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        batch_id: int | None = None,
+    ) -> Iterator[Sequence[RecordRow]]:
+        return self._record_port.iter_export_chunks(since, until, batch_id)
+
+
+class AsyncAdminService:
+    def __init__(
+        self, batch_port: AsyncBatchPort, record_port: AsyncRecordPort
+    ) -> None:
+        self._batch_port = batch_port
+        self._record_port = record_port
+
+    async def list_all_consumption_recors(self) -> list[ConsumptionRecord]:
+        return await self._record_port.list_all()
+
+    async def list_all_batches(self) -> list[Batch]:
+        return await self._batch_port.list_all()
+
+    async def list_consumption_records_page(
+        self, limit: int, after: int | None = None
+    ) -> list[ConsumptionRecord]:
+        return await self._record_port.list_page(limit, after)
+
+    async def list_batches_page(
+        self, limit: int, after: int | None = None
+    ) -> list[Batch]:
+        return await self._batch_port.list_page(limit, after)
+
+    def iter_consumption_records(self) -> AsyncIterator[ConsumptionRecord]:
+        return self._record_port.iter_all()
+
+    def iter_batches(self) -> AsyncIterator[Batch]:
+        return self._batch_port.iter_all()
+
+    def export_consumption_records(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        batch_id: int | None = None,
+    ) -> AsyncIterator[Sequence[RecordRow]]:
+        return self._record_port.iter_export_chunks(since, until, batch_id)
@@ -1,7 +1,10 @@
+from collections.abc import AsyncIterator, Iterator
 from datetime import datetime
 from typing import Protocol
 
 from app.schemas.batches_schema import Batch
+from app.schemas.bulk_schema import BulkCreateResult
+from app.schemas.consumption_record import ConsumptionRecord
 
 
 class ConcurrencyError(Exception):
@@ -12,6 +15,28 @@ class BatchPort(Protocol):
     def upsert(self, batch: Batch) -> Batch:
         pass
 
+    def bulk_insert(self, batches: list[Batch]) -> BulkCreateResult:
+        pass
+
+    def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch | None:
+        pass
+
+    def consume_many(
+        self, batch_id: int, records: list[ConsumptionRecord]
+    ) -> list[Batch | None]:
+        pass
+
+    def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[ConsumptionRecord] | None:
+        pass
+
     def list_all_available(self) -> list[Batch]:
         pass
 
@@ -23,8 +48,76 @@ class BatchPort(Protocol):
     def read_by_id(self, batch_id: int) -> Batch | None:
         pass
 
+    def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> Batch | None:
+        pass
+
     def soft_delete(self, batch_id: int) -> None:
         pass
 
     def list_all(self) -> list[Batch]:
         pass
+
+    def list_page(self, limit: int, after: int | None = None) -> list[Batch]:
+        pass
+
+    def iter_all(self) -> Iterator[Batch]:
+        pass
+
+
+class AsyncBatchPort(Protocol):
+    async def upsert(self, batch: Batch) -> Batch:
+        pass
+
+    async def bulk_insert(self, batches: list[Batch]) -> BulkCreateResult:
+        pass
+
+    async def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch | None:
+        pass
+
+    async def consume_many(
+        self, batch_id: int, records: list[ConsumptionRecord]
+    ) -> list[Batch | None]:
+        pass
+
+    async def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[ConsumptionRecord] | None:
+        pass
+
+    async def list_all_available(self) -> list[Batch]:
+        pass
+
+    async def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[Batch]:
+        pass
+
+    async def read_by_id(self, batch_id: int) -> Batch | None:
+        pass
+
+    async def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> Batch | None:
+        pass
+
+    async def soft_delete(self, batch_id: int) -> None:
+        pass
+
+    async def list_all(self) -> list[Batch]:
+        pass
+
+    async def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[Batch]:
+        pass
+
+    def iter_all(self) -> AsyncIterator[Batch]:
+        pass
@@ -1,9 +1,13 @@
-import time
 from datetime import UTC, datetime, timedelta
+from functools import partial
 
-from app.domain.batch_port import BatchPort, ConcurrencyError
-from app.domain.record_port import RecordPort
+from app.domain.batch_port import AsyncBatchPort, BatchPort
+from app.domain.consume_combiner import AsyncConsumeCombiner, ConsumeCombiner
+from app.domain.record_port import AsyncRecordPort, RecordPort
+from app.domain.retry_policy import RetriesExhaustedError, RetryPolicy
+from app.observability.metrics import CONSUME_ABORTS, CONSUME_RETRIES
 from app.schemas.batches_schema import Batch
+from app.schemas.bulk_schema import BulkCreateResult, BulkItemError
 from app.schemas.consumption_record import ConsumptionRecord
 
 
@@ -11,18 +15,105 @@ class ResourceNotFoundError(Exception):
     pass
 
 
-retries = 3
-backoff = 0.25
+class InsufficientVolumeError(ValueError):
+    def __init__(self) -> None:
+        super().__init__("Cannot consume more than available volume")
+
+
+class FefoShortfallError(ValueError):
+    def __init__(self) -> None:
+        super().__init__("Not enough volume across matching batches")
+
+
+# Consume strategies that read the batch, check it and write it back
+READ_MODIFY_WRITE = ("optimistic", "pessimistic")
+
+
+def draw(batch: Batch | None, qty: float) -> Batch:
+    """Apply a read-modify-write consume of qty to a freshly read batch."""
+    if batch is None:
+        raise ResourceNotFoundError()
+    if batch.volume_liters < qty:
+        raise InsufficientVolumeError()
+    batch.volume_liters = batch.volume_liters - qty
+    return batch
+
+
+def split_manifest(
+    batches: list[Batch],
+) -> tuple[list[Batch], list[int], list[BulkItemError]]:
+    """
+    Drop repeated batch_codes within one manifest (first one wins).
+    Returns the unique batches, their positions in the manifest and the
+    per-item errors for the repeats.
+    """
+    seen: set[str] = set()
+    unique, positions, errors = [], [], []
+    for index, batch in enumerate(batches):
+        if batch.batch_code in seen:
+            errors.append(
+                BulkItemError(
+                    index=index,
+                    batch_code=batch.batch_code,
+                    detail="batch_code repeated in manifest",
+                )
+            )
+            continue
+        seen.add(batch.batch_code)
+        unique.append(batch)
+        positions.append(index)
+    return unique, positions, errors
+
+
+def merge_bulk_result(
+    result: BulkCreateResult,
+    positions: list[int],
+    errors: list[BulkItemError],
+) -> BulkCreateResult:
+    """Map port-relative error indexes back onto the manifest."""
+    port_errors = [
+        error.model_copy(update={"index": positions[error.index]})
+        for error in result.errors
+    ]
+    return BulkCreateResult(
+        created=result.created,
+        errors=sorted(errors + port_errors, key=lambda error: error.index),
+    )
 
 
 class BatchService:
-    def __init__(self, batch_port: BatchPort, record_port: RecordPort) -> None:
+    def __init__(  # noqa: PLR0913
+        self,
+        batch_port: BatchPort,
+        record_port: RecordPort,
+        *,
+        consume_strategy: str = "atomic",
+        retry_policy: RetryPolicy | None = None,
+        lock_nowait: bool = False,
+        combiner: ConsumeCombiner | None = None,
+    ) -> None:
         self._batch_port = batch_port
         self._record_port = record_port
+        # "atomic", "optimistic", "pessimistic" (SELECT ... FOR UPDATE) or
+        # "combined" (one write per group of concurrent consumes of a batch)
+        self._consume_strategy = consume_strategy
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._lock_nowait = lock_nowait
+        # Share one combiner across services, or nothing gets combined
+        if combiner is None and consume_strategy == "combined":
+            combiner = ConsumeCombiner(
+                batch_port, retry_policy=self._retry_policy
+            )
+        self._combiner = combiner
 
     def create(self, batch: Batch) -> Batch:
         return self._batch_port.upsert(batch)
 
+    def create_many(self, batches: list[Batch]) -> BulkCreateResult:
+        unique, positions, errors = split_manifest(batches)
+        result = self._batch_port.bulk_insert(unique)
+        return merge_bulk_result(result, positions, errors)
+
     def list_all(self) -> list[Batch]:
         return self._batch_port.list_all_available()
 
@@ -35,27 +126,90 @@ class BatchService:
     def consume(
         self, batch_id: int, qty: float, order_id: str | None
     ) -> Batch:
+        if self._consume_strategy in READ_MODIFY_WRITE:
+            return self._consume_read_modify_write(batch_id, qty, order_id)
+        if self._consume_strategy == "combined":
+            updated_batch = self._combiner.consume(
+                ConsumptionRecord(
+                    batch_id=batch_id,
+                    consumed_at=datetime.now(UTC),
+                    order_id=order_id,
+                    qty=qty,
+                )
+            )
+        else:
+            # Only ledger appends can conflict (two of them took one seq)
+            updated_batch = self._retry_policy.run(
+                partial(self._batch_port.consume, batch_id, qty, order_id),
+                on_retry=partial(CONSUME_RETRIES.inc, self._consume_strategy),
+            )
+        if updated_batch is None:
+            # Slow path only: find out why the conditional update missed
+            self.read_by_id(batch_id)
+            raise InsufficientVolumeError()
+        return updated_batch
+
+    def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[ConsumptionRecord]:
+        # Sharded and ledger draws conflict when batches change under them
+        allocation = self._retry_policy.run(
+            partial(
+                self._batch_port.consume_fefo,
+                qty,
+                order_id,
+                min_fat_percent,
+                max_fat_percent,
+            ),
+            on_retry=partial(CONSUME_RETRIES.inc, "fefo"),
+        )
+        if allocation is None:
+            raise FefoShortfallError()
+        return allocation
+
+    def _read_for_consume(self, batch_id: int) -> Batch | None:
+        if self._consume_strategy == "pessimistic":
+            return self._batch_port.read_for_update(
+                batch_id, self._lock_nowait
+            )
+        return self._batch_port.read_by_id(batch_id)
+
+    def _consume_read_modify_write(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch:
+        """
+        Optimistic: a concurrent write makes upsert raise ConcurrencyError
+        and the retry policy starts over from a fresh read. Pessimistic:
+        the read locks the row until the unit of work commits, so the
+        write cannot conflict and the policy never has to retry.
+        """
         now = datetime.now(UTC)
-        for i in range(retries):
-            batch = self.read_by_id(batch_id)
-            new_volume = batch.volume_liters - qty
-            if new_volume < 0:
-                raise ValueError("Cannot consume more than available volume")
-            batch.volume_liters = new_volume
-            try:
-                updated_batch = self._batch_port.upsert(batch)
-                self._record_port.insert(
-                    ConsumptionRecord(
-                        batch_id=updated_batch.id,
-                        consumed_at=now,
-                        order_id=order_id,
-                        qty=qty,
-                    )
+
+        def attempt() -> Batch:
+            batch = draw(self._read_for_consume(batch_id), qty)
+            updated_batch = self._batch_port.upsert(batch)
+            self._record_port.insert(
+                ConsumptionRecord(
+                    batch_id=updated_batch.id,
+                    consumed_at=now,
+                    order_id=order_id,
+                    qty=qty,
                 )
-                return updated_batch
-            except ConcurrencyError:
-                time.sleep(i * backoff)
-        raise ConcurrencyError()
+            )
+            return updated_batch
+
+        strategy = self._consume_strategy
+        try:
+            return self._retry_policy.run(
+                attempt, on_retry=partial(CONSUME_RETRIES.inc, strategy)
+            )
+        except RetriesExhaustedError:
+            CONSUME_ABORTS.inc(strategy)
+            raise
 
     def list_near_expiry(self, n_days: int) -> list[Batch]:
         now = datetime.now(UTC)
@@ -65,3 +219,139 @@ class BatchService:
 
     def delete(self, batch_id: int) -> None:
         self._batch_port.soft_delete(batch_id)
+
+
+class AsyncBatchService:
+    """BatchService over async ports; never blocks the event loop."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        batch_port: AsyncBatchPort,
+        record_port: AsyncRecordPort,
+        *,
+        consume_strategy: str = "atomic",
+        retry_policy: RetryPolicy | None = None,
+        lock_nowait: bool = False,
+        combiner: AsyncConsumeCombiner | None = None,
+    ) -> None:
+        self._batch_port = batch_port
+        self._record_port = record_port
+        # "atomic", "optimistic", "pessimistic" (SELECT ... FOR UPDATE) or
+        # "combined" (one write per group of concurrent consumes of a batch)
+        self._consume_strategy = consume_strategy
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._lock_nowait = lock_nowait
+        # Share one combiner across services, or nothing gets combined
+        if combiner is None and consume_strategy == "combined":
+            combiner = AsyncConsumeCombiner(
+                batch_port, retry_policy=self._retry_policy
+            )
+        self._combiner = combiner
+
+    async def create(self, batch: Batch) -> Batch:
+        return await self._batch_port.upsert(batch)
+
+    async def create_many(self, batches: list[Batch]) -> BulkCreateResult:
+        unique, positions, errors = split_manifest(batches)
+        result = await self._batch_port.bulk_insert(unique)
+        return merge_bulk_result(result, positions, errors)
+
+    async def list_all(self) -> list[Batch]:
+        return await self._batch_port.list_all_available()
+
+    async def read_by_id(self, batch_id: int) -> Batch:
+        batch = await self._batch_port.read_by_id(batch_id)
+        if not batch:
+            raise ResourceNotFoundError()
+        return batch
+
+    async def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch:
+        if self._consume_strategy in READ_MODIFY_WRITE:
+            return await self._consume_read_modify_write(
+                batch_id, qty, order_id
+            )
+        if self._consume_strategy == "combined":
+            updated_batch = await self._combiner.consume(
+                ConsumptionRecord(
+                    batch_id=batch_id,
+                    consumed_at=datetime.now(UTC),
+                    order_id=order_id,
+                    qty=qty,
+                )
+            )
+        else:
+            updated_batch = await self._retry_policy.run_async(
+                partial(self._batch_port.consume, batch_id, qty, order_id),
+                on_retry=partial(CONSUME_RETRIES.inc, self._consume_strategy),
+            )
+        if updated_batch is None:
+            await self.read_by_id(batch_id)
+            raise InsufficientVolumeError()
+        return updated_batch
+
+    async def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[ConsumptionRecord]:
+        allocation = await self._retry_policy.run_async(
+            partial(
+                self._batch_port.consume_fefo,
+                qty,
+                order_id,
+                min_fat_percent,
+                max_fat_percent,
+            ),
+            on_retry=partial(CONSUME_RETRIES.inc, "fefo"),
+        )
+        if allocation is None:
+            raise FefoShortfallError()
+        return allocation
+
+    async def _read_for_consume(self, batch_id: int) -> Batch | None:
+        if self._consume_strategy == "pessimistic":
+            return await self._batch_port.read_for_update(
+                batch_id, self._lock_nowait
+            )
+        return await self._batch_port.read_by_id(batch_id)
+
+    async def _consume_read_modify_write(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch:
+        """See BatchService._consume_read_modify_write."""
+        now = datetime.now(UTC)
+
+        async def attempt() -> Batch:
+            batch = draw(await self._read_for_consume(batch_id), qty)
+            updated_batch = await self._batch_port.upsert(batch)
+            await self._record_port.insert(
+                ConsumptionRecord(
+                    batch_id=updated_batch.id,
+                    consumed_at=now,
+                    order_id=order_id,
+                    qty=qty,
+                )
+            )
+            return updated_batch
+
+        strategy = self._consume_strategy
+        try:
+            return await self._retry_policy.run_async(
+                attempt, on_retry=partial(CONSUME_RETRIES.inc, strategy)
+            )
+        except RetriesExhaustedError:
+            CONSUME_ABORTS.inc(strategy)
+            raise
+
+    async def list_near_expiry(self, n_days: int) -> list[Batch]:
+        now = datetime.now(UTC)
+        return await self._batch_port.list_all_between_dates(
+            now, now + timedelta(days=n_days)
+        )
+
+    async def delete(self, batch_id: int) -> None:
+        await self._batch_port.soft_delete(batch_id)
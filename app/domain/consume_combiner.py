@@ -0,0 +1,243 @@
+"""
+Request combining for consumes of one hot batch.
+
+The first consume of a batch to arrive becomes the group's leader: it
+waits up to `window` seconds (less if `max_group` consumes join first)
+while later consumes of the same batch join its group, then applies the
+whole group through `BatchPort.consume_many` in a transaction of its own
+and hands every member its result. N concurrent consumes of one batch
+thus cost one locked read, one volume update and one multi-row record
+insert instead of N conflicting read-modify-write transactions.
+
+Only one group per batch (stripe) applies at a time; consumes arriving
+meanwhile keep joining the next group, so the busier the batch, the
+larger the groups. Results are handed out after the group's transaction
+has committed.
+"""
+
+import asyncio
+import threading
+from collections.abc import Callable, Sequence
+from contextlib import (
+    AbstractAsyncContextManager,
+    AbstractContextManager,
+    nullcontext,
+    suppress,
+)
+
+from app.domain.batch_port import (
+    AsyncBatchPort,
+    BatchPort,
+    ConcurrencyError,
+)
+from app.domain.retry_policy import RetryPolicy
+from app.observability.metrics import CONSUME_GROUP_SIZE, CONSUME_RETRIES
+from app.schemas.batches_schema import Batch
+from app.schemas.consumption_record import ConsumptionRecord
+
+LOCK_STRIPES = 64  # groups of batches whose ids differ mod this apply freely
+
+
+def accept_in_order(
+    volume: float, quantities: Sequence[float]
+) -> list[float | None]:
+    """
+    Walk a group's draws in arrival order: each one that the remaining
+    volume still covers is accepted. Returns the volume left right after
+    every accepted draw, None for a refused one.
+    """
+    remaining, volumes = volume, []
+    for qty in quantities:
+        if qty > remaining:
+            volumes.append(None)
+            continue
+        remaining = remaining - qty
+        volumes.append(remaining)
+    return volumes
+
+
+def group_results(
+    batch: Batch, volumes: list[float | None]
+) -> list[Batch | None]:
+    """consume_many results: the batch after each accepted draw, or None."""
+    return [
+        None
+        if volume is None
+        else batch.model_copy(update={"volume_liters": volume})
+        for volume in volumes
+    ]
+
+
+def _count_retry() -> None:
+    CONSUME_RETRIES.inc("combined")
+
+
+class _Group:
+    def __init__(self) -> None:
+        self.records: list[ConsumptionRecord] = []
+        self.results: list[Batch | None] = []
+        self.error: BaseException | None = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class ConsumeCombiner:
+    """
+    Combining queue for BatchService. One instance must be shared by
+    every request (services are built per request), so consumes of the
+    same batch can meet in one group.
+    """
+
+    def __init__(
+        self,
+        batch_port: BatchPort,
+        transaction: Callable[[], AbstractContextManager] = nullcontext,
+        window: float = 0.002,
+        max_group: int = 128,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        self._batch_port = batch_port
+        self._transaction = transaction
+        self._window = window
+        self._max_group = max_group
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._lock = threading.Lock()
+        self._open: dict[int, _Group] = {}
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def consume(self, record: ConsumptionRecord) -> Batch | None:
+        """
+        Draw record.qty from record.batch_id together with whatever else
+        arrives for that batch. Returns the batch right after this draw,
+        or None if it was refused (batch not available or volume short),
+        like BatchPort.consume.
+        """
+        batch_id = record.batch_id
+        with self._lock:
+            group = self._open.get(batch_id)
+            leader = group is None
+            if leader:
+                group = self._open[batch_id] = _Group()
+            index = len(group.records)
+            group.records.append(record)
+            if len(group.records) >= self._max_group:
+                del self._open[batch_id]
+                group.full.set()
+        if leader:
+            self._lead(batch_id, group)
+        else:
+            group.done.wait()
+        if group.error is not None:
+            raise group.error
+        return group.results[index]
+
+    def _lead(self, batch_id: int, group: _Group) -> None:
+        group.full.wait(self._window)
+        with self._stripes[batch_id % LOCK_STRIPES]:
+            with self._lock:
+                if self._open.get(batch_id) is group:
+                    del self._open[batch_id]
+            CONSUME_GROUP_SIZE.observe(len(group.records))
+            try:
+                group.results = self._retry_policy.run(
+                    lambda: self._apply(batch_id, group.records),
+                    on_retry=_count_retry,
+                )
+            except BaseException as error:
+                # Members re-raise it; the leader raises it from here
+                group.error = error
+                raise
+            finally:
+                group.done.set()
+
+    def _apply(
+        self, batch_id: int, records: list[ConsumptionRecord]
+    ) -> list[Batch | None]:
+        with self._transaction():
+            return self._batch_port.consume_many(batch_id, records)
+
+
+class _AsyncGroup:
+    def __init__(self) -> None:
+        self.records: list[ConsumptionRecord] = []
+        self.full = asyncio.Event()
+        self.started = False  # set once the apply may have written
+        self.applied: asyncio.Task[list[Batch | None]]
+
+
+class AsyncConsumeCombiner:
+    """
+    ConsumeCombiner for AsyncBatchService (one event loop). A group is
+    applied by a task of its own rather than by its leader's request, so
+    cancelling that request (a client gone) cannot interrupt a commit
+    the other members are waiting for.
+    """
+
+    def __init__(
+        self,
+        batch_port: AsyncBatchPort,
+        transaction: Callable[[], AbstractAsyncContextManager] = nullcontext,
+        window: float = 0.002,
+        max_group: int = 128,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        self._batch_port = batch_port
+        self._transaction = transaction
+        self._window = window
+        self._max_group = max_group
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._open: dict[int, _AsyncGroup] = {}
+        self._stripes = [asyncio.Lock() for _ in range(LOCK_STRIPES)]
+
+    async def consume(self, record: ConsumptionRecord) -> Batch | None:
+        """See ConsumeCombiner.consume."""
+        batch_id = record.batch_id
+        # No await between lookup and append: the loop cannot interleave
+        group = self._open.get(batch_id)
+        if group is None:
+            group = self._open[batch_id] = _AsyncGroup()
+            group.applied = asyncio.create_task(self._lead(batch_id, group))
+        index = len(group.records)
+        group.records.append(record)
+        if len(group.records) >= self._max_group:
+            del self._open[batch_id]
+            group.full.set()
+        try:
+            # A cancelled request stops waiting; its draw is applied anyway
+            results = await asyncio.shield(group.applied)
+        except asyncio.CancelledError:
+            if group.applied.cancelled() and not group.started:
+                # The group was stopped (shutdown) before writing anything,
+                # perhaps before _lead ran at all to close it
+                self._close(batch_id, group)
+                raise ConcurrencyError() from None
+            raise
+        return results[index]
+
+    async def _lead(
+        self, batch_id: int, group: _AsyncGroup
+    ) -> list[Batch | None]:
+        try:
+            with suppress(TimeoutError):
+                await asyncio.wait_for(group.full.wait(), self._window)
+            async with self._stripes[batch_id % LOCK_STRIPES]:
+                self._close(batch_id, group)
+                CONSUME_GROUP_SIZE.observe(len(group.records))
+                group.started = True
+                return await self._retry_policy.run_async(
+                    lambda: self._apply(batch_id, group.records),
+                    on_retry=_count_retry,
+                )
+        finally:
+            self._close(batch_id, group)
+
+    def _close(self, batch_id: int, group: _AsyncGroup) -> None:
+        """Stop group from taking members (idempotent)."""
+        if self._open.get(batch_id) is group:
+            del self._open[batch_id]
+
+    async def _apply(
+        self, batch_id: int, records: list[ConsumptionRecord]
+    ) -> list[Batch | None]:
+        async with self._transaction():
+            return await self._batch_port.consume_many(batch_id, records)
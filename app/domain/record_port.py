@@ -1,11 +1,63 @@
+from collections.abc import AsyncIterator, Iterator, Sequence
+from datetime import datetime
 from typing import Protocol
 
 from app.schemas.consumption_record import ConsumptionRecord
 
+# Plain column tuples used by exports, in RECORD_EXPORT_COLUMNS order
+RECORD_EXPORT_COLUMNS = ("id", "batch_id", "consumed_at", "order_id", "qty")
+RecordRow = tuple[int, int, datetime, str | None, float]
+
 
 class RecordPort(Protocol):
     def insert(self, record: ConsumptionRecord) -> None:
         pass
 
+    def insert_many(self, records: list[ConsumptionRecord]) -> None:
+        pass
+
     def list_all(self) -> list[ConsumptionRecord]:
         pass
+
+    def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[ConsumptionRecord]:
+        pass
+
+    def iter_all(self) -> Iterator[ConsumptionRecord]:
+        pass
+
+    def iter_export_chunks(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        batch_id: int | None = None,
+    ) -> Iterator[Sequence[RecordRow]]:
+        pass
+
+
+class AsyncRecordPort(Protocol):
+    async def insert(self, record: ConsumptionRecord) -> None:
+        pass
+
+    async def insert_many(self, records: list[ConsumptionRecord]) -> None:
+        pass
+
+    async def list_all(self) -> list[ConsumptionRecord]:
+        pass
+
+    async def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[ConsumptionRecord]:
+        pass
+
+    def iter_all(self) -> AsyncIterator[ConsumptionRecord]:
+        pass
+
+    def iter_export_chunks(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        batch_id: int | None = None,
+    ) -> AsyncIterator[Sequence[RecordRow]]:
+        pass
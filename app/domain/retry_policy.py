@@ -0,0 +1,94 @@
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+
+from app.domain.batch_port import ConcurrencyError
+
+
+class RetriesExhaustedError(ConcurrencyError):
+    """A conflicting operation was retried until the policy gave up."""
+
+    def __init__(self, attempts: int) -> None:
+        super().__init__(f"Gave up after {attempts} conflicting attempts")
+        self.attempts = attempts
+
+
+class RetryPolicy:
+    """
+    Retry schedule for optimistic-concurrency conflicts: exponential
+    backoff with full jitter, bounded by a number of attempts and by an
+    overall deadline.
+
+    Full jitter draws each delay uniformly from [0, min(max_delay,
+    base_delay * 2**attempt)], so writers that collided once spread out
+    instead of colliding again in lockstep. A retry whose delay would end
+    past the deadline is not attempted.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 10,
+        base_delay: float = 0.005,
+        max_delay: float = 0.1,
+        deadline: float = 1.0,
+        jitter: Callable[[], float] = random.random,
+    ) -> None:
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number attempt + 1 (attempt counts from 0)."""
+        cap = min(self.max_delay, self.base_delay * 2**attempt)
+        return self._jitter() * cap
+
+    def _next_delay(self, attempt: int, deadline: float) -> float | None:
+        if attempt + 1 >= self.attempts:
+            return None
+        delay = self.delay(attempt)
+        if time.monotonic() + delay > deadline:
+            return None
+        return delay
+
+    def run[T](
+        self,
+        operation: Callable[[], T],
+        on_retry: Callable[[], None] | None = None,
+    ) -> T:
+        """Call operation until it does not raise ConcurrencyError."""
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except ConcurrencyError as error:
+                delay = self._next_delay(attempt, deadline)
+                if delay is None:
+                    raise RetriesExhaustedError(attempt + 1) from error
+            if on_retry is not None:
+                on_retry()
+            time.sleep(delay)
+            attempt += 1
+
+    async def run_async[T](
+        self,
+        operation: Callable[[], Awaitable[T]],
+        on_retry: Callable[[], None] | None = None,
+    ) -> T:
+        """run for coroutines; waits with asyncio.sleep."""
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                return await operation()
+            except ConcurrencyError as error:
+                delay = self._next_delay(attempt, deadline)
+                if delay is None:
+                    raise RetriesExhaustedError(attempt + 1) from error
+            if on_retry is not None:
+                on_retry()
+            await asyncio.sleep(delay)
+            attempt += 1
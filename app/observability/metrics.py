@@ -0,0 +1,281 @@
+"""
+In-process metrics registry rendered in the Prometheus text format.
+
+Every metric keeps plain Python numbers behind its own lock, so recording
+is a dict lookup plus an increment; all formatting work happens at scrape
+time. Values are per worker process.
+"""
+
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Sequence
+from threading import Lock
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(
+    names: Sequence[str], values: Sequence[str], extra: str = ""
+) -> str:
+    pairs = [
+        f'{n}="{_escape(str(v))}"' for n, v in zip(names, values, strict=True)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield (
+                f"{self.name}_total{_labels(self.labelnames, labels)} "
+                f"{_number(value)}"
+            )
+
+
+class Histogram:
+    """Bucketed observations (cumulative only when rendered)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = Lock()
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def total(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            snapshot = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self._series.items()
+            ]
+        bounds = [*self.buckets, float("inf")]
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(bounds, counts, strict=True):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_text = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_number(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Gauge:
+    """Current values, read from callbacks at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._callbacks: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set_function(
+        self, function: Callable[[], float], *labels: str
+    ) -> None:
+        self._callbacks[labels] = function
+
+    def samples(self) -> Iterable[str]:
+        for labels, function in list(self._callbacks.items()):
+            yield (
+                f"{self.name}{_labels(self.labelnames, labels)} "
+                f"{_number(function())}"
+            )
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def register[MetricT: Counter | Histogram | Gauge](
+        self, metric: MetricT
+    ) -> MetricT:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.register(
+    Histogram(
+        "dairy_http_request_duration_seconds",
+        "Time to serve a request, by route template.",
+        ("method", "route", "status"),
+    )
+)
+CONSUME_RETRIES = REGISTRY.register(
+    Counter(
+        "dairy_consume_retries",
+        "Consume attempts retried after a ConcurrencyError.",
+        ("strategy",),
+    )
+)
+CONSUME_ABORTS = REGISTRY.register(
+    Counter(
+        "dairy_consume_aborts",
+        "Consumes given up after exhausting their retries.",
+        ("strategy",),
+    )
+)
+CONSUME_GROUP_SIZE = REGISTRY.register(
+    Histogram(
+        "dairy_consume_group_size",
+        "Consumes applied together by the combining strategy.",
+        buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+    )
+)
+LEDGER_SNAPSHOTS = REGISTRY.register(
+    Counter(
+        "dairy_ledger_snapshots",
+        "Batch ledger tails folded into a volume snapshot.",
+    )
+)
+SHARD_REBALANCES = REGISTRY.register(
+    Counter(
+        "dairy_shard_rebalances",
+        "Consumes that locked every shard of a batch and respread it.",
+    )
+)
+AUDIT_FLUSH_SECONDS = REGISTRY.register(
+    Histogram(
+        "dairy_audit_flush_duration_seconds",
+        "Time to write one group of queued consumption records.",
+        buckets=FAST_BUCKETS,
+    )
+)
+AUDIT_FLUSH_SIZE = REGISTRY.register(
+    Histogram(
+        "dairy_audit_flush_size",
+        "Consumption records written per group commit.",
+        buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+    )
+)
+AUDIT_QUEUE_DEPTH = REGISTRY.register(
+    Gauge(
+        "dairy_audit_queue_depth",
+        "Consumption records queued for the audit writer.",
+    )
+)
+REPOSITORY_LATENCY = REGISTRY.register(
+    Histogram(
+        "dairy_repository_call_duration_seconds",
+        "Time spent in repository calls, by repository and method.",
+        ("repository", "method"),
+        FAST_BUCKETS,
+    )
+)
+POOL_CHECKOUT_WAIT = REGISTRY.register(
+    Histogram(
+        "dairy_db_pool_checkout_wait_seconds",
+        "Time spent waiting for a pooled connection.",
+        ("engine",),
+        FAST_BUCKETS,
+    )
+)
+POOL_TIMEOUTS = REGISTRY.register(
+    Counter(
+        "dairy_db_pool_timeouts",
+        "Checkouts that gave up after waiting pool_timeout seconds.",
+        ("engine",),
+    )
+)
+POOL_CONNECTION_HELD = REGISTRY.register(
+    Histogram(
+        "dairy_db_connection_held_seconds",
+        "Time a pooled connection stays checked out (session lifetime).",
+        ("engine",),
+        FAST_BUCKETS,
+    )
+)
+POOL_CHECKED_OUT = REGISTRY.register(
+    Gauge(
+        "dairy_db_pool_checked_out",
+        "Connections currently checked out of the pool.",
+        ("engine",),
+    )
+)
+POOL_OVERFLOW = REGISTRY.register(
+    Gauge(
+        "dairy_db_pool_overflow",
+        "Connections open beyond pool_size (negative: idle slots left).",
+        ("engine",),
+    )
+)
@@ -0,0 +1,43 @@
+from time import perf_counter
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.observability.metrics import REQUEST_LATENCY
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware feeding REQUEST_LATENCY.
+
+    Requests are labelled with the matched route template
+    (/api/batches/{id}, not /api/batches/7) to keep the label set
+    bounded; requests that match no route share "unmatched". The time
+    covers the whole response, including streamed bodies.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
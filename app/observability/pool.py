@@ -0,0 +1,118 @@
+import asyncio
+from time import perf_counter
+
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.observability.metrics import (
+    POOL_CHECKED_OUT,
+    POOL_CHECKOUT_WAIT,
+    POOL_CONNECTION_HELD,
+    POOL_OVERFLOW,
+    POOL_TIMEOUTS,
+)
+
+_CHECKED_OUT_AT = "dairy_checked_out_at"
+
+
+def _label(pool) -> str:
+    # pool_logging_name survives pool.recreate(), unlike ad hoc attributes
+    return getattr(pool, "logging_name", None) or "default"
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc(_label(self))
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(perf_counter() - start, _label(self))
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc(_label(self))
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(perf_counter() - start, _label(self))
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Track connection hold time and expose pool occupancy gauges."""
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info[_CHECKED_OUT_AT] = perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop(_CHECKED_OUT_AT, None)
+        if checked_out_at is not None:
+            POOL_CONNECTION_HELD.observe(perf_counter() - checked_out_at, name)
+
+    # Read through the engine: dispose() swaps in a new pool object
+    if not hasattr(engine.pool, "overflow"):
+        return
+
+    def checked_out() -> int:
+        return engine.pool.checkedout()
+
+    def overflow() -> int:
+        return engine.pool.overflow()
+
+    POOL_CHECKED_OUT.set_function(checked_out, name)
+    POOL_OVERFLOW.set_function(overflow, name)
+
+
+def pool_stats(engine: Engine, name: str) -> dict[str, float]:
+    """
+    Occupancy of the engine's pool right now, plus checkout waits and
+    timeouts since startup (recorded only with metrics enabled).
+    """
+    pool = engine.pool
+    checkouts = POOL_CHECKOUT_WAIT.count(name)
+    wait = POOL_CHECKOUT_WAIT.total(name)
+    stats = {
+        "checkouts": checkouts,
+        "checkout_wait_seconds_total": wait,
+        "checkout_wait_seconds_mean": wait / checkouts if checkouts else 0.0,
+        "checkout_timeouts": POOL_TIMEOUTS.value(name),
+    }
+    if hasattr(pool, "overflow"):
+        stats |= {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "timeout_seconds": pool.timeout(),
+        }
+    return stats
+
+
+def warm_up(engine: Engine, size: int) -> None:
+    """Open `size` pooled connections now instead of on first use."""
+    connections = [engine.connect() for _ in range(size)]
+    for connection in connections:
+        connection.close()
+
+
+async def async_warm_up(engine: AsyncEngine, size: int) -> None:
+    """warm_up for an AsyncEngine, connecting concurrently."""
+    connections = await asyncio.gather(
+        *(engine.connect().start() for _ in range(size))
+    )
+    for connection in connections:
+        await connection.close()
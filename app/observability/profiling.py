@@ -0,0 +1,173 @@
+"""
+Opt-in per-request profiling.
+
+A profiled request runs under cProfile and a stack sampler. When it
+finishes, two files are written to the output directory, both named
+after the route and the duration:
+
+- <stem>.prof: cProfile call tree (pstats, snakeviz, gprof2dot).
+- <stem>.folded: sampled stacks in the folded format read by
+  flamegraph.pl, speedscope and inferno.
+
+Both tools see every thread of the process (cProfile does since Python
+3.12), so threadpool work done for the request is included, and so is
+anything else running at the same time. Only one request is profiled at
+a time; requests arriving meanwhile are served normally.
+"""
+
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import UTC, datetime
+from pathlib import Path
+from time import perf_counter
+from types import FrameType
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+PROFILE_HEADER = b"x-profile"
+SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+# Innermost frames of threads parked with nothing to do (idle threadpool
+# workers, the event loop waiting in select); their stacks are dropped
+IDLE_FRAMES = frozenset({("threading.py", "wait"), ("selectors.py", "select")})
+
+_profile_lock = threading.Lock()
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}"
+        f":{code.co_firstlineno})"
+    )
+
+
+def fold_stack(frame: FrameType) -> str | None:
+    """Frame chain as "outer;...;inner", or None for an idle thread."""
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+        return None
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Count the folded stacks of every other thread at a fixed interval."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self.stacks: Counter[str] = Counter()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self._interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = fold_stack(frame)
+                if stack is not None:
+                    self.stacks[stack] += 1
+
+
+def _wants_profile(scope: Scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value not in (b"", b"0", b"false")
+    return False
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling requests that carry `X-Profile: 1`,
+    plus a random `sample_rate` fraction of all requests.
+
+    Only installed when profiling is enabled; when it is installed, an
+    unprofiled request costs a random() call and a scan of its headers.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        output_dir: str | Path,
+        sample_rate: float = 0.0,
+        interval: float = SAMPLE_INTERVAL,
+    ) -> None:
+        self.app = app
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or not (
+                random.random() < self.sample_rate  # noqa: S311
+                or _wants_profile(scope)
+            )
+            or not _profile_lock.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            _profile_lock.release()
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send):
+        profiler = cProfile.Profile()
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        start = perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            duration = perf_counter() - start
+            stacks = sampler.stop()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            await run_in_threadpool(
+                self.write,
+                f"{scope['method']} {route}",
+                duration,
+                profiler,
+                stacks,
+            )
+
+    def write(
+        self,
+        label: str,
+        duration: float,
+        profiler: cProfile.Profile,
+        stacks: Counter[str],
+    ) -> Path:
+        """Write <stem>.prof and <stem>.folded; returns the .prof path."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")
+        stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%f")
+        stem = self.output_dir / f"{stamp}-{slug}-{duration * 1000:.0f}ms"
+        profiler.dump_stats(stem.with_suffix(".prof"))
+        with stem.with_suffix(".folded").open("w") as folded:
+            for stack, samples in stacks.most_common():
+                folded.write(f"{stack} {samples}\n")
+        return stem.with_suffix(".prof")
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.domain.batch_port import AsyncBatchPort, ConcurrencyError
+from app.domain.consume_combiner import accept_in_order, group_results
+from app.repositories.db.models import Batch as BatchModel
+from app.repositories.db.unit_of_work import (
+    async_read_session_scope,
+    async_session_scope,
+    async_stream_rows,
+)
+from app.repositories.db_batch_repo import (
+    BATCH_COLUMNS,
+    BULK_INSERT_ATTEMPTS,
+    LOOKUP_CHUNK,
+    bulk_insert_statement,
+    consume_statement,
+    draw_fefo,
+    fefo_record_rows,
+    insert_group_records_statement,
+    is_duplicate_code,
+    model_to_schema,
+    row_to_schema,
+    schema_to_model,
+    schema_to_row,
+    select_available,
+    select_existing_codes,
+    select_fefo,
+    select_for_update,
+    select_page,
+    select_stream,
+    split_existing,
+)
+from app.repositories.db_record_repo import (
+    insert_many_statement as insert_records_statement,
+)
+from app.repositories.db_record_repo import (
+    model_to_schema as record_model_to_schema,
+)
+from app.repositories.db_record_repo import (
+    schema_to_model as record_schema_to_model,
+)
+from app.schemas.batches_schema import Batch as BatchSchema
+from app.schemas.bulk_schema import BulkCreateResult
+from app.schemas.consumption_record import ConsumptionRecord as RecordSchema
+
+
+class AsyncDBBatchRepository(AsyncBatchPort):
+    """
+    AsyncSession-backed repository implementing the AsyncBatchPort interface.
+    Mirrors DBBatchRepository statement for statement, but awaits the driver
+    so a slow query never blocks the event loop.
+    """
+
+    def __init__(self, fefo_lock: str = "wait") -> None:
+        # No other state here; sessions come from async_session_scope()
+        self._fefo_lock = fefo_lock
+
+    async def upsert(self, batch_schema: BatchSchema) -> BatchSchema:
+        """Insert or update a Batch, see DBBatchRepository.upsert."""
+        async with async_session_scope() as session:
+            if batch_schema.id:
+                stmt = (
+                    select(BatchModel)
+                    .where(BatchModel.id == batch_schema.id)
+                    .execution_options(populate_existing=True)
+                )
+                old_batch = (await session.execute(stmt)).scalars().one()
+                if old_batch.version > batch_schema._version:
+                    raise ConcurrencyError()
+                new_batch = batch_schema.model_dump(
+                    exclude_unset=True, exclude_none=True
+                )
+                new_batch["version"] = batch_schema._version + 1
+                for field, value in new_batch.items():
+                    setattr(old_batch, field, value)
+                session.add(old_batch)
+                await session.flush()
+                return model_to_schema(old_batch)
+            new_batch = schema_to_model(batch_schema)
+            session.add(new_batch)
+            await session.flush()
+            return model_to_schema(new_batch)
+
+    async def bulk_insert(
+        self, batches: list[BatchSchema]
+    ) -> BulkCreateResult:
+        """Multi-row INSERT ... RETURNING, see DBBatchRepository."""
+        codes = [batch.batch_code for batch in batches]
+        async with async_session_scope() as session:
+            for _ in range(BULK_INSERT_ATTEMPTS):
+                existing = set()
+                for start in range(0, len(codes), LOOKUP_CHUNK):
+                    chunk = codes[start : start + LOOKUP_CHUNK]
+                    result = await session.execute(
+                        select_existing_codes(chunk)
+                    )
+                    existing.update(result.scalars())
+                fresh, errors = split_existing(batches, existing)
+                if not fresh:
+                    return BulkCreateResult(created=[], errors=errors)
+                try:
+                    async with session.begin_nested():
+                        created = await session.execute(
+                            bulk_insert_statement(),
+                            [schema_to_row(batch) for batch in fresh],
+                        )
+                        result = BulkCreateResult(
+                            created=[
+                                model_to_schema(batch)
+                                for batch in created.scalars()
+                            ],
+                            errors=errors,
+                        )
+                except IntegrityError as error:
+                    if not is_duplicate_code(error):
+                        raise
+                    continue
+                return result
+        raise ConcurrencyError()
+
+    async def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> BatchSchema | None:
+        """Atomically draw qty liters, see DBBatchRepository.consume."""
+        record = RecordSchema(
+            batch_id=batch_id,
+            consumed_at=datetime.now(UTC),
+            order_id=order_id,
+            qty=qty,
+        )
+        async with async_session_scope() as session:
+            stmt = consume_statement(batch_id, qty)
+            batch = (await session.execute(stmt)).scalars().one_or_none()
+            if batch is None:
+                return None
+            session.add(record_schema_to_model(record))
+            return model_to_schema(batch)
+
+    async def consume_many(
+        self, batch_id: int, records: list[RecordSchema]
+    ) -> list[BatchSchema | None]:
+        """Group of consumes as one write, see DBBatchRepository."""
+        refused = [None] * len(records)
+        async with async_session_scope() as session:
+            row = (
+                await session.execute(select_for_update(batch_id))
+            ).one_or_none()
+            if row is None:
+                return refused
+            volumes = accept_in_order(
+                row_to_schema(row).volume_liters,
+                [record.qty for record in records],
+            )
+            accepted = [
+                record.model_dump(exclude={"id"})
+                for record, volume in zip(records, volumes, strict=True)
+                if volume is not None
+            ]
+            if not accepted:
+                return refused
+            total = sum(row["qty"] for row in accepted)
+            batch = (
+                (await session.execute(consume_statement(batch_id, total)))
+                .scalars()
+                .one_or_none()
+            )
+            if batch is None:
+                raise ConcurrencyError()
+            await session.execute(insert_group_records_statement(), accepted)
+            return group_results(model_to_schema(batch), volumes)
+
+    async def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[RecordSchema] | None:
+        """FEFO draw-down across batches, see DBBatchRepository."""
+        async with async_session_scope() as session:
+            remaining, locked = qty, []
+            result = await session.stream_scalars(
+                select_fefo(min_fat_percent, max_fat_percent, self._fefo_lock)
+            )
+            async for batch in result:
+                locked.append(batch)
+                remaining -= batch.volume_liters
+                if remaining <= 0:
+                    break
+            await result.close()
+            if remaining > 0:
+                return None
+            draws, remaining = [], qty
+            for batch in locked:
+                take = draw_fefo(batch, remaining)
+                draws.append((batch.id, take))
+                remaining -= take
+            records = await session.execute(
+                insert_records_statement(),
+                fefo_record_rows(draws, order_id),
+            )
+            return [record_model_to_schema(r) for r in records.scalars()]
+
+    async def list_all_available(self) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            result = await session.execute(select_available(*BATCH_COLUMNS))
+            return [row_to_schema(row) for row in result]
+
+    async def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            stmt = select_available(*BATCH_COLUMNS).where(
+                BatchModel.expiry >= min_date,
+                BatchModel.expiry <= max_date,
+            )
+            result = await session.execute(stmt)
+            return [row_to_schema(row) for row in result]
+
+    async def read_by_id(self, batch_id: int) -> BatchSchema | None:
+        async with async_read_session_scope() as session:
+            stmt = select_available(*BATCH_COLUMNS).where(
+                BatchModel.id == batch_id
+            )
+            row = (await session.execute(stmt)).one_or_none()
+            return row_to_schema(row) if row else None
+
+    async def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> BatchSchema | None:
+        """Row-locked read_by_id, see DBBatchRepository.read_for_update."""
+        async with async_session_scope() as session:
+            stmt = select_for_update(batch_id, nowait)
+            row = (await session.execute(stmt)).one_or_none()
+            return row_to_schema(row) if row else None
+
+    async def soft_delete(self, batch_id: int) -> None:
+        async with async_session_scope() as session:
+            stmt = select(BatchModel).where(BatchModel.id == batch_id)
+            batch = (await session.execute(stmt)).scalars().one()
+            batch.is_deleted = True
+            session.add(batch)
+
+    async def list_all(self) -> list[BatchSchema]:
+        """Return all batches (including deleted)."""
+        async with async_read_session_scope() as session:
+            result = await session.execute(select(*BATCH_COLUMNS))
+            return [row_to_schema(row) for row in result]
+
+    async def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            result = await session.execute(select_page(limit, after))
+            return [row_to_schema(row) for row in result]
+
+    def iter_all(self) -> AsyncIterator[BatchSchema]:
+        # Streams outlive the request's unit of work: use a session of its own
+        return async_stream_rows(select_stream(), row_to_schema)
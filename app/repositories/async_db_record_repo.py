@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.domain.record_port import AsyncRecordPort, RecordRow
+from app.repositories.db.unit_of_work import (
+    async_read_session_scope,
+    async_session_scope,
+    async_stream_rows,
+    async_stream_session_factory,
+)
+from app.repositories.db_record_repo import (
+    EXPORT_CHUNK,
+    RECORD_COLUMNS,
+    insert_rows_statement,
+    model_to_schema,
+    row_to_schema,
+    schema_to_model,
+    select_export,
+    select_page,
+    select_stream,
+)
+from app.schemas.consumption_record import ConsumptionRecord as RecordSchema
+
+
+class AsyncDBRecordRepository(AsyncRecordPort):
+    def __init__(self):
+        pass
+
+    async def insert(self, record_schema: RecordSchema):
+        async with async_session_scope() as session:
+            new_record = schema_to_model(record_schema)
+            session.add(new_record)
+            await session.flush()
+            return model_to_schema(new_record)
+
+    async def insert_many(self, records: list[RecordSchema]) -> None:
+        async with async_session_scope() as session:
+            await session.execute(
+                insert_rows_statement(),
+                [record.model_dump(exclude={"id"}) for record in records],
+            )
+
+    async def list_all(self) -> list[RecordSchema]:
+        """Return all records."""
+        async with async_read_session_scope() as session:
+            result = await session.execute(select(*RECORD_COLUMNS))
+            return [row_to_schema(row) for row in result]
+
+    async def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[RecordSchema]:
+        async with async_read_session_scope() as session:
+            result = await session.execute(select_page(limit, after))
+            return [row_to_schema(row) for row in result]
+
+    def iter_all(self) -> AsyncIterator[RecordSchema]:
+        # Streams outlive the request's unit of work: use a session of its own
+        return async_stream_rows(select_stream(), row_to_schema)
+
+    def iter_export_chunks(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        batch_id: int | None = None,
+    ) -> AsyncIterator[Sequence[RecordRow]]:
+        session_factory = async_stream_session_factory()
+
+        async def chunks() -> AsyncIterator[Sequence[RecordRow]]:
+            async with session_factory() as session:
+                result = await session.stream(
+                    select_export(since, until, batch_id)
+                )
+                async for partition in result.tuples().partitions(
+                    EXPORT_CHUNK
+                ):
+                    yield partition
+
+        return chunks()
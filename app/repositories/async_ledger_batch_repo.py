@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.domain.batch_port import ConcurrencyError
+from app.observability.metrics import LEDGER_SNAPSHOTS
+from app.repositories.async_db_batch_repo import AsyncDBBatchRepository
+from app.repositories.db.models import Batch as BatchModel
+from app.repositories.db.unit_of_work import (
+    async_read_session_scope,
+    async_session_scope,
+    async_stream_rows,
+)
+from app.repositories.db_batch_repo import (
+    insert_group_records_statement,
+    row_to_schema,
+    select_page,
+    select_stream,
+)
+from app.repositories.db_record_repo import (
+    insert_many_statement as insert_records_statement,
+)
+from app.repositories.db_record_repo import (
+    model_to_schema as record_model_to_schema,
+)
+from app.repositories.ledger_batch_repo import (
+    LEDGER_COLUMNS,
+    compact_statement,
+    ledger_append,
+    select_head,
+    select_ledger_fefo,
+    select_live,
+    split_head,
+)
+from app.schemas.batches_schema import Batch as BatchSchema
+from app.schemas.consumption_record import ConsumptionRecord as RecordSchema
+
+
+class AsyncLedgerBatchRepository(AsyncDBBatchRepository):
+    """LedgerBatchRepository for AsyncSession, statement for statement."""
+
+    async def upsert(self, batch_schema: BatchSchema) -> BatchSchema:
+        """Fold the batch's ledger first, see LedgerBatchRepository."""
+        if batch_schema.id:
+            async with async_session_scope() as session:
+                await session.execute(compact_statement(batch_schema.id))
+        return await super().upsert(batch_schema)
+
+    async def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> BatchSchema | None:
+        """Append one ledger record, see LedgerBatchRepository.consume."""
+        (result,) = await self.consume_many(
+            batch_id,
+            [
+                RecordSchema(
+                    batch_id=batch_id,
+                    consumed_at=datetime.now(UTC),
+                    order_id=order_id,
+                    qty=qty,
+                )
+            ],
+        )
+        return result
+
+    async def consume_many(
+        self, batch_id: int, records: list[RecordSchema]
+    ) -> list[BatchSchema | None]:
+        async with async_session_scope() as session:
+            row = (await session.execute(select_head(batch_id))).one_or_none()
+            if row is None:
+                return [None] * len(records)
+            rows, results = ledger_append(*split_head(row), records)
+            if rows:
+                try:
+                    async with session.begin_nested():
+                        await session.execute(
+                            insert_group_records_statement(), rows
+                        )
+                except IntegrityError as error:
+                    raise ConcurrencyError() from error
+            return results
+
+    async def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[RecordSchema] | None:
+        consumed_at = datetime.now(UTC)
+        async with async_session_scope() as session:
+            remaining, rows = qty, []
+            result = await session.stream(
+                select_ledger_fefo(
+                    min_fat_percent, max_fat_percent, self._fefo_lock
+                )
+            )
+            async for row in result:
+                batch, head_seq = split_head(row)
+                take = min(batch.volume_liters, remaining)
+                record = RecordSchema(
+                    batch_id=batch.id,
+                    consumed_at=consumed_at,
+                    order_id=order_id,
+                    qty=take,
+                )
+                rows.extend(ledger_append(batch, head_seq, [record])[0])
+                remaining -= take
+                if remaining <= 0:
+                    break
+            await result.close()
+            if remaining > 0:
+                return None
+            try:
+                async with session.begin_nested():
+                    records = await session.execute(
+                        insert_records_statement(), rows
+                    )
+                    return [
+                        record_model_to_schema(r) for r in records.scalars()
+                    ]
+            except IntegrityError as error:
+                raise ConcurrencyError() from error
+
+    async def list_all_available(self) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            result = await session.execute(select_live(*LEDGER_COLUMNS))
+            return [row_to_schema(row) for row in result]
+
+    async def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            stmt = select_live(*LEDGER_COLUMNS).where(
+                BatchModel.expiry >= min_date,
+                BatchModel.expiry <= max_date,
+            )
+            result = await session.execute(stmt)
+            return [row_to_schema(row) for row in result]
+
+    async def read_by_id(self, batch_id: int) -> BatchSchema | None:
+        async with async_read_session_scope() as session:
+            stmt = select_live(*LEDGER_COLUMNS).where(
+                BatchModel.id == batch_id
+            )
+            row = (await session.execute(stmt)).one_or_none()
+            return row_to_schema(row) if row else None
+
+    async def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> BatchSchema | None:
+        async with async_session_scope() as session:
+            stmt = (
+                select_live(*LEDGER_COLUMNS)
+                .where(BatchModel.id == batch_id)
+                .with_for_update(of=BatchModel, nowait=nowait)
+            )
+            row = (await session.execute(stmt)).one_or_none()
+            return row_to_schema(row) if row else None
+
+    async def list_all(self) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            result = await session.execute(select(*LEDGER_COLUMNS))
+            return [row_to_schema(row) for row in result]
+
+    async def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            stmt = select_page(limit, after, LEDGER_COLUMNS)
+            result = await session.execute(stmt)
+            return [row_to_schema(row) for row in result]
+
+    def iter_all(self) -> AsyncIterator[BatchSchema]:
+        return async_stream_rows(select_stream(LEDGER_COLUMNS), row_to_schema)
+
+    async def compact(self) -> int:
+        """Snapshot every batch with a ledger tail; returns how many."""
+        async with async_session_scope() as session:
+            folded = (await session.execute(compact_statement())).rowcount
+        LEDGER_SNAPSHOTS.inc(amount=folded)
+        return folded
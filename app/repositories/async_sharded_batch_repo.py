@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import random
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime
+
+from sqlalchemy import insert, select, update
+
+from app.domain.batch_port import ConcurrencyError
+from app.domain.consume_combiner import accept_in_order, group_results
+from app.observability.metrics import SHARD_REBALANCES
+from app.repositories.async_db_batch_repo import AsyncDBBatchRepository
+from app.repositories.db.models import Batch as BatchModel
+from app.repositories.db.models import BatchShard as ShardModel
+from app.repositories.db.unit_of_work import (
+    async_read_session_scope,
+    async_session_scope,
+    async_stream_rows,
+)
+from app.repositories.db_batch_repo import (
+    consume_statement,
+    fefo_record_rows,
+    insert_group_records_statement,
+    row_to_schema,
+    select_page,
+    select_stream,
+)
+from app.repositories.db_record_repo import (
+    insert_many_statement as insert_records_statement,
+)
+from app.repositories.db_record_repo import (
+    model_to_schema as record_model_to_schema,
+)
+from app.repositories.db_record_repo import (
+    schema_to_model as record_schema_to_model,
+)
+from app.repositories.sharded_batch_repo import (
+    SHARDED_COLUMNS,
+    delete_shards_statement,
+    draw_shard_statement,
+    fold_statement,
+    lock_batch_statement,
+    select_live,
+    select_sharded_fefo,
+    select_shards,
+    select_spare_shard,
+    split_rows,
+    spread_rows,
+)
+from app.schemas.batches_schema import Batch as BatchSchema
+from app.schemas.bulk_schema import BulkCreateResult
+from app.schemas.consumption_record import ConsumptionRecord as RecordSchema
+
+
+class AsyncShardedBatchRepository(AsyncDBBatchRepository):
+    """ShardedBatchRepository for AsyncSession, statement for statement."""
+
+    def __init__(
+        self,
+        fefo_lock: str = "wait",
+        shards: int = 8,
+        min_liters: float = 0.0,
+    ) -> None:
+        super().__init__(fefo_lock)
+        self._shards = shards
+        self._min_liters = min_liters
+
+    def _split_rows(self, batches: list[BatchSchema]) -> list[dict]:
+        return [
+            row
+            for batch in batches
+            if not batch._is_deleted
+            and batch.volume_liters > 0
+            and batch.volume_liters >= self._min_liters
+            for row in split_rows(batch, self._shards)
+        ]
+
+    async def upsert(self, batch_schema: BatchSchema) -> BatchSchema:
+        """Fold, write and split again, see ShardedBatchRepository."""
+        if batch_schema.id:
+            async with async_session_scope() as session:
+                await session.execute(lock_batch_statement(batch_schema.id))
+                shards = await session.execute(select_shards(batch_schema.id))
+                if shards.all():
+                    await session.execute(fold_statement(batch_schema.id))
+                    await session.execute(
+                        delete_shards_statement(batch_schema.id)
+                    )
+        batch = await super().upsert(batch_schema)
+        rows = self._split_rows([batch])
+        if rows:
+            async with async_session_scope() as session:
+                await session.execute(insert(ShardModel), rows)
+        return batch
+
+    async def bulk_insert(
+        self, batches: list[BatchSchema]
+    ) -> BulkCreateResult:
+        result = await super().bulk_insert(batches)
+        rows = self._split_rows(result.created)
+        if rows:
+            async with async_session_scope() as session:
+                await session.execute(insert(ShardModel), rows)
+        return result
+
+    async def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> BatchSchema | None:
+        """Draw from one spare shard, see ShardedBatchRepository.consume."""
+        record = RecordSchema(
+            batch_id=batch_id,
+            consumed_at=datetime.now(UTC),
+            order_id=order_id,
+            qty=qty,
+        )
+        start = random.randrange(self._shards)  # noqa: S311
+        async with async_session_scope() as session:
+            for skip_locked in (True, False):
+                shard = (
+                    await session.execute(
+                        select_spare_shard(batch_id, qty, start, skip_locked)
+                    )
+                ).scalar_one_or_none()
+                if shard is not None:
+                    break
+            else:
+                (result,) = await self.consume_many(batch_id, [record])
+                return result
+            stmt = draw_shard_statement(batch_id, shard, qty)
+            if (await session.execute(stmt)).rowcount == 0:
+                raise ConcurrencyError()
+            session.add(record_schema_to_model(record))
+            row = (
+                await session.execute(
+                    select(*SHARDED_COLUMNS).where(BatchModel.id == batch_id)
+                )
+            ).one()
+            return row_to_schema(row)
+
+    async def consume_many(
+        self, batch_id: int, records: list[RecordSchema]
+    ) -> list[BatchSchema | None]:
+        refused = [None] * len(records)
+        async with async_session_scope() as session:
+            shards = (await session.execute(select_shards(batch_id))).all()
+            if not shards:
+                return await super().consume_many(batch_id, records)
+            row = (
+                await session.execute(
+                    select_live(*SHARDED_COLUMNS).where(
+                        BatchModel.id == batch_id
+                    )
+                )
+            ).one_or_none()
+            if row is None:
+                return refused
+            batch = row_to_schema(row)
+            volumes = accept_in_order(
+                batch.volume_liters, [record.qty for record in records]
+            )
+            accepted = [
+                record.model_dump(exclude={"id"})
+                for record, volume in zip(records, volumes, strict=True)
+                if volume is not None
+            ]
+            if not accepted:
+                return refused
+            left = min(volume for volume in volumes if volume is not None)
+            await session.execute(
+                update(ShardModel),
+                spread_rows(batch_id, shards, left, len(accepted)),
+            )
+            await session.execute(insert_group_records_statement(), accepted)
+            SHARD_REBALANCES.inc()
+            batch._version = batch._version + len(accepted)
+            return group_results(batch, volumes)
+
+    async def _draw_fefo(
+        self, session, batch: BatchSchema, qty: float
+    ) -> float:
+        shards = (await session.execute(select_shards(batch.id))).all()
+        if not shards:
+            take = min(batch.volume_liters, qty)
+            await session.execute(consume_statement(batch.id, take))
+            return take
+        volume = sum(shard.volume_liters for shard in shards)
+        take = min(volume, qty)
+        await session.execute(
+            update(ShardModel), spread_rows(batch.id, shards, volume - take, 1)
+        )
+        return take
+
+    async def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[RecordSchema] | None:
+        async with async_session_scope() as session:
+            remaining, picked = qty, []
+            result = await session.stream(
+                select_sharded_fefo(
+                    min_fat_percent, max_fat_percent, self._fefo_lock
+                )
+            )
+            async for row in result:
+                picked.append(row_to_schema(row))
+                remaining -= picked[-1].volume_liters
+                if remaining <= 0:
+                    break
+            await result.close()
+            if remaining > 0:
+                return None
+            draws, remaining = [], qty
+            async with session.begin_nested():
+                for batch in picked:
+                    take = await self._draw_fefo(session, batch, remaining)
+                    if take > 0:
+                        draws.append((batch.id, take))
+                        remaining -= take
+                if remaining > 0:
+                    raise ConcurrencyError()
+                records = await session.execute(
+                    insert_records_statement(),
+                    fefo_record_rows(draws, order_id),
+                )
+                return [record_model_to_schema(r) for r in records.scalars()]
+
+    async def list_all_available(self) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            result = await session.execute(select_live(*SHARDED_COLUMNS))
+            return [row_to_schema(row) for row in result]
+
+    async def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            stmt = select_live(*SHARDED_COLUMNS).where(
+                BatchModel.expiry >= min_date,
+                BatchModel.expiry <= max_date,
+            )
+            result = await session.execute(stmt)
+            return [row_to_schema(row) for row in result]
+
+    async def read_by_id(self, batch_id: int) -> BatchSchema | None:
+        async with async_read_session_scope() as session:
+            stmt = select_live(*SHARDED_COLUMNS).where(
+                BatchModel.id == batch_id
+            )
+            row = (await session.execute(stmt)).one_or_none()
+            return row_to_schema(row) if row else None
+
+    async def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> BatchSchema | None:
+        async with async_session_scope() as session:
+            stmt = (
+                select_live(*SHARDED_COLUMNS)
+                .where(BatchModel.id == batch_id)
+                .with_for_update(of=BatchModel, nowait=nowait)
+            )
+            row = (await session.execute(stmt)).one_or_none()
+            return row_to_schema(row) if row else None
+
+    async def list_all(self) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            result = await session.execute(select(*SHARDED_COLUMNS))
+            return [row_to_schema(row) for row in result]
+
+    async def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[BatchSchema]:
+        async with async_read_session_scope() as session:
+            stmt = select_page(limit, after, SHARDED_COLUMNS)
+            result = await session.execute(stmt)
+            return [row_to_schema(row) for row in result]
+
+    def iter_all(self) -> AsyncIterator[BatchSchema]:
+        return async_stream_rows(select_stream(SHARDED_COLUMNS), row_to_schema)
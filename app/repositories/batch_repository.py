@@ -1,14 +1,57 @@
-from datetime import datetime, timedelta
+import sys
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Iterator
+from datetime import UTC, datetime
 from itertools import count
+from threading import RLock
 
 from app.domain.batch_port import BatchPort, ConcurrencyError
+from app.domain.consume_combiner import accept_in_order, group_results
+from app.domain.record_port import RecordPort
 from app.schemas.batches_schema import Batch
+from app.schemas.bulk_schema import BulkCreateResult, BulkItemError
+from app.schemas.consumption_record import ConsumptionRecord
+
+
+def _fat_in_range(
+    batch: Batch, min_fat_percent: float | None, max_fat_percent: float | None
+) -> bool:
+    # Same semantics as SQL: an unknown fat_percent never matches a filter
+    if min_fat_percent is None and max_fat_percent is None:
+        return True
+    if batch.fat_percent is None:
+        return False
+    return (
+        min_fat_percent is None or batch.fat_percent >= min_fat_percent
+    ) and (max_fat_percent is None or batch.fat_percent <= max_fat_percent)
+
+
+def _is_live(batch: Batch) -> bool:
+    # Expiry is checked at read time; everything else is kept in the index
+    return batch.volume_liters > 0 and not batch._is_deleted
 
 
 class BatchRepository(BatchPort):
-    def __init__(self):
-        # In-memory "database"
-        self._db: list[Batch] = [
+    """
+    In-memory BatchPort for dev runs, load tests and no-DB deployments.
+
+    Batches are stored by id and never mutated in place: every write swaps
+    in a new copy under a lock, so concurrent threadpool requests cannot
+    lose updates. Live batches (volume left, not deleted) are also kept in
+    a list sorted by (expiry, id), which turns availability, near-expiry
+    and FEFO queries into a bisect plus a scan of the matching slice.
+    """
+
+    def __init__(self, record_port: RecordPort | None = None):
+        # Consumption records are written alongside the volume update
+        self._record_port = record_port
+        self._lock = RLock()
+        # In-memory "database" and its indexes
+        self._db: dict[int, Batch] = {}
+        self._ids: list[int] = []  # sorted, for keyset pages
+        self._codes: dict[str, int] = {}  # batch_code -> id
+        self._by_expiry: list[tuple[datetime, int]] = []  # live batches
+        for batch in (
             Batch(
                 id=1,
                 batch_code="SCH-20251204-0001",
@@ -25,67 +68,237 @@ class BatchRepository(BatchPort):
                 volume_liters=2000.0,
                 fat_percent=5.2,
             ),
-        ]
+        ):
+            self._store(batch)
         self._id_seq = count(3)  # simple auto-incrementing ID generator
 
+    def _store(self, batch: Batch) -> None:
+        """Insert or replace a batch and keep every index in step."""
+        old_batch = self._db.get(batch.id)
+        if old_batch is None:
+            insort(self._ids, batch.id)  # an append for fresh ids
+        else:
+            self._unindex(old_batch)
+        self._db[batch.id] = batch
+        self._codes[batch.batch_code] = batch.id
+        if _is_live(batch):
+            insort(self._by_expiry, (batch._expiry, batch.id))
+
+    def _unindex(self, batch: Batch) -> None:
+        key = (batch._expiry, batch.id)
+        i = bisect_left(self._by_expiry, key)
+        if i < len(self._by_expiry) and self._by_expiry[i] == key:
+            del self._by_expiry[i]
+        if self._codes.get(batch.batch_code) == batch.id:
+            del self._codes[batch.batch_code]
+
+    def _live_between(
+        self, min_date: datetime, max_date: datetime | None = None
+    ) -> Iterator[Batch]:
+        """Live batches with min_date <= expiry <= max_date, by expiry."""
+        start = bisect_left(self._by_expiry, (min_date,))
+        end = (
+            len(self._by_expiry)
+            if max_date is None
+            else bisect_right(self._by_expiry, (max_date, sys.maxsize))
+        )
+        for _, batch_id in self._by_expiry[start:end]:
+            yield self._db[batch_id]
+
+    def _available(self, batch_id: int) -> Batch | None:
+        batch = self._db.get(batch_id)
+        if batch is None or not _is_live(batch) or batch.is_expired():
+            return None
+        return batch
+
     def upsert(self, batch: Batch) -> Batch:
-        if batch.id:
-            batch.update_version()
-            for i, old_batch in enumerate(self._db):
-                if old_batch.id == batch.id:
-                    # Only update fields provided by the caller
-                    partial_update = batch.model_dump(
-                        exclude_unset=True, exclude_none=True
+        with self._lock:
+            old_batch = self._db.get(batch.id) if batch.id else None
+            if old_batch is not None:
+                batch.update_version()
+                # Only update fields provided by the caller
+                partial_update = batch.model_dump(
+                    exclude_unset=True, exclude_none=True
+                )
+                if old_batch._version >= batch._version:
+                    raise ConcurrencyError()
+                new_batch = old_batch.model_copy(update=partial_update)
+                new_batch.compute_expiry()
+                new_batch.update_version()
+                self._store(new_batch)
+                return new_batch.model_copy()
+            new_batch = Batch(
+                id=next(self._id_seq), **batch.model_dump(exclude={"id"})
+            )
+            self._store(new_batch)
+            return new_batch.model_copy()
+
+    def bulk_insert(self, batches: list[Batch]) -> BulkCreateResult:
+        created, errors = [], []
+        with self._lock:
+            for index, batch in enumerate(batches):
+                if batch.batch_code in self._codes:
+                    errors.append(
+                        BulkItemError(
+                            index=index,
+                            batch_code=batch.batch_code,
+                            detail="batch_code already exists",
+                        )
                     )
-                    if old_batch._version >= batch._version:
-                        raise ConcurrencyError()
-                    new_batch = old_batch.model_copy(update=partial_update)
-                    new_batch.update_version()
-                    self._db[i] = new_batch
-                    return new_batch
-        new_batch = Batch(
-            id=next(self._id_seq), **batch.model_dump(exclude={"id"})
+                    continue
+                new_batch = Batch(
+                    id=next(self._id_seq), **batch.model_dump(exclude={"id"})
+                )
+                self._store(new_batch)
+                created.append(new_batch.model_copy())
+        return BulkCreateResult(created=created, errors=errors)
+
+    def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch | None:
+        record = ConsumptionRecord(
+            batch_id=batch_id,
+            consumed_at=datetime.now(UTC),
+            order_id=order_id,
+            qty=qty,
         )
-        self._db.append(new_batch)
-        return new_batch.model_copy()
+        with self._lock:
+            batch = self._available(batch_id)
+            if batch is None or batch.volume_liters < qty:
+                return None
+            new_batch = batch.model_copy(
+                update={"volume_liters": batch.volume_liters - qty}
+            )
+            new_batch.update_version()
+            self._store(new_batch)
+            if self._record_port is not None:
+                self._record_port.insert(record)
+            return new_batch.model_copy()
+
+    def consume_many(
+        self, batch_id: int, records: list[ConsumptionRecord]
+    ) -> list[Batch | None]:
+        with self._lock:
+            batch = self._available(batch_id)
+            if batch is None:
+                return [None] * len(records)
+            volumes = accept_in_order(
+                batch.volume_liters, [record.qty for record in records]
+            )
+            accepted = [
+                record
+                for record, volume in zip(records, volumes, strict=True)
+                if volume is not None
+            ]
+            if not accepted:
+                return [None] * len(records)
+            # Volumes only go down, so the smallest is what is left
+            new_batch = batch.model_copy(
+                update={
+                    "volume_liters": min(v for v in volumes if v is not None)
+                }
+            )
+            new_batch.update_version()
+            self._store(new_batch)
+            if self._record_port is not None:
+                for record in accepted:
+                    self._record_port.insert(record)
+            return group_results(new_batch, volumes)
+
+    def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[ConsumptionRecord] | None:
+        consumed_at = datetime.now(UTC)
+        with self._lock:
+            remaining, draws = qty, []
+            for batch in self._live_between(consumed_at):
+                if not _fat_in_range(batch, min_fat_percent, max_fat_percent):
+                    continue
+                take = min(batch.volume_liters, remaining)
+                draws.append((batch, take))
+                remaining -= take
+                if remaining <= 0:
+                    break
+            if remaining > 0:
+                return None
+            records = [
+                ConsumptionRecord(
+                    batch_id=batch.id,
+                    consumed_at=consumed_at,
+                    order_id=order_id,
+                    qty=take,
+                )
+                for batch, take in draws
+            ]
+            allocation = []
+            for (batch, take), record in zip(draws, records, strict=True):
+                new_batch = batch.model_copy(
+                    update={"volume_liters": batch.volume_liters - take}
+                )
+                new_batch.update_version()
+                self._store(new_batch)
+                stored = None
+                if self._record_port is not None:
+                    stored = self._record_port.insert(record)
+                allocation.append(stored or record)
+            return allocation
 
     def list_all_available(self) -> list[Batch]:
-        return [
-            batch.model_copy()
-            for batch in self._db
-            if batch.volume_liters > 0
-            and not batch.is_expired()
-            and not batch._is_deleted
-        ]
+        with self._lock:
+            return [
+                batch.model_copy()
+                for batch in self._live_between(datetime.now(UTC))
+            ]
 
     def list_all_between_dates(
         self, min_date: datetime, max_date: datetime
     ) -> list[Batch]:
-        return [
-            batch.model_copy()
-            for batch in self._db
-            if min_date
-            <= batch.received_at + timedelta(days=batch.shelf_life_days)
-            <= max_date
-            and not batch.is_expired()
-            and not batch._is_deleted
-        ]
+        with self._lock:
+            return [
+                batch.model_copy()
+                for batch in self._live_between(
+                    max(min_date, datetime.now(UTC)), max_date
+                )
+            ]
 
     def read_by_id(self, batch_id: int) -> Batch | None:
-        for batch in self._db:
-            if (
-                batch.id == batch_id
-                and batch.volume_liters > 0
-                and not batch.is_expired()
-                and not batch._is_deleted
-            ):
-                return batch.model_copy()
-        return None
+        with self._lock:
+            batch = self._available(batch_id)
+            return batch.model_copy() if batch else None
+
+    def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> Batch | None:
+        # No transactions to hold a lock across calls: a plain read, and
+        # upsert's version check still rejects an interleaved writer
+        return self.read_by_id(batch_id)
 
     def soft_delete(self, batch_id: int) -> None:
-        for batch in self._db:
-            if batch.id == batch_id:
-                batch._is_deleted = True
+        with self._lock:
+            batch = self._db.get(batch_id)
+            if batch is None:
+                return
+            deleted = batch.model_copy()
+            deleted._is_deleted = True
+            self._store(deleted)
 
     def list_all(self) -> list[Batch]:
-        return self._db
+        with self._lock:
+            return list(self._db.values())
+
+    def list_page(self, limit: int, after: int | None = None) -> list[Batch]:
+        with self._lock:
+            start = 0 if after is None else bisect_right(self._ids, after)
+            return [
+                self._db[batch_id]
+                for batch_id in self._ids[start : start + limit]
+            ]
+
+    def iter_all(self) -> Iterator[Batch]:
+        with self._lock:
+            snapshot = list(self._db.values())
+        yield from snapshot
@@ -0,0 +1,278 @@
+"""
+Group commit for consumption records (DAIRY_STORE_AUDIT_WRITER_ENABLED).
+
+RecordPort.insert hands the record to an in-process queue instead of
+writing it, once the request's unit of work has committed (a request
+that rolls back queues nothing). A background writer takes records off
+the queue until it has `max_batch` of them or `interval` seconds have
+passed since the first, then writes them with one multi-row insert in a
+transaction of its own. The insert returns at once: the record commits
+after the request's unit of work, and a failed flush is logged and its
+records are lost.
+
+With wait=True (DAIRY_STORE_AUDIT_WRITER_WAIT) records are not queued
+but written in the caller's unit of work, so a consume is acknowledged
+only with its record committed, atomically with its volume update. A
+request cannot wait for a group written in another transaction instead:
+the group would need the rows the request still holds locked.
+
+stop() drains the queue, so records accepted before shutdown are written.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from contextlib import (
+    AbstractAsyncContextManager,
+    AbstractContextManager,
+    nullcontext,
+)
+from datetime import datetime
+from functools import partial
+
+from app.domain.record_port import AsyncRecordPort, RecordPort, RecordRow
+from app.observability.metrics import (
+    AUDIT_FLUSH_SECONDS,
+    AUDIT_FLUSH_SIZE,
+    AUDIT_QUEUE_DEPTH,
+)
+from app.repositories.db.unit_of_work import after_commit, async_after_commit
+from app.schemas.consumption_record import ConsumptionRecord
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # queued by close(): flush what is left, then exit
+
+
+class AuditWriter:
+    """Background group-commit writer for a RecordPort (one thread)."""
+
+    def __init__(
+        self,
+        record_port: RecordPort,
+        transaction: Callable[[], AbstractContextManager] = nullcontext,
+        max_batch: int = 500,
+        interval: float = 0.01,
+    ) -> None:
+        self._record_port = record_port
+        self._transaction = transaction
+        self._max_batch = max_batch
+        self._interval = interval
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        AUDIT_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    def write(self, record: ConsumptionRecord) -> None:
+        """Queue record for the next group."""
+        self._ensure_started()
+        self._queue.put(record)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="audit-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            group, deadline = [item], time.monotonic() + self._interval
+            while len(group) < self._max_batch:
+                try:
+                    item = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                group.append(item)
+            self._flush(group)
+
+    def _flush(self, group: list[ConsumptionRecord]) -> None:
+        start = time.perf_counter()
+        try:
+            with self._transaction():
+                self._record_port.insert_many(group)
+        except Exception:
+            logger.exception("dropped %d audit records", len(group))
+        AUDIT_FLUSH_SECONDS.observe(time.perf_counter() - start)
+        AUDIT_FLUSH_SIZE.observe(len(group))
+
+    def close(self) -> None:
+        """Write everything queued so far, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+
+    async def stop(self) -> None:
+        await asyncio.to_thread(self.close)
+
+
+class AsyncAuditWriter:
+    """AuditWriter for an AsyncRecordPort (one task on the event loop)."""
+
+    def __init__(
+        self,
+        record_port: AsyncRecordPort,
+        transaction: Callable[[], AbstractAsyncContextManager] = nullcontext,
+        max_batch: int = 500,
+        interval: float = 0.01,
+    ) -> None:
+        self._record_port = record_port
+        self._transaction = transaction
+        self._max_batch = max_batch
+        self._interval = interval
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        AUDIT_QUEUE_DEPTH.set_function(self._depth)
+
+    def _depth(self) -> int:
+        return self._queue.qsize()
+
+    def write(self, record: ConsumptionRecord) -> None:
+        """See AuditWriter.write."""
+        self._ensure_started()
+        self._queue.put_nowait(record)
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.get_loop() is not loop:
+            # Queue and task belong to one loop (test clients run several)
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            group, deadline = [item], time.monotonic() + self._interval
+            while len(group) < self._max_batch:
+                try:
+                    item = await asyncio.wait_for(
+                        self._queue.get(),
+                        max(0.0, deadline - time.monotonic()),
+                    )
+                except TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                group.append(item)
+            await self._flush(group)
+
+    async def _flush(self, group: list[ConsumptionRecord]) -> None:
+        start = time.perf_counter()
+        try:
+            async with self._transaction():
+                await self._record_port.insert_many(group)
+        except Exception:
+            logger.exception("dropped %d audit records", len(group))
+        AUDIT_FLUSH_SECONDS.observe(time.perf_counter() - start)
+        AUDIT_FLUSH_SIZE.observe(len(group))
+
+    async def stop(self) -> None:
+        """Write everything queued so far, then end the writer task."""
+        task, self._task = self._task, None
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            return
+        self._queue.put_nowait(_STOP)
+        await task
+
+
+class BufferedRecordRepository(RecordPort):
+    """RecordPort whose inserts go through an AuditWriter unless wait."""
+
+    def __init__(
+        self, inner: RecordPort, writer: AuditWriter, wait: bool = True
+    ) -> None:
+        self._inner = inner
+        self._writer = writer
+        self._wait = wait
+
+    def insert(self, record: ConsumptionRecord) -> None:
+        if self._wait:
+            self._inner.insert(record)
+        else:
+            after_commit(partial(self._writer.write, record))
+
+    def insert_many(self, records: list[ConsumptionRecord]) -> None:
+        self._inner.insert_many(records)
+
+    def list_all(self) -> list[ConsumptionRecord]:
+        return self._inner.list_all()
+
+    def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[ConsumptionRecord]:
+        return self._inner.list_page(limit, after)
+
+    def iter_all(self) -> Iterator[ConsumptionRecord]:
+        return self._inner.iter_all()
+
+    def iter_export_chunks(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        batch_id: int | None = None,
+    ) -> Iterator[Sequence[RecordRow]]:
+        return self._inner.iter_export_chunks(since, until, batch_id)
+
+
+class AsyncBufferedRecordRepository(AsyncRecordPort):
+    """BufferedRecordRepository for an AsyncRecordPort."""
+
+    def __init__(
+        self,
+        inner: AsyncRecordPort,
+        writer: AsyncAuditWriter,
+        wait: bool = True,
+    ) -> None:
+        self._inner = inner
+        self._writer = writer
+        self._wait = wait
+
+    async def insert(self, record: ConsumptionRecord) -> None:
+        if self._wait:
+            await self._inner.insert(record)
+        else:
+            async_after_commit(partial(self._writer.write, record))
+
+    async def insert_many(self, records: list[ConsumptionRecord]) -> None:
+        await self._inner.insert_many(records)
+
+    async def list_all(self) -> list[ConsumptionRecord]:
+        return await self._inner.list_all()
+
+    async def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[ConsumptionRecord]:
+        return await self._inner.list_page(limit, after)
+
+    def iter_all(self) -> AsyncIterator[ConsumptionRecord]:
+        return self._inner.iter_all()
+
+    def iter_export_chunks(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        batch_id: int | None = None,
+    ) -> AsyncIterator[Sequence[RecordRow]]:
+        return self._inner.iter_export_chunks(since, until, batch_id)
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator
+from datetime import UTC, datetime
+from threading import Lock
+
+from app.domain.batch_port import AsyncBatchPort, BatchPort
+from app.schemas.batches_schema import Batch
+from app.schemas.bulk_schema import BulkCreateResult
+from app.schemas.consumption_record import ConsumptionRecord
+
+
+class BatchCache:
+    """
+    Bounded, thread-safe LRU of batches keyed by id, with a TTL.
+
+    Only live batches (volume left, not deleted) are cached. An entry is
+    only replaced by a batch of at least its `_version`, and invalidate()
+    leaves a tombstone holding the version floor for `ttl_seconds`, so a
+    slow read that finishes after a write cannot put the older row back.
+    Entries never outlive the batch's `_expiry`. The cache is per process:
+    other workers' writes show up here after at most `ttl_seconds`.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        self._max_size = max_size
+        self._ttl = ttl_seconds
+        self._lock = Lock()
+        # id -> (batch or None for a tombstone, monotonic deadline, lowest
+        # _version that may be put)
+        self._entries: OrderedDict[int, tuple[Batch | None, float, int]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # dropped for capacity
+        self.expirations = 0  # dropped for TTL or batch expiry
+        self.invalidations = 0  # dropped because of a write
+
+    def get(self, batch_id: int) -> Batch | None:
+        with self._lock:
+            entry = self._entries.get(batch_id)
+            if entry is not None:
+                batch, deadline, _ = entry
+                if time.monotonic() >= deadline:
+                    del self._entries[batch_id]
+                    self.expirations += batch is not None
+                elif batch is None:
+                    pass  # tombstone: written recently, read the store
+                elif not batch.is_expired():
+                    self._entries.move_to_end(batch_id)
+                    self.hits += 1
+                    return batch.model_copy()
+                else:
+                    del self._entries[batch_id]
+                    self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, batch: Batch) -> None:
+        if batch.volume_liters <= 0 or batch._is_deleted:
+            return
+        ttl = min(
+            self._ttl,
+            (batch._expiry - datetime.now(UTC)).total_seconds(),
+        )
+        if ttl <= 0:
+            return
+        with self._lock:
+            current = self._entries.get(batch.id)
+            if (
+                current is not None
+                and time.monotonic() < current[1]
+                and batch._version < current[2]
+            ):
+                return
+            self._store(
+                batch.id,
+                (batch.model_copy(), time.monotonic() + ttl, batch._version),
+            )
+
+    def invalidate(self, batch_id: int, version: int | None = None) -> None:
+        """
+        Drop the batch after a write. Until `ttl_seconds` have passed only
+        batches of at least `version` (the version written) are put back;
+        without it, only batches newer than the dropped entry.
+        """
+        with self._lock:
+            floor = version or 0
+            current = self._entries.get(batch_id)
+            if current is not None and time.monotonic() < current[1]:
+                batch, _, current_floor = current
+                if batch is not None:
+                    self.invalidations += 1
+                    current_floor += version is None
+                floor = max(floor, current_floor)
+            if floor:
+                self._store(
+                    batch_id, (None, time.monotonic() + self._ttl, floor)
+                )
+            else:
+                self._entries.pop(batch_id, None)
+
+    def _store(
+        self, batch_id: int, entry: tuple[Batch | None, float, int]
+    ) -> None:
+        self._entries[batch_id] = entry
+        self._entries.move_to_end(batch_id)
+        while len(self._entries) > self._max_size:
+            _, (evicted, _, _) = self._entries.popitem(last=False)
+            self.evictions += evicted is not None
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": sum(
+                    batch is not None for batch, _, _ in self._entries.values()
+                ),
+                "max_size": self._max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def newest_version(results: list[Batch | None]) -> int | None:
+    """The version a consume_many group left, None if it wrote nothing."""
+    versions = [batch._version for batch in results if batch is not None]
+    return max(versions, default=None)
+
+
+class CachedBatchRepository(BatchPort):
+    """Read-through cache for read_by_id in front of another BatchPort."""
+
+    def __init__(self, inner: BatchPort, cache: BatchCache) -> None:
+        self._inner = inner
+        self.cache = cache
+
+    def read_by_id(self, batch_id: int) -> Batch | None:
+        batch = self.cache.get(batch_id)
+        if batch is not None:
+            return batch
+        batch = self._inner.read_by_id(batch_id)
+        if batch is not None:
+            self.cache.put(batch)
+        return batch
+
+    def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> Batch | None:
+        # Always from the store: the caller is about to write
+        return self._inner.read_for_update(batch_id, nowait)
+
+    def upsert(self, batch: Batch) -> Batch:
+        # Before: a version conflict must not retry on the cached copy.
+        # After, not put: the unit of work may still roll back the write
+        if not batch.id:
+            return self._inner.upsert(batch)
+        self.cache.invalidate(batch.id)
+        written = self._inner.upsert(batch)
+        self.cache.invalidate(written.id, written._version)
+        return written
+
+    def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch | None:
+        batch = self._inner.consume(batch_id, qty, order_id)
+        if batch is not None:
+            self.cache.invalidate(batch_id, batch._version)
+        return batch
+
+    def consume_many(
+        self, batch_id: int, records: list[ConsumptionRecord]
+    ) -> list[Batch | None]:
+        results = self._inner.consume_many(batch_id, records)
+        version = newest_version(results)
+        if version is not None:
+            self.cache.invalidate(batch_id, version)
+        return results
+
+    def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[ConsumptionRecord] | None:
+        allocation = self._inner.consume_fefo(
+            qty, order_id, min_fat_percent, max_fat_percent
+        )
+        for record in allocation or []:
+            self.cache.invalidate(record.batch_id)
+        return allocation
+
+    def soft_delete(self, batch_id: int) -> None:
+        self._inner.soft_delete(batch_id)
+        self.cache.invalidate(batch_id)
+
+    def bulk_insert(self, batches: list[Batch]) -> BulkCreateResult:
+        return self._inner.bulk_insert(batches)
+
+    def list_all_available(self) -> list[Batch]:
+        return self._inner.list_all_available()
+
+    def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[Batch]:
+        return self._inner.list_all_between_dates(min_date, max_date)
+
+    def list_all(self) -> list[Batch]:
+        return self._inner.list_all()
+
+    def list_page(self, limit: int, after: int | None = None) -> list[Batch]:
+        return self._inner.list_page(limit, after)
+
+    def iter_all(self) -> Iterator[Batch]:
+        return self._inner.iter_all()
+
+
+class AsyncCachedBatchRepository(AsyncBatchPort):
+    """CachedBatchRepository for an AsyncBatchPort."""
+
+    def __init__(self, inner: AsyncBatchPort, cache: BatchCache) -> None:
+        self._inner = inner
+        self.cache = cache
+
+    async def read_by_id(self, batch_id: int) -> Batch | None:
+        batch = self.cache.get(batch_id)
+        if batch is not None:
+            return batch
+        batch = await self._inner.read_by_id(batch_id)
+        if batch is not None:
+            self.cache.put(batch)
+        return batch
+
+    async def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> Batch | None:
+        return await self._inner.read_for_update(batch_id, nowait)
+
+    async def upsert(self, batch: Batch) -> Batch:
+        if not batch.id:
+            return await self._inner.upsert(batch)
+        self.cache.invalidate(batch.id)
+        written = await self._inner.upsert(batch)
+        self.cache.invalidate(written.id, written._version)
+        return written
+
+    async def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch | None:
+        batch = await self._inner.consume(batch_id, qty, order_id)
+        if batch is not None:
+            self.cache.invalidate(batch_id, batch._version)
+        return batch
+
+    async def consume_many(
+        self, batch_id: int, records: list[ConsumptionRecord]
+    ) -> list[Batch | None]:
+        results = await self._inner.consume_many(batch_id, records)
+        version = newest_version(results)
+        if version is not None:
+            self.cache.invalidate(batch_id, version)
+        return results
+
+    async def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[ConsumptionRecord] | None:
+        allocation = await self._inner.consume_fefo(
+            qty, order_id, min_fat_percent, max_fat_percent
+        )
+        for record in allocation or []:
+            self.cache.invalidate(record.batch_id)
+        return allocation
+
+    async def soft_delete(self, batch_id: int) -> None:
+        await self._inner.soft_delete(batch_id)
+        self.cache.invalidate(batch_id)
+
+    async def bulk_insert(self, batches: list[Batch]) -> BulkCreateResult:
+        return await self._inner.bulk_insert(batches)
+
+    async def list_all_available(self) -> list[Batch]:
+        return await self._inner.list_all_available()
+
+    async def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[Batch]:
+        return await self._inner.list_all_between_dates(min_date, max_date)
+
+    async def list_all(self) -> list[Batch]:
+        return await self._inner.list_all()
+
+    async def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[Batch]:
+        return await self._inner.list_page(limit, after)
+
+    def iter_all(self) -> AsyncIterator[Batch]:
+        return self._inner.iter_all()
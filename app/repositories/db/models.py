@@ -6,8 +6,10 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
+    text,
 )
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -26,6 +28,10 @@ class Batch(Base):
     is_deleted = Column(Boolean, nullable=False)
     version = Column(Integer, nullable=False)
     expiry = Column(DateTime(timezone=True), nullable=False)
+    # Ledger mode: volume_liters is a snapshot up to this record seq
+    ledger_seq = Column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
 
     # optional: consumption records backref
     consumption_records = relationship(
@@ -34,6 +40,17 @@ class Batch(Base):
         cascade="all, delete-orphan",
     )
 
+    __table_args__ = (
+        # Availability and FEFO scans only ever look at live batches
+        Index(
+            "ix_batches_live_expiry",
+            "expiry",
+            "id",
+            postgresql_where=text("NOT is_deleted AND volume_liters > 0"),
+            sqlite_where=text("NOT is_deleted AND volume_liters > 0"),
+        ),
+    )
+
 
 class ConsumptionRecord(Base):
     __tablename__ = "consumption_records"
@@ -43,10 +60,45 @@ class ConsumptionRecord(Base):
         Integer,
         ForeignKey("batches.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     consumed_at = Column(DateTime(timezone=True), nullable=False)
     order_id = Column(String(64), nullable=True)
     qty = Column(Float, nullable=False)
+    # Ledger mode only: position in the batch's ledger, volume left after
+    seq = Column(Integer, nullable=True)
+    balance = Column(Float, nullable=True)
 
     batch = relationship("Batch", back_populates="consumption_records")
+
+    __table_args__ = (
+        # Also serves plain batch_id lookups and the FK cascade
+        Index(
+            "ix_consumption_records_batch_id_consumed_at",
+            "batch_id",
+            "consumed_at",
+        ),
+        # One record per ledger position: concurrent appends of the same
+        # seq conflict here; also finds a batch's newest entry
+        Index(
+            "ux_consumption_records_batch_id_seq",
+            "batch_id",
+            "seq",
+            unique=True,
+        ),
+    )
+
+
+class BatchShard(Base):
+    """Sharded mode: one slice of a hot batch's volume."""
+
+    __tablename__ = "batch_shards"
+
+    batch_id = Column(
+        Integer,
+        ForeignKey("batches.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    shard = Column(Integer, primary_key=True)
+    volume_liters = Column(Float, nullable=False)
+    # Consumes drawn from this shard since the batch was split
+    version = Column(Integer, nullable=False)
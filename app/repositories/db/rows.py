@@ -0,0 +1,35 @@
+from datetime import UTC, datetime
+from typing import Any
+
+from pydantic import BaseModel
+
+
+def as_utc(value: datetime) -> datetime:
+    """Normalize a datetime read from the DB to UTC (naive means UTC)."""
+    if value.tzinfo is UTC:
+        return value
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
+def construct_trusted[SchemaT: BaseModel](
+    schema_cls: type[SchemaT],
+    values: dict[str, Any],
+    private: dict[str, Any] | None = None,
+) -> SchemaT:
+    """
+    Build a schema instance from field values the database already
+    guarantees, without running any validator. `values` is adopted as the
+    instance __dict__, so pass a fresh dict with every field.
+
+    Leaves the instance in the same state as model_construct with every
+    field set. model_construct itself is no cheaper than model_validate
+    for our schemas, so the state is written directly.
+    """
+    instance = schema_cls.__new__(schema_cls)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", set(values))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", private)
+    return instance
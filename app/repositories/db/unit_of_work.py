@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import Executable, Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.repositories.db.session import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+)
+
+# Set by read_from_primary(): reads go to the primary, not the replica
+_read_primary: ContextVar[bool] = ContextVar("read_primary", default=False)
+
+
+@contextmanager
+def read_from_primary() -> Iterator[None]:
+    """
+    Send the reads made inside the block to the primary, for callers that
+    must see writes the replica may not have applied yet.
+    """
+    token = _read_primary.set(True)
+    try:
+        yield
+    finally:
+        _read_primary.reset(token)
+
+
+class UnitOfWork:
+    """
+    One Session, and so one transaction, shared by every repository call
+    made while it is active. The session is opened on first use, so a
+    request that never touches the database never checks out a connection.
+
+    Read-only queries use `read_session`, a second session on the replica
+    from read_session_factory, if there is one.
+
+    Callbacks registered with after_commit run once commit() succeeds;
+    closing without a commit (the request failed) drops them.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker = SessionLocal,
+        read_session_factory: sessionmaker | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._read_session_factory = read_session_factory
+        self._session: Session | None = None
+        self._read_session: Session | None = None
+        self._after_commit: list[Callable[[], None]] = []
+
+    @property
+    def session(self) -> Session:
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    @property
+    def read_session_factory(self) -> sessionmaker:
+        """
+        The replica's factory, until this unit of work has used its primary
+        session (written or locked) or reads are pinned with
+        read_from_primary(); from then on the primary's, so it reads its
+        own writes.
+        """
+        if (
+            self._read_session_factory is None
+            or self._session is not None
+            or _read_primary.get()
+        ):
+            return self._session_factory
+        return self._read_session_factory
+
+    @property
+    def read_session(self) -> Session:
+        """The session of read_session_factory."""
+        if self.read_session_factory is self._session_factory:
+            return self.session
+        if self._read_session is None:
+            self._read_session = self._read_session_factory()
+        return self._read_session
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        self._after_commit.append(callback)
+
+    def commit(self) -> None:
+        if self._session is not None:
+            self._session.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def close(self) -> None:
+        # Closing an uncommitted session rolls its transaction back
+        self._after_commit.clear()
+        if self._session is not None:
+            self._session.close()
+        if self._read_session is not None:
+            self._read_session.close()
+
+
+class AsyncUnitOfWork:
+    """UnitOfWork for AsyncSession."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        read_session_factory: async_sessionmaker | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._read_session_factory = read_session_factory
+        self._session: AsyncSession | None = None
+        self._read_session: AsyncSession | None = None
+        self._after_commit: list[Callable[[], None]] = []
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    @property
+    def read_session_factory(self) -> async_sessionmaker:
+        """See UnitOfWork.read_session_factory."""
+        if (
+            self._read_session_factory is None
+            or self._session is not None
+            or _read_primary.get()
+        ):
+            return self._session_factory
+        return self._read_session_factory
+
+    @property
+    def read_session(self) -> AsyncSession:
+        """See UnitOfWork.read_session."""
+        if self.read_session_factory is self._session_factory:
+            return self.session
+        if self._read_session is None:
+            self._read_session = self._read_session_factory()
+        return self._read_session
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        self._after_commit.append(callback)
+
+    async def commit(self) -> None:
+        if self._session is not None:
+            await self._session.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    async def close(self) -> None:
+        self._after_commit.clear()
+        if self._session is not None:
+            await self._session.close()
+        if self._read_session is not None:
+            await self._read_session.close()
+
+
+_current_uow: ContextVar[UnitOfWork | None] = ContextVar(
+    "unit_of_work", default=None
+)
+_current_async_uow: ContextVar[AsyncUnitOfWork | None] = ContextVar(
+    "async_unit_of_work", default=None
+)
+
+
+@asynccontextmanager
+async def request_unit_of_work(
+    session_factory: sessionmaker = SessionLocal,
+    read_session_factory: sessionmaker | None = None,
+) -> AsyncIterator[UnitOfWork]:
+    """
+    Bind a UnitOfWork to the current context and commit it once the body
+    succeeds. Threadpool calls copy the context, so repositories called
+    through call_service see it; blocking commit/close run there too.
+    """
+    uow = UnitOfWork(session_factory, read_session_factory)
+    token = _current_uow.set(uow)
+    try:
+        yield uow
+        await run_in_threadpool(uow.commit)
+    finally:
+        _current_uow.reset(token)
+        await run_in_threadpool(uow.close)
+
+
+@contextmanager
+def unit_of_work(
+    session_factory: sessionmaker = SessionLocal,
+    read_session_factory: sessionmaker | None = None,
+) -> Iterator[UnitOfWork]:
+    """request_unit_of_work for synchronous code (scripts, benchmarks)."""
+    uow = UnitOfWork(session_factory, read_session_factory)
+    token = _current_uow.set(uow)
+    try:
+        yield uow
+        uow.commit()
+    finally:
+        _current_uow.reset(token)
+        uow.close()
+
+
+@asynccontextmanager
+async def async_request_unit_of_work(
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+    read_session_factory: async_sessionmaker | None = None,
+) -> AsyncIterator[AsyncUnitOfWork]:
+    """request_unit_of_work for AsyncSession."""
+    uow = AsyncUnitOfWork(session_factory, read_session_factory)
+    token = _current_async_uow.set(uow)
+    try:
+        yield uow
+        await uow.commit()
+    finally:
+        _current_async_uow.reset(token)
+        await uow.close()
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    The active unit of work's session, flushed on exit and committed by
+    the unit of work; without one, a standalone session committed on exit.
+    """
+    uow = _current_uow.get()
+    if uow is not None:
+        yield uow.session
+        uow.session.flush()
+        return
+    with SessionLocal() as session:
+        yield session
+        session.commit()
+
+
+@asynccontextmanager
+async def async_session_scope() -> AsyncIterator[AsyncSession]:
+    """session_scope for AsyncSession."""
+    uow = _current_async_uow.get()
+    if uow is not None:
+        yield uow.session
+        await uow.session.flush()
+        return
+    async with AsyncSessionLocal() as session:
+        yield session
+        await session.commit()
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """
+    Call callback once the active unit of work commits, and never if it
+    rolls back; without one, at once (session_scope has committed).
+    """
+    uow = _current_uow.get()
+    if uow is None:
+        callback()
+    else:
+        uow.after_commit(callback)
+
+
+def async_after_commit(callback: Callable[[], None]) -> None:
+    """after_commit for AsyncUnitOfWork."""
+    uow = _current_async_uow.get()
+    if uow is None:
+        callback()
+    else:
+        uow.after_commit(callback)
+
+
+@contextmanager
+def read_session_scope() -> Iterator[Session]:
+    """
+    session_scope for read-only queries: the active unit of work's
+    read_session; without one, a standalone replica session (a primary
+    one under read_from_primary()).
+    """
+    uow = _current_uow.get()
+    if uow is not None:
+        yield uow.read_session
+        return
+    session_factory = SessionLocal if _read_primary.get() else ReadSessionLocal
+    with session_factory() as session:
+        yield session
+
+
+@asynccontextmanager
+async def async_read_session_scope() -> AsyncIterator[AsyncSession]:
+    """read_session_scope for AsyncSession."""
+    uow = _current_async_uow.get()
+    if uow is not None:
+        yield uow.read_session
+        return
+    session_factory = (
+        AsyncSessionLocal if _read_primary.get() else AsyncReadSessionLocal
+    )
+    async with session_factory() as session:
+        yield session
+
+
+def stream_session_factory() -> sessionmaker:
+    """
+    Factory for the session of a stream, which outlives the request's unit
+    of work: the one read_session_scope reads from when this is called.
+    Call it when the stream is asked for, not while it is iterated, as
+    read_from_primary() (and the request's unit of work) is over by then.
+    """
+    uow = _current_uow.get()
+    if uow is not None:
+        return uow.read_session_factory
+    return SessionLocal if _read_primary.get() else ReadSessionLocal
+
+
+def async_stream_session_factory() -> async_sessionmaker:
+    """stream_session_factory for AsyncSession."""
+    uow = _current_async_uow.get()
+    if uow is not None:
+        return uow.read_session_factory
+    return AsyncSessionLocal if _read_primary.get() else AsyncReadSessionLocal
+
+
+def stream_rows[T](
+    statement: Executable, convert: Callable[[Row], T]
+) -> Iterator[T]:
+    """
+    Iterate convert(row) over the rows of statement, streamed from a
+    session of their own (see stream_session_factory).
+    """
+    session_factory = stream_session_factory()
+
+    def rows() -> Iterator[T]:
+        with session_factory() as session:
+            for row in session.execute(statement):
+                yield convert(row)
+
+    return rows()
+
+
+def async_stream_rows[T](
+    statement: Executable, convert: Callable[[Row], T]
+) -> AsyncIterator[T]:
+    """stream_rows for AsyncSession."""
+    session_factory = async_stream_session_factory()
+
+    async def rows() -> AsyncIterator[T]:
+        async with session_factory() as session:
+            result = await session.stream(statement)
+            async for row in result:
+                yield convert(row)
+
+    return rows()
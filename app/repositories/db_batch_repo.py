@@ -1,37 +1,97 @@
 from __future__ import annotations
 
-from datetime import datetime
+from collections.abc import Iterator, Sequence
+from datetime import UTC, datetime
 
-from sqlalchemy import func, select
+from sqlalchemy import (
+    Insert,
+    Select,
+    Update,
+    func,
+    insert,
+    literal_column,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
 
 from app.domain.batch_port import BatchPort, ConcurrencyError
+from app.domain.consume_combiner import accept_in_order, group_results
 from app.repositories.db.models import Batch as BatchModel
-from app.repositories.db.session import SessionLocal
+from app.repositories.db.models import ConsumptionRecord as RecordModel
+from app.repositories.db.rows import as_utc, construct_trusted
+from app.repositories.db.unit_of_work import (
+    read_session_scope,
+    session_scope,
+    stream_rows,
+)
+from app.repositories.db_record_repo import (
+    insert_many_statement as insert_records_statement,
+)
+from app.repositories.db_record_repo import (
+    model_to_schema as record_model_to_schema,
+)
+from app.repositories.db_record_repo import (
+    schema_to_model as record_schema_to_model,
+)
 from app.schemas.batches_schema import Batch as BatchSchema
+from app.schemas.bulk_schema import BulkCreateResult, BulkItemError
+from app.schemas.consumption_record import ConsumptionRecord as RecordSchema
+
+# Column order of every batch row read without going through the ORM
+BATCH_COLUMNS = (
+    BatchModel.id,
+    BatchModel.batch_code,
+    BatchModel.received_at,
+    BatchModel.shelf_life_days,
+    BatchModel.volume_liters,
+    BatchModel.fat_percent,
+    BatchModel.is_deleted,
+    BatchModel.version,
+    BatchModel.expiry,
+)
+
+
+def row_to_schema(row: Sequence) -> BatchSchema:
+    """
+    Map a BATCH_COLUMNS row to the Pydantic Batch schema, private attrs
+    included. Rows are trusted, every one was written from a validated
+    schema, so only the UTC normalization is applied.
+    """
+    (
+        batch_id,
+        batch_code,
+        received_at,
+        shelf_life_days,
+        volume_liters,
+        fat_percent,
+        is_deleted,
+        version,
+        expiry,
+    ) = row
+    return construct_trusted(
+        BatchSchema,
+        {
+            "id": batch_id,
+            "batch_code": batch_code,
+            "received_at": as_utc(received_at),
+            "shelf_life_days": shelf_life_days,
+            "volume_liters": volume_liters,
+            "fat_percent": fat_percent,
+        },
+        {
+            "_is_deleted": bool(is_deleted),
+            "_version": int(version or 0),
+            "_expiry": as_utc(expiry),
+        },
+    )
 
 
 def model_to_schema(model_batch: BatchModel) -> BatchSchema:
     """Map an ORM Batch row to the Pydantic Batch schema and set private attrs."""
-    data = {
-        "id": model_batch.id,
-        "batch_code": model_batch.batch_code,
-        "received_at": model_batch.received_at,
-        "shelf_life_days": model_batch.shelf_life_days,
-        "volume_liters": model_batch.volume_liters,
-        "fat_percent": model_batch.fat_percent,
-    }
-    schema = BatchSchema.model_validate(data)  # Pydantic v2
-
-    # Set private attrs on the Pydantic instance (is_deleted / version)
-    object.__setattr__(
-        schema, "_is_deleted", bool(getattr(model_batch, "is_deleted", False))
+    return row_to_schema(
+        [getattr(model_batch, column.key) for column in BATCH_COLUMNS]
     )
-    object.__setattr__(
-        schema, "_version", int(getattr(model_batch, "version", 0) or 0)
-    )
-    object.__setattr__(schema, "_expiry", model_batch.expiry)
-
-    return schema
 
 
 def schema_to_model(batch_schema: BatchSchema) -> BatchModel:
@@ -47,15 +107,194 @@ def schema_to_model(batch_schema: BatchSchema) -> BatchModel:
     return BatchModel(**{k: v for k, v in batch_dict.items() if k != "id"})
 
 
+FEFO_SCAN_CHUNK = 50  # rows fetched (and locked) per round trip
+STREAM_CHUNK = 1000  # rows per server-side cursor fetch
+
+
+def schema_to_row(batch_schema: BatchSchema) -> dict:
+    """Column values for a multi-row INSERT (same keys for every row)."""
+    row = batch_schema.model_dump(exclude={"id"})
+    row["is_deleted"] = batch_schema._is_deleted
+    row["version"] = batch_schema._version
+    row["expiry"] = batch_schema._expiry
+    return row
+
+
+def bulk_insert_statement() -> Insert:
+    """Multi-row INSERT ... RETURNING, rows come back in parameter order."""
+    return insert(BatchModel).returning(
+        BatchModel, sort_by_parameter_order=True
+    )
+
+
+def select_existing_codes(batch_codes: list[str]) -> Select:
+    return select(BatchModel.batch_code).where(
+        BatchModel.batch_code.in_(batch_codes)
+    )
+
+
+def is_duplicate_code(error: IntegrityError) -> bool:
+    """Whether error is the batch_code unique index (a concurrent insert)."""
+    return "batch_code" in str(error.orig)
+
+
+def split_existing(
+    batches: list[BatchSchema], existing_codes: set[str]
+) -> tuple[list[BatchSchema], list[BulkItemError]]:
+    """Separate batches whose batch_code is already stored."""
+    fresh, errors = [], []
+    for index, batch in enumerate(batches):
+        if batch.batch_code in existing_codes:
+            errors.append(
+                BulkItemError(
+                    index=index,
+                    batch_code=batch.batch_code,
+                    detail="batch_code already exists",
+                )
+            )
+        else:
+            fresh.append(batch)
+    return fresh, errors
+
+
+def select_available(*entities) -> Select:
+    """
+    SELECT of batches that are not deleted, not expired and have volume,
+    as ORM objects or, given entities, as those columns.
+    """
+    # Literal predicates, so even a generic prepared plan can prove the
+    # partial ix_batches_live_expiry index applies
+    return select(*(entities or (BatchModel,))).where(
+        BatchModel.is_deleted == False,
+        BatchModel.volume_liters > literal_column("0"),
+        func.now() < BatchModel.expiry,
+    )
+
+
+# Row lock modes for FEFO pickers
+FEFO_LOCKS = ("wait", "nowait", "skip_locked")
+
+
+def select_fefo(
+    min_fat_percent: float | None,
+    max_fat_percent: float | None,
+    lock: str = "wait",
+) -> Select:
+    """
+    Available batches first-expiry-first-out, locked FOR UPDATE as they
+    are read. The (expiry, id) order is the same for every caller, so
+    concurrent orders queue on the first shared row instead of deadlocking.
+
+    lock="nowait" fails at once on a row another transaction holds;
+    lock="skip_locked" passes over such rows, so concurrent orders draw
+    from different batches (FEFO among the unlocked ones) and never wait.
+    """
+    stmt = select_available()
+    if min_fat_percent is not None:
+        stmt = stmt.where(BatchModel.fat_percent >= min_fat_percent)
+    if max_fat_percent is not None:
+        stmt = stmt.where(BatchModel.fat_percent <= max_fat_percent)
+    return (
+        stmt.order_by(BatchModel.expiry, BatchModel.id)
+        .with_for_update(
+            nowait=lock == "nowait", skip_locked=lock == "skip_locked"
+        )
+        .execution_options(yield_per=FEFO_SCAN_CHUNK, populate_existing=True)
+    )
+
+
+def select_for_update(batch_id: int, nowait: bool = False) -> Select:
+    """
+    One available batch as BATCH_COLUMNS, row-locked until the transaction
+    ends (SQLite has no row locks and ignores FOR UPDATE).
+    """
+    return (
+        select_available(*BATCH_COLUMNS)
+        .where(BatchModel.id == batch_id)
+        .with_for_update(nowait=nowait)
+    )
+
+
+def draw_fefo(batch: BatchModel, remaining: float) -> float:
+    """Take as much of remaining as the batch holds; return the draw."""
+    take = min(batch.volume_liters, remaining)
+    batch.volume_liters = batch.volume_liters - take
+    batch.version = batch.version + 1
+    return take
+
+
+def fefo_record_rows(
+    draws: list[tuple[int, float]], order_id: str | None
+) -> list[dict]:
+    """Validated consumption_records rows for a list of (batch_id, qty)."""
+    consumed_at = datetime.now(UTC)
+    return [
+        RecordSchema(
+            batch_id=batch_id,
+            consumed_at=consumed_at,
+            order_id=order_id,
+            qty=qty,
+        ).model_dump(exclude={"id"})
+        for batch_id, qty in draws
+    ]
+
+
+def insert_group_records_statement() -> Insert:
+    """Executemany INSERT of a consume group's records (nothing returned)."""
+    return insert(RecordModel)
+
+
+def select_page(
+    limit: int, after: int | None, columns: Sequence = BATCH_COLUMNS
+) -> Select:
+    """Keyset page: the next `limit` batches with id greater than `after`."""
+    stmt = select(*columns).order_by(BatchModel.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(BatchModel.id > after)
+    return stmt
+
+
+def select_stream(columns: Sequence = BATCH_COLUMNS) -> Select:
+    """All batches in id order, fetched from a server-side cursor."""
+    return (
+        select(*columns)
+        .order_by(BatchModel.id)
+        .execution_options(yield_per=STREAM_CHUNK)
+    )
+
+
+def consume_statement(batch_id: int, qty: float) -> Update:
+    """Conditional UPDATE ... RETURNING that draws qty from a live batch."""
+    return (
+        update(BatchModel)
+        .where(
+            BatchModel.id == batch_id,
+            BatchModel.is_deleted == False,
+            BatchModel.volume_liters >= qty,
+            func.now() < BatchModel.expiry,
+        )
+        .values(
+            volume_liters=BatchModel.volume_liters - qty,
+            version=BatchModel.version + 1,
+        )
+        .returning(BatchModel)
+    )
+
+
+BULK_INSERT_ATTEMPTS = 3
+LOOKUP_CHUNK = 1000  # keeps IN (...) lists under driver parameter limits
+
+
 class DBBatchRepository(BatchPort):
     """
     SQLAlchemy-backed repository implementing the BatchPort interface.
-    Uses SessionLocal from app.repositories.db.session.
+    Runs in the request's unit of work when one is active (see
+    app.repositories.db.unit_of_work), otherwise in its own transaction.
     """
 
-    def __init__(self) -> None:
-        # No global state here; sessions are created per-operation
-        pass
+    def __init__(self, fefo_lock: str = "wait") -> None:
+        # No other state here; sessions come from session_scope()
+        self._fefo_lock = fefo_lock
 
     def upsert(self, batch_schema: BatchSchema) -> BatchSchema:
         """
@@ -67,10 +306,12 @@ class DBBatchRepository(BatchPort):
         Returns the fresh Pydantic BatchSchema (with new version set).
         """
 
-        with SessionLocal() as session:
+        with session_scope() as session:
             if batch_schema.id:
-                stmt = select(BatchModel).where(
-                    BatchModel.id == batch_schema.id
+                stmt = (
+                    select(BatchModel)
+                    .where(BatchModel.id == batch_schema.id)
+                    .execution_options(populate_existing=True)
                 )
                 old_batch = session.execute(stmt).scalars().one_or_none()
                 if old_batch.version > batch_schema._version:
@@ -82,15 +323,157 @@ class DBBatchRepository(BatchPort):
                 for field, value in new_batch.items():
                     setattr(old_batch, field, value)
                 session.add(old_batch)
-                session.commit()
-                session.refresh(old_batch)
+                session.flush()
                 return model_to_schema(old_batch)
             new_batch = schema_to_model(batch_schema)
             session.add(new_batch)
-            session.commit()
-            session.refresh(new_batch)
+            session.flush()
             return model_to_schema(new_batch)
 
+    def bulk_insert(self, batches: list[BatchSchema]) -> BulkCreateResult:
+        """
+        Insert many new batches with one multi-row INSERT ... RETURNING in a
+        single transaction. Rows whose batch_code already exists are
+        reported per item instead of aborting the whole manifest; if a
+        concurrent writer sneaks a code in first, the insert's savepoint is
+        rolled back and the lookup is redone, up to BULK_INSERT_ATTEMPTS
+        times before ConcurrencyError. Other integrity errors propagate.
+        """
+        codes = [batch.batch_code for batch in batches]
+        with session_scope() as session:
+            for _ in range(BULK_INSERT_ATTEMPTS):
+                existing = set()
+                for start in range(0, len(codes), LOOKUP_CHUNK):
+                    chunk = codes[start : start + LOOKUP_CHUNK]
+                    existing.update(
+                        session.execute(select_existing_codes(chunk))
+                        .scalars()
+                        .all()
+                    )
+                fresh, errors = split_existing(batches, existing)
+                if not fresh:
+                    return BulkCreateResult(created=[], errors=errors)
+                try:
+                    with session.begin_nested():
+                        created = session.execute(
+                            bulk_insert_statement(),
+                            [schema_to_row(batch) for batch in fresh],
+                        ).scalars()
+                        result = BulkCreateResult(
+                            created=[
+                                model_to_schema(batch) for batch in created
+                            ],
+                            errors=errors,
+                        )
+                except IntegrityError as error:
+                    if not is_duplicate_code(error):
+                        raise
+                    continue
+                return result
+        raise ConcurrencyError()
+
+    def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> BatchSchema | None:
+        """
+        Atomically draw qty liters from an available batch.
+        A single conditional UPDATE ... RETURNING decrements the volume and
+        bumps the version, and the consumption record is inserted in the
+        same transaction. Returns None (and writes nothing) when the batch
+        is missing, deleted, expired or holds less than qty liters.
+        """
+        record = RecordSchema(
+            batch_id=batch_id,
+            consumed_at=datetime.now(UTC),
+            order_id=order_id,
+            qty=qty,
+        )
+        with session_scope() as session:
+            stmt = consume_statement(batch_id, qty)
+            batch = session.execute(stmt).scalars().one_or_none()
+            if batch is None:
+                return None
+            session.add(record_schema_to_model(record))
+            return model_to_schema(batch)
+
+    def consume_many(
+        self, batch_id: int, records: list[RecordSchema]
+    ) -> list[BatchSchema | None]:
+        """
+        Apply a group of consumes of one batch as a single write: read the
+        batch FOR UPDATE, accept records in order while its volume covers
+        them, then one conditional UPDATE for the accepted total and one
+        multi-row INSERT of their records. Returns per record the batch
+        right after its draw, or None if it was refused (every one when the
+        batch is not available). Raises ConcurrencyError if the volume
+        moved between the read and the update, which only a database
+        without row locks allows.
+        """
+        refused = [None] * len(records)
+        with session_scope() as session:
+            row = session.execute(select_for_update(batch_id)).one_or_none()
+            if row is None:
+                return refused
+            volumes = accept_in_order(
+                row_to_schema(row).volume_liters,
+                [record.qty for record in records],
+            )
+            accepted = [
+                record.model_dump(exclude={"id"})
+                for record, volume in zip(records, volumes, strict=True)
+                if volume is not None
+            ]
+            if not accepted:
+                return refused
+            total = sum(row["qty"] for row in accepted)
+            batch = (
+                session.execute(consume_statement(batch_id, total))
+                .scalars()
+                .one_or_none()
+            )
+            if batch is None:
+                raise ConcurrencyError()
+            session.execute(insert_group_records_statement(), accepted)
+            return group_results(model_to_schema(batch), volumes)
+
+    def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[RecordSchema] | None:
+        """
+        Draw qty liters across available batches, earliest expiry first.
+        Candidates are streamed and row-locked in expiry order only until
+        the quantity is covered; all volume updates and consumption records
+        commit together. Returns None (nothing written) if the matching
+        batches cannot cover qty.
+        """
+        with session_scope() as session:
+            remaining, locked = qty, []
+            result = session.execute(
+                select_fefo(min_fat_percent, max_fat_percent, self._fefo_lock)
+            ).scalars()
+            for batch in result:
+                locked.append(batch)
+                remaining -= batch.volume_liters
+                if remaining <= 0:
+                    break
+            result.close()
+            if remaining > 0:
+                return None
+            draws, remaining = [], qty
+            for batch in locked:
+                take = draw_fefo(batch, remaining)
+                draws.append((batch.id, take))
+                remaining -= take
+            records = session.execute(
+                insert_records_statement(),
+                fefo_record_rows(draws, order_id),
+            ).scalars()
+            return [record_model_to_schema(r) for r in records]
+
     def list_all_available(self) -> list[BatchSchema]:
         """
         Return list of available batches:
@@ -99,16 +482,9 @@ class DBBatchRepository(BatchPort):
          - not expired (uses received_at + shelf_life_days < now to detect expiry)
         """
 
-        with SessionLocal() as session:
-            stmt = select(BatchModel).where(
-                BatchModel.is_deleted == False,
-                BatchModel.volume_liters > 0,
-                func.now() < BatchModel.expiry,
-            )
-            return [
-                model_to_schema(batch)
-                for batch in session.execute(stmt).scalars().all()
-            ]
+        with read_session_scope() as session:
+            stmt = select_available(*BATCH_COLUMNS)
+            return [row_to_schema(row) for row in session.execute(stmt)]
 
     def list_all_between_dates(
         self, min_date: datetime, max_date: datetime
@@ -117,49 +493,65 @@ class DBBatchRepository(BatchPort):
         Return batches whose expiry is between min_date and max_date (inclusive).
         For portability we read candidates from DB and compute expiry in Python.
         """
-        with SessionLocal() as session:
-            stmt = select(BatchModel).where(
-                BatchModel.is_deleted == False,
-                BatchModel.volume_liters > 0,
-                func.now() < BatchModel.expiry,
+        with read_session_scope() as session:
+            stmt = select_available(*BATCH_COLUMNS).where(
                 BatchModel.expiry >= min_date,
                 BatchModel.expiry <= max_date,
             )
-            return [
-                model_to_schema(batch)
-                for batch in session.execute(stmt).scalars().all()
-            ]
+            return [row_to_schema(row) for row in session.execute(stmt)]
 
     def read_by_id(self, batch_id: int) -> BatchSchema | None:
         """
         Return the batch if it exists, has volume, is not expired and not deleted.
         Returns None if not found / not available.
         """
-        with SessionLocal() as session:
-            stmt = select(BatchModel).where(
-                BatchModel.id == batch_id,
-                BatchModel.is_deleted == False,
-                BatchModel.volume_liters > 0,
-                func.now() < BatchModel.expiry,
-            )
-            return model_to_schema(
-                session.execute(stmt).scalars().one_or_none()
+        with read_session_scope() as session:
+            stmt = select_available(*BATCH_COLUMNS).where(
+                BatchModel.id == batch_id
             )
+            row = session.execute(stmt).one_or_none()
+            return row_to_schema(row) if row else None
+
+    def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> BatchSchema | None:
+        """
+        read_by_id with SELECT ... FOR UPDATE [NOWAIT]: concurrent writers
+        wait (or, with nowait, fail with OperationalError) until the unit
+        of work commits. Outside a unit of work the lock ends with the read.
+        """
+        with session_scope() as session:
+            row = session.execute(
+                select_for_update(batch_id, nowait)
+            ).one_or_none()
+            return row_to_schema(row) if row else None
 
     def soft_delete(self, batch_id: int) -> None:
-        with SessionLocal() as session:
+        with session_scope() as session:
             stmt = select(BatchModel).where(BatchModel.id == batch_id)
             batch = session.execute(stmt).scalars().one_or_none()
             batch.is_deleted = True
             session.add(batch)
-            session.commit()
 
     def list_all(self) -> list[BatchSchema]:
         """Return all batches (including deleted)."""
-        with SessionLocal() as session:
+        with read_session_scope() as session:
             return [
-                model_to_schema(batch)
-                for batch in session.execute(select(BatchModel))
-                .scalars()
-                .all()
+                row_to_schema(row)
+                for row in session.execute(select(*BATCH_COLUMNS))
             ]
+
+    def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[BatchSchema]:
+        """Return up to `limit` batches (including deleted) with id > after."""
+        with read_session_scope() as session:
+            return [
+                row_to_schema(row)
+                for row in session.execute(select_page(limit, after))
+            ]
+
+    def iter_all(self) -> Iterator[BatchSchema]:
+        """Yield every batch while holding only one chunk in memory."""
+        # Streams outlive the request's unit of work: use a session of its own
+        return stream_rows(select_stream(), row_to_schema)
@@ -1,23 +1,55 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from collections.abc import Iterator, Sequence
+from datetime import datetime
 
-from app.domain.record_port import RecordPort
+from sqlalchemy import Insert, Select, insert, select
+
+from app.domain.record_port import RecordPort, RecordRow
 from app.repositories.db.models import ConsumptionRecord as RecordModel
-from app.repositories.db.session import SessionLocal
+from app.repositories.db.rows import as_utc, construct_trusted
+from app.repositories.db.unit_of_work import (
+    read_session_scope,
+    session_scope,
+    stream_rows,
+    stream_session_factory,
+)
 from app.schemas.consumption_record import ConsumptionRecord as RecordSchema
 
+STREAM_CHUNK = 1000  # rows per server-side cursor fetch
+EXPORT_CHUNK = 5000  # column tuples per server-side cursor fetch
+
+
+# Column order of every record row read without going through the ORM
+RECORD_COLUMNS = (
+    RecordModel.id,
+    RecordModel.batch_id,
+    RecordModel.consumed_at,
+    RecordModel.order_id,
+    RecordModel.qty,
+)
+
+
+def row_to_schema(row: Sequence) -> RecordSchema:
+    """Map a trusted RECORD_COLUMNS row to the Pydantic Record schema."""
+    record_id, batch_id, consumed_at, order_id, qty = row
+    return construct_trusted(
+        RecordSchema,
+        {
+            "id": record_id,
+            "batch_id": batch_id,
+            "consumed_at": as_utc(consumed_at),
+            "order_id": order_id,
+            "qty": qty,
+        },
+    )
+
 
 def model_to_schema(model_record: RecordModel) -> RecordSchema:
     """Map an ORM Record row to the Pydantic Batch schema and set private attrs."""
-    data = {
-        "id": model_record.id,
-        "batch_id": model_record.batch_id,
-        "consumed_at": model_record.consumed_at,
-        "order_id": model_record.order_id,
-        "qty": model_record.qty,
-    }
-    return RecordSchema.model_validate(data)  # Pydantic v2
+    return row_to_schema(
+        [getattr(model_record, column.key) for column in RECORD_COLUMNS]
+    )
 
 
 def schema_to_model(record_schema: RecordSchema) -> RecordModel:
@@ -25,24 +57,103 @@ def schema_to_model(record_schema: RecordSchema) -> RecordModel:
     return RecordModel(**{k: v for k, v in batch_dict.items() if k != "id"})
 
 
+def insert_many_statement() -> Insert:
+    """Multi-row INSERT ... RETURNING for consumption records."""
+    return insert(RecordModel).returning(
+        RecordModel, sort_by_parameter_order=True
+    )
+
+
+def insert_rows_statement() -> Insert:
+    """Executemany INSERT of consumption records (nothing returned)."""
+    return insert(RecordModel)
+
+
+def select_page(limit: int, after: int | None) -> Select:
+    """Keyset page: the next `limit` records with id greater than `after`."""
+    stmt = select(*RECORD_COLUMNS).order_by(RecordModel.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(RecordModel.id > after)
+    return stmt
+
+
+def select_stream() -> Select:
+    """All records in id order, fetched from a server-side cursor."""
+    return (
+        select(*RECORD_COLUMNS)
+        .order_by(RecordModel.id)
+        .execution_options(yield_per=STREAM_CHUNK)
+    )
+
+
+def select_export(
+    since: datetime | None, until: datetime | None, batch_id: int | None
+) -> Select:
+    """Column tuples (no ORM objects) for the audit export, by id."""
+    stmt = select(*RECORD_COLUMNS).order_by(RecordModel.id)
+    if since is not None:
+        stmt = stmt.where(RecordModel.consumed_at >= since)
+    if until is not None:
+        stmt = stmt.where(RecordModel.consumed_at < until)
+    if batch_id is not None:
+        stmt = stmt.where(RecordModel.batch_id == batch_id)
+    return stmt.execution_options(stream_results=True)
+
+
 class DBRecordRepository(RecordPort):
     def __init__(self):
         pass
 
     def insert(self, record_schema: RecordSchema):
-        with SessionLocal() as session:
+        with session_scope() as session:
             new_record = schema_to_model(record_schema)
             session.add(new_record)
-            session.commit()
-            session.refresh(new_record)
+            session.flush()
             return model_to_schema(new_record)
 
+    def insert_many(self, records: list[RecordSchema]) -> None:
+        """Write records with one multi-row INSERT."""
+        with session_scope() as session:
+            session.execute(
+                insert_rows_statement(),
+                [record.model_dump(exclude={"id"}) for record in records],
+            )
+
     def list_all(self) -> list[RecordSchema]:
         """Return all records."""
-        with SessionLocal() as session:
+        with read_session_scope() as session:
+            return [
+                row_to_schema(row)
+                for row in session.execute(select(*RECORD_COLUMNS))
+            ]
+
+    def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[RecordSchema]:
+        """Return up to `limit` records with id > `after`, by id."""
+        with read_session_scope() as session:
             return [
-                model_to_schema(record)
-                for record in session.execute(select(RecordModel))
-                .scalars()
-                .all()
+                row_to_schema(row)
+                for row in session.execute(select_page(limit, after))
             ]
+
+    def iter_all(self) -> Iterator[RecordSchema]:
+        """Yield every record while holding only one chunk in memory."""
+        # Streams outlive the request's unit of work: use a session of its own
+        return stream_rows(select_stream(), row_to_schema)
+
+    def iter_export_chunks(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        batch_id: int | None = None,
+    ) -> Iterator[Sequence[RecordRow]]:
+        """Yield fixed-size chunks of plain row tuples for the export."""
+        session_factory = stream_session_factory()
+
+        def chunks() -> Iterator[Sequence[RecordRow]]:
+            with session_factory() as session:
+                result = session.execute(select_export(since, until, batch_id))
+                yield from result.tuples().partitions(EXPORT_CHUNK)
+
+        return chunks()
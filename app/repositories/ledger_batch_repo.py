@@ -0,0 +1,379 @@
+"""
+Event-sourced batch volume (DAIRY_STORE_LEDGER_ENABLED).
+
+A consume never rewrites the batch row: it appends a consumption record
+carrying its position in the batch's ledger (seq) and the volume left
+after it (balance). batches.volume_liters becomes a snapshot that is
+valid up to batches.ledger_seq, so the available volume is the balance
+of the newest record past the snapshot, or the snapshot itself: one
+probe of the (batch_id, seq) index per batch, however long the ledger.
+
+Appends read that head under a shared row lock (FOR SHARE on Postgres),
+which concurrent consumers do not conflict on but upserts and deletes
+do. Two consumers appending the same seq collide on the unique index;
+the loser raises ConcurrencyError and the service retries it. compact()
+periodically folds every ledger tail into a fresh snapshot.
+
+The version a read reports is the stored version plus the records
+appended since the snapshot, so an upsert made from a stale read still
+fails its version check.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import suppress
+from datetime import UTC, datetime
+
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    Update,
+    func,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+
+from app.domain.batch_port import ConcurrencyError
+from app.domain.consume_combiner import accept_in_order, group_results
+from app.observability.metrics import LEDGER_SNAPSHOTS
+from app.repositories.db.models import Batch as BatchModel
+from app.repositories.db.models import ConsumptionRecord as RecordModel
+from app.repositories.db.unit_of_work import (
+    read_session_scope,
+    session_scope,
+    stream_rows,
+)
+from app.repositories.db_batch_repo import (
+    FEFO_SCAN_CHUNK,
+    DBBatchRepository,
+    insert_group_records_statement,
+    row_to_schema,
+    select_available,
+    select_page,
+    select_stream,
+)
+from app.repositories.db_record_repo import (
+    insert_many_statement as insert_records_statement,
+)
+from app.repositories.db_record_repo import (
+    model_to_schema as record_model_to_schema,
+)
+from app.schemas.batches_schema import Batch as BatchSchema
+from app.schemas.consumption_record import ConsumptionRecord as RecordSchema
+
+logger = logging.getLogger(__name__)
+
+
+def _head(column: ColumnElement) -> ColumnElement:
+    """column of the batch's newest ledger record past its snapshot."""
+    return (
+        select(column)
+        .where(
+            RecordModel.batch_id == BatchModel.id,
+            RecordModel.seq > BatchModel.ledger_seq,
+        )
+        .order_by(RecordModel.seq.desc())
+        .limit(1)
+        .correlate(BatchModel)
+        .scalar_subquery()
+    )
+
+
+AVAILABLE = func.coalesce(_head(RecordModel.balance), BatchModel.volume_liters)
+HEAD_SEQ = func.coalesce(_head(RecordModel.seq), BatchModel.ledger_seq)
+
+# BATCH_COLUMNS with the ledger's view of volume and version
+LEDGER_COLUMNS = (
+    BatchModel.id,
+    BatchModel.batch_code,
+    BatchModel.received_at,
+    BatchModel.shelf_life_days,
+    AVAILABLE,
+    BatchModel.fat_percent,
+    BatchModel.is_deleted,
+    BatchModel.version + HEAD_SEQ - BatchModel.ledger_seq,
+    BatchModel.expiry,
+)
+
+
+def select_live(*columns) -> Select:
+    """
+    select_available by ledger volume. A snapshot never holds less than
+    the ledger, so the snapshot predicate (and its partial index) stays.
+    """
+    return select_available(*columns).where(AVAILABLE > 0)
+
+
+def select_head(batch_id: int) -> Select:
+    """A live batch as LEDGER_COLUMNS plus its head seq, share-locked."""
+    return (
+        select_live(*LEDGER_COLUMNS, HEAD_SEQ)
+        .where(BatchModel.id == batch_id)
+        .with_for_update(read=True, of=BatchModel)
+    )
+
+
+def select_ledger_fefo(
+    min_fat_percent: float | None,
+    max_fat_percent: float | None,
+    lock: str = "wait",
+) -> Select:
+    """select_fefo as LEDGER_COLUMNS plus head seq, see db_batch_repo."""
+    stmt = select_live(*LEDGER_COLUMNS, HEAD_SEQ)
+    if min_fat_percent is not None:
+        stmt = stmt.where(BatchModel.fat_percent >= min_fat_percent)
+    if max_fat_percent is not None:
+        stmt = stmt.where(BatchModel.fat_percent <= max_fat_percent)
+    return (
+        stmt.order_by(BatchModel.expiry, BatchModel.id)
+        .with_for_update(
+            of=BatchModel,
+            nowait=lock == "nowait",
+            skip_locked=lock == "skip_locked",
+        )
+        .execution_options(yield_per=FEFO_SCAN_CHUNK)
+    )
+
+
+def compact_statement(batch_id: int | None = None) -> Update:
+    """
+    Fold ledger tails into the snapshot (of one batch, or all of them):
+    the volume and version a read reports become the stored ones.
+    """
+    has_tail = (
+        select(RecordModel.id)
+        .where(
+            RecordModel.batch_id == BatchModel.id,
+            RecordModel.seq > BatchModel.ledger_seq,
+        )
+        .exists()
+    )
+    stmt = update(BatchModel).where(has_tail)
+    if batch_id is not None:
+        stmt = stmt.where(BatchModel.id == batch_id)
+    return stmt.values(
+        volume_liters=AVAILABLE,
+        version=BatchModel.version + HEAD_SEQ - BatchModel.ledger_seq,
+        ledger_seq=HEAD_SEQ,
+    ).execution_options(synchronize_session=False)
+
+
+def split_head(row) -> tuple[BatchSchema, int]:
+    return row_to_schema(row[:-1]), row[-1]
+
+
+def ledger_append(
+    batch: BatchSchema, head_seq: int, records: list[RecordSchema]
+) -> tuple[list[dict], list[BatchSchema | None]]:
+    """
+    Ledger rows for the records the batch's volume covers, in order, and
+    per record the batch after its draw (None when refused).
+    """
+    volumes = accept_in_order(
+        batch.volume_liters, [record.qty for record in records]
+    )
+    rows, seq = [], head_seq
+    for record, volume in zip(records, volumes, strict=True):
+        if volume is None:
+            continue
+        seq += 1
+        rows.append(
+            {
+                **record.model_dump(exclude={"id"}),
+                "seq": seq,
+                "balance": volume,
+            }
+        )
+    batch._version = batch._version + len(rows)
+    return rows, group_results(batch, volumes)
+
+
+class LedgerBatchRepository(DBBatchRepository):
+    """DBBatchRepository whose consumes append to the volume ledger."""
+
+    def upsert(self, batch_schema: BatchSchema) -> BatchSchema:
+        """
+        Fold the batch's ledger first, so the write replaces the volume
+        the caller read and the version check sees every append.
+        """
+        if batch_schema.id:
+            with session_scope() as session:
+                session.execute(compact_statement(batch_schema.id))
+        return super().upsert(batch_schema)
+
+    def _append(self, session, rows: list[dict]) -> None:
+        try:
+            with session.begin_nested():
+                session.execute(insert_group_records_statement(), rows)
+        except IntegrityError as error:
+            raise ConcurrencyError() from error
+
+    def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> BatchSchema | None:
+        """
+        Append one ledger record if the batch still holds qty liters.
+        Returns None (nothing written) like DBBatchRepository.consume.
+        """
+        (result,) = self.consume_many(
+            batch_id,
+            [
+                RecordSchema(
+                    batch_id=batch_id,
+                    consumed_at=datetime.now(UTC),
+                    order_id=order_id,
+                    qty=qty,
+                )
+            ],
+        )
+        return result
+
+    def consume_many(
+        self, batch_id: int, records: list[RecordSchema]
+    ) -> list[BatchSchema | None]:
+        """A group of consumes as one multi-row ledger append."""
+        with session_scope() as session:
+            row = session.execute(select_head(batch_id)).one_or_none()
+            if row is None:
+                return [None] * len(records)
+            rows, results = ledger_append(*split_head(row), records)
+            if rows:
+                self._append(session, rows)
+            return results
+
+    def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[RecordSchema] | None:
+        """FEFO draw-down as ledger appends, see DBBatchRepository."""
+        consumed_at = datetime.now(UTC)
+        with session_scope() as session:
+            remaining, rows = qty, []
+            result = session.execute(
+                select_ledger_fefo(
+                    min_fat_percent, max_fat_percent, self._fefo_lock
+                )
+            )
+            for row in result:
+                batch, head_seq = split_head(row)
+                take = min(batch.volume_liters, remaining)
+                record = RecordSchema(
+                    batch_id=batch.id,
+                    consumed_at=consumed_at,
+                    order_id=order_id,
+                    qty=take,
+                )
+                rows.extend(ledger_append(batch, head_seq, [record])[0])
+                remaining -= take
+                if remaining <= 0:
+                    break
+            result.close()
+            if remaining > 0:
+                return None
+            try:
+                with session.begin_nested():
+                    records = session.execute(
+                        insert_records_statement(), rows
+                    ).scalars()
+                    return [record_model_to_schema(r) for r in records]
+            except IntegrityError as error:
+                raise ConcurrencyError() from error
+
+    def list_all_available(self) -> list[BatchSchema]:
+        with read_session_scope() as session:
+            return [
+                row_to_schema(row)
+                for row in session.execute(select_live(*LEDGER_COLUMNS))
+            ]
+
+    def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[BatchSchema]:
+        with read_session_scope() as session:
+            stmt = select_live(*LEDGER_COLUMNS).where(
+                BatchModel.expiry >= min_date,
+                BatchModel.expiry <= max_date,
+            )
+            return [row_to_schema(row) for row in session.execute(stmt)]
+
+    def read_by_id(self, batch_id: int) -> BatchSchema | None:
+        with read_session_scope() as session:
+            stmt = select_live(*LEDGER_COLUMNS).where(
+                BatchModel.id == batch_id
+            )
+            row = session.execute(stmt).one_or_none()
+            return row_to_schema(row) if row else None
+
+    def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> BatchSchema | None:
+        with session_scope() as session:
+            stmt = (
+                select_live(*LEDGER_COLUMNS)
+                .where(BatchModel.id == batch_id)
+                .with_for_update(of=BatchModel, nowait=nowait)
+            )
+            row = session.execute(stmt).one_or_none()
+            return row_to_schema(row) if row else None
+
+    def list_all(self) -> list[BatchSchema]:
+        with read_session_scope() as session:
+            return [
+                row_to_schema(row)
+                for row in session.execute(select(*LEDGER_COLUMNS))
+            ]
+
+    def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[BatchSchema]:
+        with read_session_scope() as session:
+            stmt = select_page(limit, after, LEDGER_COLUMNS)
+            return [row_to_schema(row) for row in session.execute(stmt)]
+
+    def iter_all(self) -> Iterator[BatchSchema]:
+        return stream_rows(select_stream(LEDGER_COLUMNS), row_to_schema)
+
+    def compact(self) -> int:
+        """Snapshot every batch with a ledger tail; returns how many."""
+        with session_scope() as session:
+            folded = session.execute(compact_statement()).rowcount
+        LEDGER_SNAPSHOTS.inc(amount=folded)
+        return folded
+
+
+class LedgerCompactor:
+    """Runs a repository's compact() every `interval` seconds."""
+
+    def __init__(
+        self, compact: Callable[[], Awaitable[int]], interval: float
+    ) -> None:
+        self._compact = compact
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self._compact()
+            except Exception:
+                # A failed pass only delays the snapshot; try again later
+                logger.exception("ledger compaction failed")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
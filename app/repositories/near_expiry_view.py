@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import time
+from collections.abc import AsyncIterator, Iterator
+from datetime import UTC, date, datetime
+from threading import Lock
+
+from app.domain.batch_port import AsyncBatchPort, BatchPort
+from app.schemas.batches_schema import Batch
+from app.schemas.bulk_schema import BulkCreateResult
+from app.schemas.consumption_record import ConsumptionRecord
+
+
+class NearExpiryView:
+    """
+    Live batches bucketed by UTC expiry day, kept in step with local writes.
+
+    A near-expiry query only visits the buckets between today and the last
+    requested day, so any n_days is answered without a database round trip.
+    Writes made by other workers are picked up by a full reload at most
+    every `refresh_seconds`.
+    """
+
+    def __init__(self, refresh_seconds: float) -> None:
+        self._refresh_seconds = refresh_seconds
+        self._lock = Lock()
+        self._buckets: dict[date, dict[int, Batch]] = {}
+        self._day_of: dict[int, date] = {}  # batch id -> bucket key
+        self._loaded_at: float | None = None
+
+    def needs_reload(self) -> bool:
+        return (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at > self._refresh_seconds
+        )
+
+    def load(self, batches: list[Batch]) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._day_of.clear()
+            for batch in batches:
+                self._add(batch)
+            self._loaded_at = time.monotonic()
+
+    def apply(self, batch: Batch) -> None:
+        """Record the latest state of a batch (drops it once not live)."""
+        with self._lock:
+            self._remove(batch.id)
+            if batch.volume_liters > 0 and not batch._is_deleted:
+                self._add(batch)
+
+    def apply_group(self, results: list[Batch | None]) -> None:
+        """apply for consume_many: the last accepted draw is the latest."""
+        drawn = [batch for batch in results if batch is not None]
+        if drawn:
+            self.apply(min(drawn, key=lambda batch: batch.volume_liters))
+
+    def discard(self, batch_id: int) -> None:
+        with self._lock:
+            self._remove(batch_id)
+
+    def between(self, min_date: datetime, max_date: datetime) -> list[Batch]:
+        now = datetime.now(UTC)
+        min_date = max(min_date, now)
+        with self._lock:
+            for day in [d for d in self._buckets if d < now.date()]:
+                for batch_id in self._buckets.pop(day):
+                    del self._day_of[batch_id]
+            found = [
+                batch.model_copy()
+                for day, bucket in self._buckets.items()
+                if min_date.date() <= day <= max_date.date()
+                for batch in bucket.values()
+                if min_date <= batch._expiry <= max_date
+            ]
+        return sorted(found, key=lambda batch: (batch._expiry, batch.id))
+
+    def _add(self, batch: Batch) -> None:
+        day = batch._expiry.astimezone(UTC).date()
+        self._buckets.setdefault(day, {})[batch.id] = batch.model_copy()
+        self._day_of[batch.id] = day
+
+    def _remove(self, batch_id: int) -> None:
+        day = self._day_of.pop(batch_id, None)
+        if day is None:
+            return
+        bucket = self._buckets[day]
+        del bucket[batch_id]
+        if not bucket:
+            del self._buckets[day]
+
+
+class NearExpiryBatchRepository(BatchPort):
+    """Serves list_all_between_dates from a NearExpiryView."""
+
+    def __init__(self, inner: BatchPort, view: NearExpiryView) -> None:
+        self._inner = inner
+        self.view = view
+
+    def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[Batch]:
+        if self.view.needs_reload():
+            self.view.load(self._inner.list_all_available())
+        return self.view.between(min_date, max_date)
+
+    def upsert(self, batch: Batch) -> Batch:
+        stored = self._inner.upsert(batch)
+        self.view.apply(stored)
+        return stored
+
+    def bulk_insert(self, batches: list[Batch]) -> BulkCreateResult:
+        result = self._inner.bulk_insert(batches)
+        for batch in result.created:
+            self.view.apply(batch)
+        return result
+
+    def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch | None:
+        batch = self._inner.consume(batch_id, qty, order_id)
+        if batch is not None:
+            self.view.apply(batch)
+        return batch
+
+    def consume_many(
+        self, batch_id: int, records: list[ConsumptionRecord]
+    ) -> list[Batch | None]:
+        results = self._inner.consume_many(batch_id, records)
+        self.view.apply_group(results)
+        return results
+
+    def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[ConsumptionRecord] | None:
+        allocation = self._inner.consume_fefo(
+            qty, order_id, min_fat_percent, max_fat_percent
+        )
+        for record in allocation or []:
+            batch = self._inner.read_by_id(record.batch_id)
+            if batch is None:
+                self.view.discard(record.batch_id)
+            else:
+                self.view.apply(batch)
+        return allocation
+
+    def soft_delete(self, batch_id: int) -> None:
+        self._inner.soft_delete(batch_id)
+        self.view.discard(batch_id)
+
+    def read_by_id(self, batch_id: int) -> Batch | None:
+        return self._inner.read_by_id(batch_id)
+
+    def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> Batch | None:
+        return self._inner.read_for_update(batch_id, nowait)
+
+    def list_all_available(self) -> list[Batch]:
+        return self._inner.list_all_available()
+
+    def list_all(self) -> list[Batch]:
+        return self._inner.list_all()
+
+    def list_page(self, limit: int, after: int | None = None) -> list[Batch]:
+        return self._inner.list_page(limit, after)
+
+    def iter_all(self) -> Iterator[Batch]:
+        return self._inner.iter_all()
+
+
+class AsyncNearExpiryBatchRepository(AsyncBatchPort):
+    """NearExpiryBatchRepository for an AsyncBatchPort."""
+
+    def __init__(self, inner: AsyncBatchPort, view: NearExpiryView) -> None:
+        self._inner = inner
+        self.view = view
+
+    async def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[Batch]:
+        if self.view.needs_reload():
+            self.view.load(await self._inner.list_all_available())
+        return self.view.between(min_date, max_date)
+
+    async def upsert(self, batch: Batch) -> Batch:
+        stored = await self._inner.upsert(batch)
+        self.view.apply(stored)
+        return stored
+
+    async def bulk_insert(self, batches: list[Batch]) -> BulkCreateResult:
+        result = await self._inner.bulk_insert(batches)
+        for batch in result.created:
+            self.view.apply(batch)
+        return result
+
+    async def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> Batch | None:
+        batch = await self._inner.consume(batch_id, qty, order_id)
+        if batch is not None:
+            self.view.apply(batch)
+        return batch
+
+    async def consume_many(
+        self, batch_id: int, records: list[ConsumptionRecord]
+    ) -> list[Batch | None]:
+        results = await self._inner.consume_many(batch_id, records)
+        self.view.apply_group(results)
+        return results
+
+    async def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[ConsumptionRecord] | None:
+        allocation = await self._inner.consume_fefo(
+            qty, order_id, min_fat_percent, max_fat_percent
+        )
+        for record in allocation or []:
+            batch = await self._inner.read_by_id(record.batch_id)
+            if batch is None:
+                self.view.discard(record.batch_id)
+            else:
+                self.view.apply(batch)
+        return allocation
+
+    async def soft_delete(self, batch_id: int) -> None:
+        await self._inner.soft_delete(batch_id)
+        self.view.discard(batch_id)
+
+    async def read_by_id(self, batch_id: int) -> Batch | None:
+        return await self._inner.read_by_id(batch_id)
+
+    async def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> Batch | None:
+        return await self._inner.read_for_update(batch_id, nowait)
+
+    async def list_all_available(self) -> list[Batch]:
+        return await self._inner.list_all_available()
+
+    async def list_all(self) -> list[Batch]:
+        return await self._inner.list_all()
+
+    async def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[Batch]:
+        return await self._inner.list_page(limit, after)
+
+    def iter_all(self) -> AsyncIterator[Batch]:
+        return self._inner.iter_all()
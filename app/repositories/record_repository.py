@@ -1,9 +1,13 @@
+from bisect import bisect_right
+from collections.abc import Iterator, Sequence
 from datetime import datetime
 from itertools import count
 
-from app.domain.record_port import RecordPort
+from app.domain.record_port import RecordPort, RecordRow
 from app.schemas.consumption_record import ConsumptionRecord
 
+EXPORT_CHUNK = 5000
+
 
 class RecordRepository(RecordPort):
     def __init__(self):
@@ -31,6 +35,41 @@ class RecordRepository(RecordPort):
             id=next(self._id_seq), **record.model_dump(exclude={"id"})
         )
         self._db.append(new_record)
+        return new_record
+
+    def insert_many(self, records: list[ConsumptionRecord]) -> None:
+        for record in records:
+            self.insert(record)
 
     def list_all(self) -> list[ConsumptionRecord]:
         return self._db
+
+    def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[ConsumptionRecord]:
+        # ids are handed out in increasing order, so _db is sorted by id
+        start = (
+            0
+            if after is None
+            else bisect_right(self._db, after, key=lambda row: row.id)
+        )
+        return self._db[start : start + limit]
+
+    def iter_all(self) -> Iterator[ConsumptionRecord]:
+        yield from list(self._db)
+
+    def iter_export_chunks(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        batch_id: int | None = None,
+    ) -> Iterator[Sequence[RecordRow]]:
+        rows = [
+            (r.id, r.batch_id, r.consumed_at, r.order_id, r.qty)
+            for r in list(self._db)
+            if (since is None or r.consumed_at >= since)
+            and (until is None or r.consumed_at < until)
+            and (batch_id is None or r.batch_id == batch_id)
+        ]
+        for start in range(0, len(rows), EXPORT_CHUNK):
+            yield rows[start : start + EXPORT_CHUNK]
@@ -0,0 +1,475 @@
+"""
+Sharded batch volume (DAIRY_STORE_BATCH_SHARDS).
+
+A batch is split into N shards when it is written: batch_shards rows
+that each hold a slice of its volume. A consume draws from one shard
+with spare volume, starting at a random one and skipping shards another
+transaction has locked (SKIP LOCKED on Postgres), so N consumers of one
+hot batch update N different rows instead of queueing on the batch row.
+
+When no single shard covers a draw, every shard of the batch is locked
+in shard order, the draw is taken from their total and what is left is
+spread evenly over them again. Combined groups and FEFO picks always
+take that path.
+
+batches.volume_liters keeps the volume at the last split, which never
+holds less than the shards, so the availability predicate (and its
+partial index) stays valid; reads report the sum of the shards. The
+version a read reports is the stored version plus the consumes drawn
+from the shards, and an upsert folds the shards back into the batch row
+before writing it, so an upsert made from a stale read still fails.
+
+Writers that lock a batch row take it before its shards (FEFO picks,
+upserts), and take it FOR NO KEY UPDATE: consumes insert records, whose
+foreign key check holds the batch row FOR KEY SHARE while they hold a
+shard, and a stronger lock would deadlock with them.
+"""
+
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator, Sequence
+from datetime import UTC, datetime
+
+from sqlalchemy import (
+    Delete,
+    Select,
+    Update,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+)
+
+from app.domain.batch_port import ConcurrencyError
+from app.domain.consume_combiner import accept_in_order, group_results
+from app.observability.metrics import SHARD_REBALANCES
+from app.repositories.db.models import Batch as BatchModel
+from app.repositories.db.models import BatchShard as ShardModel
+from app.repositories.db.unit_of_work import (
+    read_session_scope,
+    session_scope,
+    stream_rows,
+)
+from app.repositories.db_batch_repo import (
+    FEFO_SCAN_CHUNK,
+    DBBatchRepository,
+    consume_statement,
+    fefo_record_rows,
+    insert_group_records_statement,
+    row_to_schema,
+    select_available,
+    select_page,
+    select_stream,
+)
+from app.repositories.db_record_repo import (
+    insert_many_statement as insert_records_statement,
+)
+from app.repositories.db_record_repo import (
+    model_to_schema as record_model_to_schema,
+)
+from app.repositories.db_record_repo import (
+    schema_to_model as record_schema_to_model,
+)
+from app.schemas.batches_schema import Batch as BatchSchema
+from app.schemas.bulk_schema import BulkCreateResult
+from app.schemas.consumption_record import ConsumptionRecord as RecordSchema
+
+
+def _shard_sum(column) -> Select:
+    return (
+        select(func.sum(column))
+        .where(ShardModel.batch_id == BatchModel.id)
+        .correlate(BatchModel)
+        .scalar_subquery()
+    )
+
+
+AVAILABLE = func.coalesce(
+    _shard_sum(ShardModel.volume_liters), BatchModel.volume_liters
+)
+DRAWN = func.coalesce(_shard_sum(ShardModel.version), 0)
+
+# BATCH_COLUMNS with the shards' view of volume and version
+SHARDED_COLUMNS = (
+    BatchModel.id,
+    BatchModel.batch_code,
+    BatchModel.received_at,
+    BatchModel.shelf_life_days,
+    AVAILABLE,
+    BatchModel.fat_percent,
+    BatchModel.is_deleted,
+    BatchModel.version + DRAWN,
+    BatchModel.expiry,
+)
+
+
+def select_live(*columns) -> Select:
+    """select_available by the volume left in the shards."""
+    return select_available(*columns).where(AVAILABLE > 0)
+
+
+def lock_batch_statement(batch_id: int) -> Select:
+    """A batch row, locked ahead of its shards (see the module docstring)."""
+    return (
+        select(BatchModel.id)
+        .where(BatchModel.id == batch_id)
+        .with_for_update(key_share=True)
+    )
+
+
+def select_shards(batch_id: int) -> Select:
+    """(shard, volume_liters, version) of every shard, locked in order."""
+    return (
+        select(ShardModel.shard, ShardModel.volume_liters, ShardModel.version)
+        .where(ShardModel.batch_id == batch_id)
+        .order_by(ShardModel.shard)
+        .with_for_update()
+    )
+
+
+def select_spare_shard(
+    batch_id: int, qty: float, start: int, skip_locked: bool
+) -> Select:
+    """
+    The first shard of a live batch from `start` on (wrapping around)
+    that covers qty, locked; with skip_locked, the first one that no
+    other transaction holds.
+    """
+    return (
+        select_available(ShardModel.shard)
+        .join(BatchModel, BatchModel.id == ShardModel.batch_id)
+        .where(
+            ShardModel.batch_id == batch_id,
+            ShardModel.volume_liters >= qty,
+        )
+        .order_by((ShardModel.shard >= start).desc(), ShardModel.shard)
+        .limit(1)
+        .with_for_update(of=ShardModel, skip_locked=skip_locked)
+    )
+
+
+def draw_shard_statement(batch_id: int, shard: int, qty: float) -> Update:
+    return (
+        update(ShardModel)
+        .where(
+            ShardModel.batch_id == batch_id,
+            ShardModel.shard == shard,
+            ShardModel.volume_liters >= qty,
+        )
+        .values(
+            volume_liters=ShardModel.volume_liters - qty,
+            version=ShardModel.version + 1,
+        )
+    )
+
+
+def select_sharded_fefo(
+    min_fat_percent: float | None,
+    max_fat_percent: float | None,
+    lock: str = "wait",
+) -> Select:
+    """
+    select_fefo as SHARDED_COLUMNS, see db_batch_repo, but locking the
+    batches FOR NO KEY UPDATE (see the module docstring).
+    """
+    stmt = select_live(*SHARDED_COLUMNS)
+    if min_fat_percent is not None:
+        stmt = stmt.where(BatchModel.fat_percent >= min_fat_percent)
+    if max_fat_percent is not None:
+        stmt = stmt.where(BatchModel.fat_percent <= max_fat_percent)
+    return (
+        stmt.order_by(BatchModel.expiry, BatchModel.id)
+        .with_for_update(
+            of=BatchModel,
+            key_share=True,
+            nowait=lock == "nowait",
+            skip_locked=lock == "skip_locked",
+        )
+        .execution_options(yield_per=FEFO_SCAN_CHUNK)
+    )
+
+
+def fold_statement(batch_id: int) -> Update:
+    """Write a batch's shard totals back into its row."""
+    return (
+        update(BatchModel)
+        .where(BatchModel.id == batch_id)
+        .values(volume_liters=AVAILABLE, version=BatchModel.version + DRAWN)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_shards_statement(batch_id: int) -> Delete:
+    return delete(ShardModel).where(ShardModel.batch_id == batch_id)
+
+
+def spread_rows(
+    batch_id: int, shards: Sequence, volume: float, draws: int
+) -> list[dict]:
+    """
+    batch_shards rows spreading volume evenly over (shard, volume,
+    version) shards, with draws more consumes counted on the first.
+    """
+    share = volume / len(shards)
+    rows = [
+        {
+            "batch_id": batch_id,
+            "shard": shard,
+            "volume_liters": share,
+            "version": version,
+        }
+        for shard, _, version in shards
+    ]
+    # The last shard takes the rounding error, so the shards sum to volume
+    rows[-1]["volume_liters"] = max(0.0, volume - share * (len(rows) - 1))
+    rows[0]["version"] += draws
+    return rows
+
+
+def split_rows(batch: BatchSchema, shards: int) -> list[dict]:
+    """Fresh batch_shards rows for a batch's whole volume."""
+    return spread_rows(
+        batch.id,
+        [(shard, 0.0, 0) for shard in range(shards)],
+        batch.volume_liters,
+        0,
+    )
+
+
+class ShardedBatchRepository(DBBatchRepository):
+    """DBBatchRepository that spreads each batch over `shards` rows."""
+
+    def __init__(
+        self,
+        fefo_lock: str = "wait",
+        shards: int = 8,
+        min_liters: float = 0.0,
+    ) -> None:
+        super().__init__(fefo_lock)
+        self._shards = shards
+        # Smaller batches keep their volume on the batch row
+        self._min_liters = min_liters
+
+    def _split_rows(self, batches: list[BatchSchema]) -> list[dict]:
+        return [
+            row
+            for batch in batches
+            if not batch._is_deleted
+            and batch.volume_liters > 0
+            and batch.volume_liters >= self._min_liters
+            for row in split_rows(batch, self._shards)
+        ]
+
+    def upsert(self, batch_schema: BatchSchema) -> BatchSchema:
+        """
+        Fold the batch's shards into its row first, so the write replaces
+        the volume the caller read and the version check sees every draw,
+        then split the written batch again. The batch row is locked before
+        the shards, in the order consume_fefo takes them.
+        """
+        if batch_schema.id:
+            with session_scope() as session:
+                session.execute(lock_batch_statement(batch_schema.id))
+                if session.execute(select_shards(batch_schema.id)).all():
+                    session.execute(fold_statement(batch_schema.id))
+                    session.execute(delete_shards_statement(batch_schema.id))
+        batch = super().upsert(batch_schema)
+        rows = self._split_rows([batch])
+        if rows:
+            with session_scope() as session:
+                session.execute(insert(ShardModel), rows)
+        return batch
+
+    def bulk_insert(self, batches: list[BatchSchema]) -> BulkCreateResult:
+        result = super().bulk_insert(batches)
+        rows = self._split_rows(result.created)
+        if rows:
+            with session_scope() as session:
+                session.execute(insert(ShardModel), rows)
+        return result
+
+    def consume(
+        self, batch_id: int, qty: float, order_id: str | None
+    ) -> BatchSchema | None:
+        """
+        Draw qty liters from one shard that holds them, or else from the
+        batch's shards together (see consume_many). Returns None (nothing
+        written) like DBBatchRepository.consume.
+        """
+        record = RecordSchema(
+            batch_id=batch_id,
+            consumed_at=datetime.now(UTC),
+            order_id=order_id,
+            qty=qty,
+        )
+        start = random.randrange(self._shards)  # noqa: S311
+        with session_scope() as session:
+            for skip_locked in (True, False):
+                shard = session.execute(
+                    select_spare_shard(batch_id, qty, start, skip_locked)
+                ).scalar_one_or_none()
+                if shard is not None:
+                    break
+            else:
+                (result,) = self.consume_many(batch_id, [record])
+                return result
+            stmt = draw_shard_statement(batch_id, shard, qty)
+            if session.execute(stmt).rowcount == 0:
+                raise ConcurrencyError()
+            session.add(record_schema_to_model(record))
+            row = session.execute(
+                select(*SHARDED_COLUMNS).where(BatchModel.id == batch_id)
+            ).one()
+            return row_to_schema(row)
+
+    def consume_many(
+        self, batch_id: int, records: list[RecordSchema]
+    ) -> list[BatchSchema | None]:
+        """
+        Lock every shard of the batch, accept records in order while
+        their total covers them, and spread what is left evenly over the
+        shards again. Unsharded batches go to DBBatchRepository.
+        """
+        refused = [None] * len(records)
+        with session_scope() as session:
+            shards = session.execute(select_shards(batch_id)).all()
+            if not shards:
+                return super().consume_many(batch_id, records)
+            row = session.execute(
+                select_live(*SHARDED_COLUMNS).where(BatchModel.id == batch_id)
+            ).one_or_none()
+            if row is None:
+                return refused
+            batch = row_to_schema(row)
+            volumes = accept_in_order(
+                batch.volume_liters, [record.qty for record in records]
+            )
+            accepted = [
+                record.model_dump(exclude={"id"})
+                for record, volume in zip(records, volumes, strict=True)
+                if volume is not None
+            ]
+            if not accepted:
+                return refused
+            left = min(volume for volume in volumes if volume is not None)
+            session.execute(
+                update(ShardModel),
+                spread_rows(batch_id, shards, left, len(accepted)),
+            )
+            session.execute(insert_group_records_statement(), accepted)
+            SHARD_REBALANCES.inc()
+            batch._version = batch._version + len(accepted)
+            return group_results(batch, volumes)
+
+    def _draw_fefo(self, session, batch: BatchSchema, qty: float) -> float:
+        """Take up to qty from a FEFO-locked batch; return the draw."""
+        shards = session.execute(select_shards(batch.id)).all()
+        if not shards:
+            take = min(batch.volume_liters, qty)
+            session.execute(consume_statement(batch.id, take))
+            return take
+        volume = sum(shard.volume_liters for shard in shards)
+        take = min(volume, qty)
+        session.execute(
+            update(ShardModel), spread_rows(batch.id, shards, volume - take, 1)
+        )
+        return take
+
+    def consume_fefo(
+        self,
+        qty: float,
+        order_id: str | None,
+        min_fat_percent: float | None = None,
+        max_fat_percent: float | None = None,
+    ) -> list[RecordSchema] | None:
+        """
+        FEFO draw-down, see DBBatchRepository. Shards are locked only
+        after the scan, so a batch can hold less by then than the scan
+        read; if the picked batches no longer cover qty it raises
+        ConcurrencyError with nothing drawn.
+        """
+        with session_scope() as session:
+            remaining, picked = qty, []
+            result = session.execute(
+                select_sharded_fefo(
+                    min_fat_percent, max_fat_percent, self._fefo_lock
+                )
+            )
+            for row in result:
+                picked.append(row_to_schema(row))
+                remaining -= picked[-1].volume_liters
+                if remaining <= 0:
+                    break
+            result.close()
+            if remaining > 0:
+                return None
+            draws, remaining = [], qty
+            with session.begin_nested():
+                for batch in picked:
+                    take = self._draw_fefo(session, batch, remaining)
+                    if take > 0:
+                        draws.append((batch.id, take))
+                        remaining -= take
+                if remaining > 0:
+                    raise ConcurrencyError()
+                records = session.execute(
+                    insert_records_statement(),
+                    fefo_record_rows(draws, order_id),
+                ).scalars()
+                return [record_model_to_schema(r) for r in records]
+
+    def list_all_available(self) -> list[BatchSchema]:
+        with read_session_scope() as session:
+            return [
+                row_to_schema(row)
+                for row in session.execute(select_live(*SHARDED_COLUMNS))
+            ]
+
+    def list_all_between_dates(
+        self, min_date: datetime, max_date: datetime
+    ) -> list[BatchSchema]:
+        with read_session_scope() as session:
+            stmt = select_live(*SHARDED_COLUMNS).where(
+                BatchModel.expiry >= min_date,
+                BatchModel.expiry <= max_date,
+            )
+            return [row_to_schema(row) for row in session.execute(stmt)]
+
+    def read_by_id(self, batch_id: int) -> BatchSchema | None:
+        with read_session_scope() as session:
+            stmt = select_live(*SHARDED_COLUMNS).where(
+                BatchModel.id == batch_id
+            )
+            row = session.execute(stmt).one_or_none()
+            return row_to_schema(row) if row else None
+
+    def read_for_update(
+        self, batch_id: int, nowait: bool = False
+    ) -> BatchSchema | None:
+        with session_scope() as session:
+            stmt = (
+                select_live(*SHARDED_COLUMNS)
+                .where(BatchModel.id == batch_id)
+                .with_for_update(of=BatchModel, nowait=nowait)
+            )
+            row = session.execute(stmt).one_or_none()
+            return row_to_schema(row) if row else None
+
+    def list_all(self) -> list[BatchSchema]:
+        with read_session_scope() as session:
+            return [
+                row_to_schema(row)
+                for row in session.execute(select(*SHARDED_COLUMNS))
+            ]
+
+    def list_page(
+        self, limit: int, after: int | None = None
+    ) -> list[BatchSchema]:
+        with read_session_scope() as session:
+            stmt = select_page(limit, after, SHARDED_COLUMNS)
+            return [row_to_schema(row) for row in session.execute(stmt)]
+
+    def iter_all(self) -> Iterator[BatchSchema]:
+        return stream_rows(select_stream(SHARDED_COLUMNS), row_to_schema)
@@ -0,0 +1,55 @@
+import inspect
+from functools import wraps
+from time import perf_counter
+from typing import Any
+
+from app.observability.metrics import REPOSITORY_LATENCY
+
+
+class TimedRepository:
+    """
+    Transparent proxy that records the latency of every repository call
+    in REPOSITORY_LATENCY, labelled with the wrapped class and method.
+
+    Works for sync and async ports alike: coroutine methods are awaited
+    inside the timer. Generators are passed through untimed, since only
+    their creation would be measured. Wrapped methods are cached on the
+    proxy, so the lookup cost is paid once per method.
+    """
+
+    def __init__(self, repo: Any, name: str | None = None) -> None:
+        self._repo = repo
+        self._name = name or type(repo).__name__
+
+    def __getattr__(self, attr: str) -> Any:
+        target = getattr(self._repo, attr)
+        if (
+            attr.startswith("_")
+            or not callable(target)
+            or inspect.isgeneratorfunction(target)
+            or inspect.isasyncgenfunction(target)
+        ):
+            return target
+        labels = (self._name, attr)
+        if inspect.iscoroutinefunction(target):
+
+            @wraps(target)
+            async def timed(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return await target(*args, **kwargs)
+                finally:
+                    REPOSITORY_LATENCY.observe(perf_counter() - start, *labels)
+
+        else:
+
+            @wraps(target)
+            def timed(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return target(*args, **kwargs)
+                finally:
+                    REPOSITORY_LATENCY.observe(perf_counter() - start, *labels)
+
+        setattr(self, attr, timed)
+        return timed
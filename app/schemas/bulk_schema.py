@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+from app.schemas.batches_schema import Batch
+
+
+class BulkItemError(BaseModel):
+    index: int  # position of the rejected item in the submitted manifest
+    batch_code: str
+    detail: str
+
+
+class BulkCreateResult(BaseModel):
+    created: list[Batch]
+    errors: list[BulkItemError]
@@ -2,12 +2,14 @@ from datetime import UTC, datetime
 
 from pydantic import BaseModel, Field, field_validator
 
+ORDER_ID_PATTERN = r"^[A-Z]{5}-\d{8}-\d{4}$"
+
 
 class ConsumptionRecord(BaseModel):
     id: int | None = None
     batch_id: int
     consumed_at: datetime
-    order_id: str | None = Field(pattern=r"^[A-Z]{5}-\d{8}-\d{4}$")
+    order_id: str | None = Field(pattern=ORDER_ID_PATTERN)
     qty: float = Field(
         ...,
         ge=0,
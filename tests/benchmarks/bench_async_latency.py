@@ -0,0 +1,100 @@
+"""p99 latency of the sync vs async DB paths under concurrent load.
+
+Runs the same mixed workload (reads by id plus consumes on a few hot
+batches) against the app launched with ``env=db`` (SessionLocal, called
+through the threadpool) and ``env=async_db`` (AsyncSession), both on a
+fresh SQLite file, and prints a latency summary per mode.
+
+    python -m tests.benchmarks.bench_async_latency --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from tests.benchmarks.common import (
+    batch_payload,
+    running_app,
+    sqlite_database,
+    summarize,
+    temp_dir,
+)
+
+MODES = {
+    "db": lambda path: {
+        "DAIRY_STORE_ENV": "db",
+        "DAIRY_STORE_DATABASE_URL": f"sqlite:///{path}",
+    },
+    "async_db": lambda path: {
+        "DAIRY_STORE_ENV": "async_db",
+        "DAIRY_STORE_ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{path}",
+    },
+}
+
+
+async def _workload(
+    base_url: str, requests: int, concurrency: int, batches: int
+) -> tuple[list[float], int]:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=60, limits=limits
+    ) as client:
+        ids = []
+        for i in range(batches):
+            resp = await client.post("/api/batches", json=batch_payload(i))
+            ids.append(resp.json()["id"])
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: list[float] = []
+        errors = 0
+
+        async def one(n: int) -> None:
+            nonlocal errors
+            batch_id = random.choice(ids)  # noqa: S311
+            async with semaphore:
+                start = time.perf_counter()
+                if n % 5 == 0:
+                    resp = await client.post(
+                        f"/api/batches/{batch_id}/consume",
+                        json={"qty": 0.01, "order_id": None},
+                    )
+                else:
+                    resp = await client.get(f"/api/batches/{batch_id}")
+                latencies.append(time.perf_counter() - start)
+            errors += resp.is_error
+
+        await asyncio.gather(*(one(n) for n in range(requests)))
+        return latencies, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=list(MODES))
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        with temp_dir() as directory:
+            path = sqlite_database(directory)
+            with running_app(MODES[mode](path)) as base_url:
+                latencies, errors = asyncio.run(
+                    _workload(
+                        base_url,
+                        args.requests,
+                        args.concurrency,
+                        args.batches,
+                    )
+                )
+        results[mode] = {**summarize(latencies), "errors": errors}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
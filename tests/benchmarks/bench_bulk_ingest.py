@@ -0,0 +1,76 @@
+"""Throughput of POST /api/batches (row by row) vs POST /api/batches/bulk.
+
+Both paths ingest the same number of batches into a fresh SQLite file
+through a launched app (``env=db``); manifests are sent in chunks of
+``--manifest-size`` items.
+
+    python -m tests.benchmarks.bench_bulk_ingest --batches 10000
+"""
+
+import argparse
+import json
+import time
+
+import httpx
+
+from tests.benchmarks.common import (
+    batch_payload,
+    running_app,
+    sqlite_database,
+    temp_dir,
+)
+
+
+def _single_row(client: httpx.Client, payloads: list[dict]) -> None:
+    for payload in payloads:
+        client.post("/api/batches", json=payload).raise_for_status()
+
+
+def _bulk(
+    client: httpx.Client, payloads: list[dict], manifest_size: int
+) -> None:
+    for start in range(0, len(payloads), manifest_size):
+        manifest = payloads[start : start + manifest_size]
+        resp = client.post("/api/batches/bulk", json=manifest)
+        resp.raise_for_status()
+        assert not resp.json()["errors"]  # noqa: S101
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batches", type=int, default=10000)
+    parser.add_argument("--manifest-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    runs = {
+        "single_row": _single_row,
+        "bulk": lambda client, payloads: _bulk(
+            client, payloads, args.manifest_size
+        ),
+    }
+    results = {}
+    for name, run in runs.items():
+        payloads = [batch_payload(i) for i in range(args.batches)]
+        with temp_dir() as directory:
+            path = sqlite_database(directory)
+            env = {
+                "DAIRY_STORE_ENV": "db",
+                "DAIRY_STORE_DATABASE_URL": f"sqlite:///{path}",
+            }
+            with (
+                running_app(env) as base_url,
+                httpx.Client(base_url=base_url, timeout=300) as client,
+            ):
+                start = time.perf_counter()
+                run(client, payloads)
+                elapsed = time.perf_counter() - start
+        results[name] = {
+            "batches": args.batches,
+            "seconds": round(elapsed, 3),
+            "batches_per_second": round(args.batches / elapsed, 1),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
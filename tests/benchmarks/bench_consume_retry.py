@@ -0,0 +1,181 @@
+"""Optimistic consume under contention: the old retry loop vs RetryPolicy.
+
+--threads workers each issue --consumes optimistic consumes against
+--hot-batches batches. By default the batches live in the in-memory
+repository behind a proxy that sleeps --rtt-ms per call, which stands in
+for the network round trip that leaves a window between the read and the
+versioned write on a real database. ``--backend sqlite`` uses a fresh
+SQLite file instead, one unit of work per consume (as in a request);
+SQLite serializes writers, so conflicts are rarer there and lock waits
+dominate. Every retry schedule runs the same workload:
+
+* ``legacy``: the previous loop, 3 attempts sleeping i * 0.25 s after the
+  i-th conflict, no jitter and no deadline;
+* ``jittered``: the default RetryPolicy (10 attempts, full jitter from
+  5 ms up to 100 ms, 1 s deadline).
+
+Reports the success rate, the aborts (RetriesExhaustedError, HTTP 409)
+and lock timeouts (OperationalError, HTTP 503) plus latency percentiles
+of every consume, successful or not.
+
+    python -m tests.benchmarks.bench_consume_retry --threads 16 --rtt-ms 1
+"""
+
+import argparse
+import json
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.domain.batch_service import BatchService
+from app.domain.retry_policy import RetriesExhaustedError, RetryPolicy
+from app.repositories.batch_repository import BatchRepository
+from app.repositories.db.unit_of_work import unit_of_work
+from app.repositories.db_batch_repo import DBBatchRepository
+from app.repositories.db_record_repo import DBRecordRepository
+from app.repositories.record_repository import RecordRepository
+from app.schemas.batches_schema import Batch
+from tests.benchmarks.common import (
+    batch_payload,
+    sqlite_database,
+    summarize,
+    temp_dir,
+)
+
+
+class LegacyRetryPolicy(RetryPolicy):
+    """The loop BatchService used before RetryPolicy existed."""
+
+    def __init__(self) -> None:
+        super().__init__(attempts=3, deadline=float("inf"))
+
+    def delay(self, attempt: int) -> float:
+        return attempt * 0.25
+
+
+POLICIES = {"legacy": LegacyRetryPolicy, "jittered": RetryPolicy}
+
+
+class RoundTrips:
+    """Proxy sleeping `rtt` seconds before every call to the wrapped port."""
+
+    def __init__(self, port, rtt: float) -> None:
+        self._port = port
+        self._rtt = rtt
+
+    def __getattr__(self, name: str):
+        method = getattr(self._port, name)
+
+        def call(*args, **kwargs):
+            time.sleep(self._rtt)
+            return method(*args, **kwargs)
+
+        return call
+
+
+@contextmanager
+def _memory(args: argparse.Namespace) -> Iterator[tuple]:
+    records = RecordRepository()
+    repo = BatchRepository(records)
+    ids = [
+        repo.upsert(Batch(**batch_payload(i, volume_liters=1e6))).id
+        for i in range(args.hot_batches)
+    ]
+    rtt = args.rtt_ms / 1000
+    yield RoundTrips(repo, rtt), RoundTrips(records, rtt), ids, nullcontext
+
+
+@contextmanager
+def _sqlite(args: argparse.Namespace) -> Iterator[tuple]:
+    with temp_dir() as directory:
+        engine = create_engine(f"sqlite:///{sqlite_database(directory)}")
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+        repo = DBBatchRepository()
+        with unit_of_work(session_factory):
+            ids = [
+                repo.upsert(Batch(**batch_payload(i, volume_liters=1e6))).id
+                for i in range(args.hot_batches)
+            ]
+
+        def transaction():
+            return unit_of_work(session_factory)
+
+        yield repo, DBRecordRepository(), ids, transaction
+        engine.dispose()
+
+
+BACKENDS = {"memory": _memory, "sqlite": _sqlite}
+
+
+def _run(policy: RetryPolicy, args: argparse.Namespace) -> dict:
+    with BACKENDS[args.backend](args) as (batches, records, ids, transaction):
+        service = BatchService(
+            batches,
+            records,
+            consume_strategy="optimistic",
+            retry_policy=policy,
+        )
+        results, elapsed = _contend(service, ids, transaction, args)
+
+    outcomes = [outcome for outcome, _ in results]
+    total = len(outcomes)
+    return {
+        "success_rate": round(outcomes.count("ok") / total, 4),
+        "aborted": outcomes.count("aborted"),
+        "lock_timeouts": outcomes.count("lock_timeout"),
+        "consumes_per_s": round(total / elapsed, 1),
+        **{
+            key: round(value, 2)
+            for key, value in summarize([t for _, t in results]).items()
+        },
+    }
+
+
+def _contend(
+    service: BatchService,
+    ids: list[int],
+    transaction: Callable,
+    args: argparse.Namespace,
+) -> tuple[list[tuple[str, float]], float]:
+    def consume(n: int) -> tuple[str, float]:
+        start = time.perf_counter()
+        try:
+            with transaction():
+                service.consume(ids[n % len(ids)], 0.01, None)
+            outcome = "ok"
+        except RetriesExhaustedError:
+            outcome = "aborted"
+        except OperationalError:
+            outcome = "lock_timeout"
+        return outcome, time.perf_counter() - start
+
+    total = args.threads * args.consumes
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(consume, range(total)))
+    return results, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--consumes", type=int, default=25)
+    parser.add_argument("--hot-batches", type=int, default=1)
+    parser.add_argument("--backend", choices=BACKENDS, default="memory")
+    parser.add_argument("--rtt-ms", type=float, default=1.0)
+    parser.add_argument(
+        "--policies", nargs="+", default=list(POLICIES), choices=POLICIES
+    )
+    args = parser.parse_args()
+
+    results = {name: _run(POLICIES[name](), args) for name in args.policies}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Cost of serializing list responses: response_model vs pre-serialized.
+
+Serves the same pre-built list of --sizes batches from two in-process
+routes, one returning it through ``response_model=list[Batch]`` (the
+previous path: validate, jsonable_encoder, json.dumps) and one through
+``json_list_response`` (one TypeAdapter pass to bytes), and reports the
+time per request and per batch. Also reports body size and encode time
+for gzip and, when installed, brotli.
+
+    python -m tests.benchmarks.bench_list_serialization --sizes 1000 10000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+
+from app.api.json_response import BATCH_LIST, encode_list, json_list_response
+from app.schemas.batches_schema import Batch
+from tests.benchmarks.common import batch_payload
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _app(batches: list[Batch]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/response-model", response_model=list[Batch])
+    async def response_model() -> list[Batch]:
+        return batches
+
+    @app.get("/pre-serialized", response_model=list[Batch])
+    async def pre_serialized(request: Request) -> list[Batch]:
+        return await json_list_response(request, batches, BATCH_LIST)
+
+    return app
+
+
+async def _per_request_ms(app: FastAPI, path: str, repeat: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        (await client.get(path)).raise_for_status()  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await client.get(path)
+        return 1000 * (time.perf_counter() - start) / repeat
+
+
+def _encode_ms(batches: list[Batch], encoding: str | None) -> float:
+    start = time.perf_counter()
+    encode_list(batches, BATCH_LIST, encoding)
+    return round(1000 * (time.perf_counter() - start), 2)
+
+
+def _measure(size: int, repeat: int) -> dict[str, float]:
+    batches = BATCH_LIST.validate_python(
+        [{"id": i + 1, **batch_payload(i)} for i in range(size)]
+    )
+    app = _app(batches)
+    results = {}
+    for path in ("/response-model", "/pre-serialized"):
+        ms = asyncio.run(_per_request_ms(app, path, repeat))
+        name = path.strip("/").replace("-", "_")
+        results[f"{name}_ms"] = round(ms, 2)
+        results[f"{name}_us_per_batch"] = round(1000 * ms / size, 3)
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    results["json_bytes"] = len(encode_list(batches, BATCH_LIST)[0])
+    for encoding in encodings:
+        results[f"{encoding}_bytes"] = len(
+            encode_list(batches, BATCH_LIST, encoding)[0]
+        )
+        results[f"{encoding}_encode_ms"] = _encode_ms(batches, encoding)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[1000, 10_000, 100_000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    results = {size: _measure(size, args.repeat) for size in args.sizes}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
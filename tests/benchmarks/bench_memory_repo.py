@@ -0,0 +1,99 @@
+"""Per-operation cost of the in-memory BatchRepository as it grows.
+
+Fills the repository with 1k/10k/100k batches and times read_by_id,
+consume, upsert, near-expiry and soft_delete. Costs per call should stay
+flat (dict lookups) or grow logarithmically (bisect on the expiry index)
+rather than linearly with the number of batches. The near-expiry window
+matches the same PROBES batches at every size, expiring well after the
+filler ones, so its cost is the bisect plus a fixed number of rows.
+
+    python -m tests.benchmarks.bench_memory_repo --sizes 1000 10000 100000
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import UTC, datetime, timedelta
+
+from app.repositories.batch_repository import BatchRepository
+from app.schemas.batches_schema import Batch
+from tests.benchmarks.common import batch_payload
+
+PROBES = 10  # batches in the near-expiry window, whatever the size
+PROBE_EXPIRY_DAYS = 60  # past every filler batch (1-30 days)
+
+
+def _per_call_us(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return round(1e6 * (time.perf_counter() - start) / calls, 2)
+
+
+def _filled(size: int) -> BatchRepository:
+    repo = BatchRepository()
+    repo.bulk_insert([Batch(**batch_payload(i)) for i in range(size)])
+    # Received in the future, so nothing else expires near them
+    received_at = datetime.now(UTC) + timedelta(days=PROBE_EXPIRY_DAYS - 1)
+    repo.bulk_insert(
+        [
+            Batch(
+                **batch_payload(size + i)
+                | {"received_at": received_at, "shelf_life_days": 1}
+            )
+            for i in range(PROBES)
+        ]
+    )
+    return repo
+
+
+def _measure(repo: BatchRepository, calls: int) -> dict[str, float]:
+    ids = [batch.id for batch in repo.list_all()]
+    now = datetime.now(UTC)
+    window = (
+        now + timedelta(days=PROBE_EXPIRY_DAYS - 1),
+        now + timedelta(days=PROBE_EXPIRY_DAYS + 1),
+    )
+    assert len(repo.list_all_between_dates(*window)) == PROBES
+
+    def pick() -> int:
+        return random.choice(ids)  # noqa: S311
+
+    def upsert() -> None:
+        batch = repo.read_by_id(pick())
+        if batch is not None:
+            batch.fat_percent = 4.0
+            repo.upsert(batch)
+
+    return {
+        "read_by_id_us": _per_call_us(lambda: repo.read_by_id(pick()), calls),
+        "consume_us": _per_call_us(
+            lambda: repo.consume(pick(), 0.01, None), calls
+        ),
+        "upsert_us": _per_call_us(upsert, calls),
+        "near_expiry_us": _per_call_us(
+            lambda: repo.list_all_between_dates(*window), calls
+        ),
+        "soft_delete_us": _per_call_us(
+            lambda: repo.soft_delete(pick()), calls
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {
+        size: _measure(_filled(size), args.calls) for size in args.sizes
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Requests/sec of GET /api/batches/near-expiry with and without the view.
+
+Seeds a fresh SQLite file with --batches batches (expiry spread over 30
+days) through the bulk endpoint, then polls near-expiry with a rotating
+n_days from --concurrency clients for --duration seconds, once against
+the plain DB repository and once with the day-bucketed view enabled.
+
+    python -m tests.benchmarks.bench_near_expiry --batches 10000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from tests.benchmarks.common import (
+    batch_payload,
+    running_app,
+    sqlite_database,
+    summarize,
+    temp_dir,
+)
+
+MODES = {
+    "db": {},
+    "db+view": {"DAIRY_STORE_NEAR_EXPIRY_VIEW_ENABLED": "true"},
+}
+SEED_CHUNK = 1000
+
+
+async def _poll(
+    base_url: str, batches: int, duration: float, concurrency: int
+) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        for start in range(0, batches, SEED_CHUNK):
+            chunk = range(start, min(start + SEED_CHUNK, batches))
+            resp = await client.post(
+                "/api/batches/bulk",
+                json=[batch_payload(i) for i in chunk],
+            )
+            resp.raise_for_status()
+        await client.get("/api/batches/near-expiry", params={"n_days": 1})
+
+        latencies: list[float] = []
+        errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def client_loop(n: int) -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                resp = await client.get(
+                    "/api/batches/near-expiry",
+                    params={"n_days": 1 + n % 7},
+                )
+                latencies.append(time.perf_counter() - start)
+                errors += resp.is_error
+                n += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return {
+            "requests_per_sec": round(len(latencies) / elapsed, 1),
+            **summarize(latencies),
+            "errors": errors,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batches", type=int, default=10_000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", default=list(MODES))
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        with temp_dir() as directory:
+            path = sqlite_database(directory)
+            env = {
+                "DAIRY_STORE_ENV": "db",
+                "DAIRY_STORE_DATABASE_URL": f"sqlite:///{path}",
+                **MODES[mode],
+            }
+            with running_app(env) as base_url:
+                results[mode] = asyncio.run(
+                    _poll(
+                        base_url,
+                        args.batches,
+                        args.duration,
+                        args.concurrency,
+                    )
+                )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
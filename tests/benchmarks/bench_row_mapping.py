@@ -0,0 +1,162 @@
+"""Per-row cost of mapping DB rows to schemas: validated vs trusted.
+
+Seeds a SQLite file with --rows batches and as many consumption records,
+then times, per row:
+
+* ``map_*``: mapping already-fetched data only, the previous
+  ``model_validate`` mapping of ORM objects vs ``row_to_schema`` on
+  column tuples;
+* ``read_*``: a full-table read, ORM select + validation vs column
+  select + trusted construction.
+
+    python -m tests.benchmarks.bench_row_mapping --rows 100000
+"""
+
+import argparse
+import json
+import time
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.repositories import db_batch_repo, db_record_repo
+from app.repositories.db.models import Batch as BatchModel
+from app.repositories.db.models import ConsumptionRecord as RecordModel
+from app.schemas.batches_schema import Batch as BatchSchema
+from app.schemas.consumption_record import ConsumptionRecord as RecordSchema
+from tests.benchmarks.common import sqlite_database, temp_dir
+
+
+def _validated_batch(model: BatchModel) -> BatchSchema:
+    """The mapping every read path used before the trusted fast path."""
+    schema = BatchSchema.model_validate(
+        {
+            "id": model.id,
+            "batch_code": model.batch_code,
+            "received_at": model.received_at,
+            "shelf_life_days": model.shelf_life_days,
+            "volume_liters": model.volume_liters,
+            "fat_percent": model.fat_percent,
+        }
+    )
+    object.__setattr__(schema, "_is_deleted", bool(model.is_deleted))
+    object.__setattr__(schema, "_version", int(model.version or 0))
+    object.__setattr__(schema, "_expiry", BatchSchema.ensure_utc(model.expiry))
+    return schema
+
+
+def _validated_record(model: RecordModel) -> RecordSchema:
+    return RecordSchema.model_validate(
+        {
+            "id": model.id,
+            "batch_id": model.batch_id,
+            "consumed_at": model.consumed_at,
+            "order_id": model.order_id,
+            "qty": model.qty,
+        }
+    )
+
+
+# name -> (ORM model, row columns, validated mapping, trusted mapping)
+CASES = {
+    "batch": (
+        BatchModel,
+        db_batch_repo.BATCH_COLUMNS,
+        _validated_batch,
+        db_batch_repo.row_to_schema,
+    ),
+    "record": (
+        RecordModel,
+        db_record_repo.RECORD_COLUMNS,
+        _validated_record,
+        db_record_repo.row_to_schema,
+    ),
+}
+
+
+def _seed(engine, rows: int) -> None:
+    now = datetime.now(UTC)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(BatchModel),
+            [
+                {
+                    "batch_code": f"BEN-{i // 10000:08d}-{i % 10000:04d}",
+                    "received_at": now,
+                    "shelf_life_days": 1 + i % 30,
+                    "volume_liters": 1000.0,
+                    "fat_percent": 3.5,
+                    "is_deleted": False,
+                    "version": 1,
+                    "expiry": now + timedelta(days=1 + i % 30),
+                }
+                for i in range(rows)
+            ],
+        )
+        conn.execute(
+            insert(RecordModel),
+            [
+                {
+                    "batch_id": 1 + i,
+                    "consumed_at": now,
+                    "order_id": f"ORDER-{i // 10000:08d}-{i % 10000:04d}",
+                    "qty": 1.0,
+                }
+                for i in range(rows)
+            ],
+        )
+
+
+def _per_row_us(fn, rows: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return round(1e6 * (time.perf_counter() - start) / rows, 2)
+
+
+def _measure(engine, rows: int, case: tuple) -> dict[str, float]:
+    model, columns, validated, trusted = case
+    with Session(engine) as session:
+        models = session.execute(select(model)).scalars().all()
+        tuples = session.execute(select(*columns)).all()
+        results = {
+            "map_validated_us": _per_row_us(
+                lambda: [validated(m) for m in models], rows
+            ),
+            "map_trusted_us": _per_row_us(
+                lambda: [trusted(t) for t in tuples], rows
+            ),
+        }
+    with Session(engine) as session:
+        results["read_validated_us"] = _per_row_us(
+            lambda: [
+                validated(m) for m in session.execute(select(model)).scalars()
+            ],
+            rows,
+        )
+    with Session(engine) as session:
+        results["read_trusted_us"] = _per_row_us(
+            lambda: [trusted(t) for t in session.execute(select(*columns))],
+            rows,
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with temp_dir() as directory:
+        engine = create_engine(f"sqlite:///{sqlite_database(directory)}")
+        _seed(engine, args.rows)
+        results = {
+            name: _measure(engine, args.rows, case)
+            for name, case in CASES.items()
+        }
+        engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Shared helpers for the benchmark scripts in this package.
+
+Benchmarks are plain scripts (``python -m tests.benchmarks.<name>``), they
+are not collected by pytest. DB-backed runs use a throwaway SQLite file so
+they work anywhere; point them at Postgres through the usual
+``DAIRY_STORE_*`` variables for production-like numbers.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+
+import httpx
+from sqlalchemy import create_engine
+
+from app.repositories.db.models import Base
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of samples (pct in 0..100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    return {
+        "n": len(samples),
+        "mean_ms": 1000 * sum(samples) / max(len(samples), 1),
+        "p50_ms": 1000 * percentile(samples, 50),
+        "p95_ms": 1000 * percentile(samples, 95),
+        "p99_ms": 1000 * percentile(samples, 99),
+    }
+
+
+def sqlite_database(directory: str, name: str = "bench.db") -> str:
+    """Create the schema in a fresh SQLite file and return its path."""
+    path = os.path.join(directory, name)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return path
+
+
+class AppDidNotStartError(RuntimeError):
+    pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def running_app(env: dict[str, str], cwd: Path = ROOT) -> Iterator[str]:
+    """Launch the API under uvicorn with extra env vars; yield its base url."""
+    port = free_port()
+    proc = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.__main__:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=cwd,
+        env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f"{base_url}/openapi.json", timeout=1)
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise AppDidNotStartError from None
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+@contextmanager
+def temp_dir() -> Iterator[str]:
+    with tempfile.TemporaryDirectory(prefix="dairy-bench-") as directory:
+        yield directory
+
+
+def batch_payload(i: int, volume_liters: float = 1000.0) -> dict:
+    """A valid POST /api/batches body with a unique batch_code per i."""
+    return {
+        "batch_code": f"BEN-{i // 10000:08d}-{i % 10000:04d}",
+        "received_at": datetime.now(UTC).isoformat(),
+        "shelf_life_days": 1 + i % 30,
+        "volume_liters": volume_liters,
+        "fat_percent": 3.5,
+    }
@@ -0,0 +1,327 @@
+"""Microbenchmark suite for the hot paths, with a JSON baseline gate.
+
+Times schema construction/validation, the DB <-> schema mappings, every
+BatchPort method on the in-memory and the SQLite-backed repository, and
+BatchService.consume from several threads hitting the same batches.
+Each case runs --rounds rounds of up to --number calls; the best round
+is the headline number (least disturbed by the machine), the median is kept
+for reference.
+
+    python -m tests.benchmarks.suite --output results.json
+    python -m tests.benchmarks.suite --save-baseline baseline.json
+    python -m tests.benchmarks.suite --baseline baseline.json --threshold 0.25
+
+With --baseline the run exits with status 1 when any case's best time
+is more than --threshold (a fraction) slower than in the baseline.
+Baselines are machine specific: record one on the same host, from the
+main branch, before comparing a change against it.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from datetime import UTC, datetime, timedelta
+from itertools import count
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.domain.batch_port import BatchPort, ConcurrencyError
+from app.domain.batch_service import BatchService
+from app.repositories.batch_repository import BatchRepository
+from app.repositories.db.unit_of_work import unit_of_work
+from app.repositories.db_batch_repo import (
+    DBBatchRepository,
+    model_to_schema,
+    row_to_schema,
+    schema_to_model,
+)
+from app.repositories.db_record_repo import DBRecordRepository
+from app.repositories.record_repository import RecordRepository
+from app.schemas.batches_schema import Batch
+from app.schemas.consumption_record import ConsumptionRecord
+from tests.benchmarks.common import batch_payload, sqlite_database, temp_dir
+
+CONTENTION_OPS = 200  # consumes per timed call of a contention case
+CONTENTION_BATCHES = 4  # batches the threads fight over
+ROUND_SECONDS = 0.1  # target duration of one round for slow cases
+
+# A case is (operation, operations performed per call of it)
+Case = tuple[Callable[[], object], int]
+
+
+def _codes() -> Callable[[], str]:
+    numbers = count(10_000_000)
+    return lambda: batch_payload(next(numbers))["batch_code"]
+
+
+def schema_cases() -> dict[str, Case]:
+    payload = batch_payload(1)
+    record_payload = {
+        "batch_id": 1,
+        "consumed_at": datetime.now(UTC).isoformat(),
+        "order_id": "ORDER-00000001-0001",
+        "qty": 1.5,
+    }
+    batch = Batch(id=1, **payload)
+    model = schema_to_model(batch)
+    model.id = 1
+    row = (1, batch.batch_code, batch.received_at, 7, 1000.0, 3.5, False, 1)
+    row += (batch._expiry,)
+    return {
+        "schema.batch_validate": (lambda: Batch.model_validate(payload), 1),
+        "schema.record_validate": (
+            lambda: ConsumptionRecord.model_validate(record_payload),
+            1,
+        ),
+        "schema.batch_copy": (batch.model_copy, 1),
+        "schema.batch_dump_json": (batch.model_dump_json, 1),
+        "mapping.model_to_schema": (lambda: model_to_schema(model), 1),
+        "mapping.schema_to_model": (lambda: schema_to_model(batch), 1),
+        "mapping.row_to_schema": (lambda: row_to_schema(row), 1),
+    }
+
+
+def port_cases(
+    prefix: str, repo: BatchPort, run: Callable[[Callable], object]
+) -> dict[str, Case]:
+    """Every BatchPort method; `run` wraps a call in its transaction."""
+    ids = [batch.id for batch in run(repo.list_all)]
+    picks = count()
+    code = _codes()
+    now = datetime.now(UTC)
+
+    def pick() -> int:
+        return ids[next(picks) % len(ids)]
+
+    def upsert() -> None:
+        def read_then_write() -> None:
+            batch = repo.read_by_id(pick())
+            if batch is not None:
+                batch.fat_percent = 4.0
+                repo.upsert(batch)
+
+        run(read_then_write)
+
+    def bulk_insert() -> None:
+        batches = [
+            Batch(**{**batch_payload(0), "batch_code": code()})
+            for _ in range(10)
+        ]
+        run(lambda: repo.bulk_insert(batches))
+
+    # Reads first: writes change how many rows later cases see
+    cases = {
+        "read_by_id": (lambda: run(lambda: repo.read_by_id(pick())), 1),
+        "list_all_available": (lambda: run(repo.list_all_available), 1),
+        "list_between_1d": (
+            lambda: run(
+                lambda: repo.list_all_between_dates(
+                    now, now + timedelta(days=1)
+                )
+            ),
+            1,
+        ),
+        "list_all": (lambda: run(repo.list_all), 1),
+        "list_page_100": (lambda: run(lambda: repo.list_page(100)), 1),
+    }
+    if isinstance(repo, BatchRepository):
+        # The DB version streams from its own engine (the configured URL)
+        cases["iter_all"] = (lambda: run(lambda: list(repo.iter_all())), 1)
+    cases |= {
+        "upsert_after_read": (upsert, 1),
+        "consume": (lambda: run(lambda: repo.consume(pick(), 0.01, None)), 1),
+        "consume_fefo": (
+            lambda: run(lambda: repo.consume_fefo(0.01, None)),
+            1,
+        ),
+        "bulk_insert_10": (bulk_insert, 10),
+        "soft_delete": (lambda: run(lambda: repo.soft_delete(pick())), 1),
+    }
+    return {f"{prefix}.{name}": case for name, case in cases.items()}
+
+
+def contention_case(
+    service: BatchService,
+    batch_ids: list[int],
+    threads: int,
+    run: Callable[[Callable], object],
+) -> Case:
+    """CONTENTION_OPS consumes spread over a few batches by many threads."""
+    batch_ids = batch_ids[:CONTENTION_BATCHES]
+
+    def consume(i: int) -> None:
+        # An abort is counted by the retry/abort metrics, not a failure here
+        with suppress(ConcurrencyError):
+            run(
+                lambda: service.consume(
+                    batch_ids[i % len(batch_ids)], 0.01, None
+                )
+            )
+
+    def burst() -> None:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(consume, range(CONTENTION_OPS)))
+
+    return burst, CONTENTION_OPS
+
+
+def _seed(repo: BatchPort, size: int, run: Callable[[Callable], object]):
+    for start in range(0, size, 500):
+        batches = [
+            Batch(**batch_payload(i, volume_liters=1e9))
+            for i in range(start, min(start + 500, size))
+        ]
+        run(lambda batches=batches: repo.bulk_insert(batches))
+
+
+def _direct(call: Callable) -> object:
+    return call()
+
+
+def build_cases(directory: str, size: int, threads: int) -> dict[str, Case]:
+    cases = schema_cases()
+
+    memory = BatchRepository(RecordRepository())
+    _seed(memory, size, _direct)
+    cases |= port_cases("memory", memory, _direct)
+    for strategy in ("atomic", "optimistic"):
+        records = RecordRepository()
+        repo = BatchRepository(records)
+        _seed(repo, size, _direct)
+        service = BatchService(repo, records, consume_strategy=strategy)
+        ids = [batch.id for batch in repo.list_all()]
+        cases[f"service.consume_{strategy}.memory.{threads}_threads"] = (
+            contention_case(service, ids, threads, _direct)
+        )
+
+    engine = create_engine(f"sqlite:///{sqlite_database(directory)}")
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    def in_unit_of_work(call: Callable) -> object:
+        with unit_of_work(session_factory):
+            return call()
+
+    db = DBBatchRepository()
+    _seed(db, size, in_unit_of_work)
+    # Taken before the port cases soft-delete their way through the table
+    ids = [batch.id for batch in in_unit_of_work(db.list_all)]
+    service = BatchService(db, DBRecordRepository())
+    cases[f"service.consume_atomic.sqlite.{threads}_threads"] = (
+        contention_case(
+            service, ids[-CONTENTION_BATCHES:], threads, in_unit_of_work
+        )
+    )
+    cases |= port_cases("sqlite", db, in_unit_of_work)
+    return cases
+
+
+def measure(case: Case, number: int, rounds: int) -> dict[str, float]:
+    """
+    Best and median microseconds per operation over the rounds. A round
+    is up to `number` calls, fewer for slow cases so that it stays near
+    ROUND_SECONDS.
+    """
+    operation, per_call = case
+    start = time.perf_counter()
+    operation()  # warm-up: imports, statement caches, first connection
+    first = time.perf_counter() - start
+    calls = max(1, min(number, int(ROUND_SECONDS / max(first, 1e-9))))
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            operation()
+        timings.append(
+            1e6 * (time.perf_counter() - start) / (calls * per_call)
+        )
+    return {
+        "best_us": round(min(timings), 2),
+        "median_us": round(statistics.median(timings), 2),
+    }
+
+
+def compare(
+    results: dict, baseline: dict, threshold: float
+) -> tuple[list[str], list[str]]:
+    """Report lines for every shared case, and those that regressed."""
+    report, regressions = [], []
+    for name, result in results["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            report.append(f"{name}: new, {result['best_us']} us")
+            continue
+        ratio = result["best_us"] / max(before["best_us"], 1e-9)
+        line = (
+            f"{name}: {before['best_us']} -> {result['best_us']} us"
+            f" ({ratio - 1:+.0%})"
+        )
+        report.append(line)
+        if ratio > 1 + threshold:
+            regressions.append(line)
+    return report, regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("-k", dest="only", help="run cases containing this")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with temp_dir() as directory:
+        cases = build_cases(directory, args.size, args.threads)
+        results = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "size": args.size,
+                "number": args.number,
+                "rounds": args.rounds,
+                "threads": args.threads,
+                "run_at": datetime.now(UTC).isoformat(),
+            },
+            "results": {
+                name: measure(case, args.number, args.rounds)
+                for name, case in cases.items()
+                if args.only is None or args.only in name
+            },
+        }
+    text = json.dumps(results, indent=2)
+    print(text)
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            path.write_text(text + "\n")
+    if args.baseline is None:
+        return
+    report, regressions = compare(
+        results, json.loads(args.baseline.read_text()), args.threshold
+    )
+    print("\n".join(report), file=sys.stderr)
+    if regressions:
+        print(
+            f"{len(regressions)} case(s) over +{args.threshold:.0%}:",
+            *regressions,
+            sep="\n",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Headless mixed-workload load test with SLO checks.
+
+Launches the app (in memory, or on a fresh SQLite file), seeds --batches
+batches through the bulk endpoint, then runs --concurrency closed-loop
+clients for --duration seconds. Each client picks a weighted scenario
+per request:
+
+* create: POST /api/batches with a new batch_code
+* consume_hot: consume from one of --hot-keys batches everyone wants
+* consume_uniform: consume from any seeded batch
+* read_by_id: GET /api/batches/{id}, uniformly
+* near_expiry: poll GET /api/batches/near-expiry
+* admin_export: NDJSON export of the last minute of consumption
+
+Requests made during --warmup are not measured. The run passes when
+throughput, per-scenario p95/p99 and error rates meet SLOS (override any
+of them with --slo file.json, same shape). The JSON report goes to
+stdout and to --report; the exit status is 1 on a missed SLO.
+
+    python -m tests.end_to_end.load_harness --mode sqlite --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import UTC, datetime, timedelta
+from itertools import count
+from pathlib import Path
+
+import httpx
+
+from tests.benchmarks.common import (
+    batch_payload,
+    running_app,
+    sqlite_database,
+    summarize,
+    temp_dir,
+)
+
+MODES = {
+    "memory": lambda path: {"DAIRY_STORE_ENV": "dev"},
+    "sqlite": lambda path: {
+        "DAIRY_STORE_ENV": "db",
+        "DAIRY_STORE_DATABASE_URL": f"sqlite:///{path}",
+    },
+    "async_sqlite": lambda path: {
+        "DAIRY_STORE_ENV": "async_db",
+        "DAIRY_STORE_ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{path}",
+    },
+}
+
+# name -> relative weight in the request mix
+WEIGHTS = {
+    "create": 5,
+    "consume_hot": 15,
+    "consume_uniform": 30,
+    "read_by_id": 30,
+    "near_expiry": 15,
+    "admin_export": 5,
+}
+
+# Declared targets; latencies in ms, error rate as a fraction (5xx and
+# transport errors; 4xx answers are business outcomes, not errors)
+SLOS = {
+    "throughput_rps": 100,
+    "scenarios": {
+        "create": {"p95_ms": 300, "p99_ms": 800, "error_rate": 0.01},
+        "consume_hot": {"p95_ms": 300, "p99_ms": 800, "error_rate": 0.01},
+        "consume_uniform": {"p95_ms": 300, "p99_ms": 800, "error_rate": 0.01},
+        "read_by_id": {"p95_ms": 150, "p99_ms": 300, "error_rate": 0.01},
+        "near_expiry": {"p95_ms": 250, "p99_ms": 500, "error_rate": 0.01},
+        "admin_export": {"p95_ms": 500, "p99_ms": 1000, "error_rate": 0.01},
+    },
+}
+
+SEED_MANIFEST = 500  # batches per bulk request while seeding
+SEED_VOLUME = 1e6  # liters, so consumes never run a batch dry
+CONSUME_QTY = 0.01
+
+
+class Workload:
+    """Issues scenario requests against the seeded batches."""
+
+    def __init__(
+        self, client: httpx.AsyncClient, ids: list[int], hot_keys: int
+    ) -> None:
+        self.client = client
+        self.ids = ids
+        self.hot_ids = ids[:hot_keys]
+        self.codes = count(len(ids))
+        self.orders = count()
+
+    def _order_id(self) -> str:
+        n = next(self.orders)
+        return f"ORDER-{n // 10000:08d}-{n % 10000:04d}"
+
+    async def create(self, rng: random.Random) -> httpx.Response:
+        return await self.client.post(
+            "/api/batches", json=batch_payload(next(self.codes))
+        )
+
+    async def _consume(self, batch_id: int) -> httpx.Response:
+        return await self.client.post(
+            f"/api/batches/{batch_id}/consume",
+            json={"qty": CONSUME_QTY, "order_id": self._order_id()},
+        )
+
+    async def consume_hot(self, rng: random.Random) -> httpx.Response:
+        return await self._consume(rng.choice(self.hot_ids))
+
+    async def consume_uniform(self, rng: random.Random) -> httpx.Response:
+        return await self._consume(rng.choice(self.ids))
+
+    async def read_by_id(self, rng: random.Random) -> httpx.Response:
+        return await self.client.get(f"/api/batches/{rng.choice(self.ids)}")
+
+    async def near_expiry(self, rng: random.Random) -> httpx.Response:
+        return await self.client.get(
+            "/api/batches/near-expiry", params={"n_days": rng.randint(1, 3)}
+        )
+
+    async def admin_export(self, rng: random.Random) -> httpx.Response:
+        since = datetime.now(UTC) - timedelta(minutes=1)
+        return await self.client.get(
+            "/admin/records/export",
+            params={"format": "ndjson", "since": since.isoformat()},
+        )
+
+
+async def _seed(client: httpx.AsyncClient, batches: int) -> list[int]:
+    ids = []
+    for start in range(0, batches, SEED_MANIFEST):
+        manifest = [
+            batch_payload(i, volume_liters=SEED_VOLUME)
+            for i in range(start, min(start + SEED_MANIFEST, batches))
+        ]
+        resp = await client.post("/api/batches/bulk", json=manifest)
+        resp.raise_for_status()
+        ids.extend(batch["id"] for batch in resp.json()["created"])
+    return ids
+
+
+async def _run(base_url: str, args: argparse.Namespace) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=60, limits=limits
+    ) as client:
+        ids = await _seed(client, args.batches)
+        workload = Workload(client, ids, args.hot_keys)
+        names = list(WEIGHTS)
+        weights = [WEIGHTS[name] for name in names]
+        samples: dict[str, list[float]] = {name: [] for name in names}
+        errors = dict.fromkeys(names, 0)
+        rejected = dict.fromkeys(names, 0)
+        started = time.perf_counter()
+        measure_from = started + args.warmup
+        deadline = measure_from + args.duration
+
+        async def client_loop(seed: int) -> None:
+            rng = random.Random(seed)  # noqa: S311
+            while (now := time.perf_counter()) < deadline:
+                name = rng.choices(names, weights)[0]
+                try:
+                    resp = await getattr(workload, name)(rng)
+                    failed, refused = (
+                        resp.is_server_error,
+                        resp.is_client_error,
+                    )
+                    # Drain streamed exports so their latency is the full body
+                    await resp.aread()
+                except httpx.TransportError:
+                    failed, refused = True, False
+                if now < measure_from:
+                    continue
+                samples[name].append(time.perf_counter() - now)
+                errors[name] += failed
+                rejected[name] += refused
+
+        await asyncio.gather(
+            *(client_loop(args.seed + n) for n in range(args.concurrency))
+        )
+        elapsed = time.perf_counter() - measure_from
+
+    total = sum(len(latencies) for latencies in samples.values())
+    return {
+        "throughput_rps": round(total / elapsed, 1),
+        "requests": total,
+        "scenarios": {
+            name: {
+                **{
+                    key: round(value, 2)
+                    for key, value in summarize(samples[name]).items()
+                },
+                "errors": errors[name],
+                "rejected": rejected[name],
+                "error_rate": round(
+                    errors[name] / max(len(samples[name]), 1), 4
+                ),
+            }
+            for name in names
+        },
+    }
+
+
+def check_slos(results: dict, slos: dict) -> list[str]:
+    """Human-readable description of every missed target."""
+    violations = []
+    if results["throughput_rps"] < slos["throughput_rps"]:
+        violations.append(
+            f"throughput {results['throughput_rps']} rps"
+            f" < {slos['throughput_rps']} rps"
+        )
+    for name, targets in slos["scenarios"].items():
+        observed = results["scenarios"].get(name)
+        if observed is None or observed["n"] == 0:
+            continue
+        for key, limit in targets.items():
+            if observed[key] > limit:
+                violations.append(f"{name} {key} {observed[key]} > {limit}")
+    return violations
+
+
+def _merged_slos(path: Path | None) -> dict:
+    slos = {**SLOS, "scenarios": {**SLOS["scenarios"]}}
+    if path is None:
+        return slos
+    override = json.loads(path.read_text())
+    slos["throughput_rps"] = override.get(
+        "throughput_rps", slos["throughput_rps"]
+    )
+    for name, targets in override.get("scenarios", {}).items():
+        slos["scenarios"][name] = {
+            **slos["scenarios"].get(name, {}),
+            **targets,
+        }
+    return slos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--mode", choices=list(MODES), default="memory")
+    parser.add_argument("--batches", type=int, default=5000)
+    parser.add_argument("--hot-keys", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slo", type=Path)
+    parser.add_argument("--report", type=Path)
+    args = parser.parse_args()
+
+    slos = _merged_slos(args.slo)
+    with temp_dir() as directory:
+        env = MODES[args.mode](sqlite_database(directory))
+        with running_app(env) as base_url:
+            results = asyncio.run(_run(base_url, args))
+    violations = check_slos(results, slos)
+    report = {
+        "config": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items()
+        },
+        "weights": WEIGHTS,
+        "slos": slos,
+        "results": results,
+        "passed": not violations,
+        "violations": violations,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report is not None:
+        args.report.write_text(text + "\n")
+    if violations:
+        print("SLO missed:", *violations, sep="\n  ", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
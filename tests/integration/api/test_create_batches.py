@@ -1,10 +1,19 @@
+import json
 import random
 from datetime import UTC, datetime, timedelta
 
 from fastapi import status
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
 
 from app.__main__ import app
+from app.api import admin_endpoints
+from app.config.dependency_injection import (
+    get_batch_service,
+    get_settings_cached,
+)
+from app.domain.batch_port import ConcurrencyError
+from app.domain.retry_policy import RetriesExhaustedError
 
 client = TestClient(app)
 now = datetime.now(UTC)
@@ -102,6 +111,28 @@ def test_consume_batch_reduces_volume_and_returns_updated_batch():
     assert batch_id in [admin["batch_id"] for admin in admin_response]
 
 
+def test_consume_rejects_malformed_order_ids_before_writing():
+    volume = 500.0
+    create_response = client.post(
+        "/api/batches",
+        json={
+            "batch_code": f"SCH-{n_len_rand(8)}-{n_len_rand(4)}",
+            "received_at": now_str,
+            "volume_liters": volume,
+        },
+    )
+    batch_id = create_response.json()["id"]
+
+    response = client.post(
+        f"/api/batches/{batch_id}/consume",
+        json={"qty": 10, "order_id": "ORD-12345"},
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    read = client.get(f"/api/batches/{batch_id}").json()
+    assert read["volume_liters"] == volume
+
+
 def test_near_expiry_returns_batches():
     create_payload = {
         "batch_code": f"SCH-{n_len_rand(8)}-{n_len_rand(4)}",
@@ -153,3 +184,263 @@ def test_delete_batch_soft_deletes_and_returns_204():
     assert get_response.status_code == status.HTTP_404_NOT_FOUND
     admin_response = client.get("/admin/batches").json()
     assert batch_id in [admin["id"] for admin in admin_response]
+
+
+def test_consume_more_than_available_leaves_volume_untouched():
+    create_payload = {
+        "batch_code": f"SCH-{n_len_rand(8)}-{n_len_rand(4)}",
+        "received_at": now_str,
+        "shelf_life_days": 7,
+        "volume_liters": 50.0,
+        "fat_percent": 3.2,
+    }
+    create_response = client.post("/api/batches", json=create_payload)
+    assert create_response.status_code == status.HTTP_201_CREATED, (
+        create_response.text
+    )
+    batch_id = create_response.json()["id"]
+    consume_payload = {
+        "qty": 50.5,
+        "order_id": f"ORDER-{n_len_rand(8)}-{n_len_rand(4)}",
+    }
+    consume_response = client.post(
+        f"/api/batches/{batch_id}/consume", json=consume_payload
+    )
+    assert consume_response.status_code != status.HTTP_200_OK
+    response = client.get(f"/api/batches/{batch_id}")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["volume_liters"] == create_payload["volume_liters"]
+
+
+def test_create_bulk_creates_batches_and_reports_duplicates():
+    existing_code = f"SCH-{n_len_rand(8)}-{n_len_rand(4)}"
+    create_response = client.post(
+        "/api/batches",
+        json={
+            "batch_code": existing_code,
+            "received_at": now_str,
+            "volume_liters": 100.0,
+        },
+    )
+    assert create_response.status_code == status.HTTP_201_CREATED, (
+        create_response.text
+    )
+    new_codes = [f"SCH-{n_len_rand(8)}-{n_len_rand(4)}" for _ in range(3)]
+    manifest = [
+        {"batch_code": code, "received_at": now_str, "volume_liters": 10.0}
+        for code in [*new_codes, existing_code, new_codes[0]]
+    ]
+    response = client.post("/api/batches/bulk", json=manifest)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    body = response.json()
+    assert [batch["batch_code"] for batch in body["created"]] == new_codes
+    assert all(batch["id"] is not None for batch in body["created"])
+    assert [error["index"] for error in body["errors"]] == [3, 4]
+
+
+def test_consume_fefo_draws_earliest_expiry_first():
+    fat_percent = 90 + random.random()  # noqa: S311 - isolates the batches
+    volume, drawn = 100.0, 150.0
+    batch_ids = []
+    for shelf_life_days in (9, 3, 6):
+        create_response = client.post(
+            "/api/batches",
+            json={
+                "batch_code": f"SCH-{n_len_rand(8)}-{n_len_rand(4)}",
+                "received_at": now_str,
+                "shelf_life_days": shelf_life_days,
+                "volume_liters": volume,
+                "fat_percent": fat_percent,
+            },
+        )
+        assert create_response.status_code == status.HTTP_201_CREATED
+        batch_ids.append(create_response.json()["id"])
+    longest, shortest, middle = batch_ids
+    payload = {
+        "qty": drawn,
+        "order_id": f"ORDER-{n_len_rand(8)}-{n_len_rand(4)}",
+        "min_fat_percent": fat_percent,
+        "max_fat_percent": fat_percent,
+    }
+    response = client.post("/api/batches/consume", json=payload)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    allocation = [(r["batch_id"], r["qty"]) for r in response.json()]
+    assert allocation == [(shortest, volume), (middle, drawn - volume)]
+    assert client.get(f"/api/batches/{shortest}").status_code == (
+        status.HTTP_404_NOT_FOUND
+    )
+    left = client.get(f"/api/batches/{middle}").json()["volume_liters"]
+    assert left == 2 * volume - drawn
+    payload["qty"] = volume + left + 1
+    response = client.post("/api/batches/consume", json=payload)
+    assert response.status_code == status.HTTP_409_CONFLICT, response.text
+    untouched = client.get(f"/api/batches/{longest}").json()["volume_liters"]
+    assert untouched == volume
+
+
+def test_admin_batches_keyset_pages_match_stream():
+    for _ in range(3):
+        client.post(
+            "/api/batches",
+            json={
+                "batch_code": f"SCH-{n_len_rand(8)}-{n_len_rand(4)}",
+                "received_at": now_str,
+                "volume_liters": 10.0,
+            },
+        )
+    streamed = [batch["id"] for batch in client.get("/admin/batches").json()]
+    paged, params = [], {"limit": 2}
+    while True:
+        response = client.get("/admin/batches", params=params)
+        assert response.status_code == status.HTTP_200_OK, response.text
+        page = response.json()
+        assert len(page) <= params["limit"]
+        paged += [batch["id"] for batch in page]
+        if "X-Next-After" not in response.headers:
+            break
+        params["after"] = int(response.headers["X-Next-After"])
+    assert paged == streamed
+    assert paged == sorted(paged)
+
+
+def test_export_records_streams_ndjson_and_csv():
+    create_response = client.post(
+        "/api/batches",
+        json={
+            "batch_code": f"SCH-{n_len_rand(8)}-{n_len_rand(4)}",
+            "received_at": now_str,
+            "volume_liters": 100.0,
+        },
+    )
+    batch_id = create_response.json()["id"]
+    order_id = f"ORDER-{n_len_rand(8)}-{n_len_rand(4)}"
+    for qty in (1.5, 2.5):
+        client.post(
+            f"/api/batches/{batch_id}/consume",
+            json={"qty": qty, "order_id": order_id},
+        )
+    response = client.get(
+        "/admin/records/export",
+        params={"format": "ndjson", "batch_id": batch_id},
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(r["batch_id"], r["order_id"], r["qty"]) for r in rows] == [
+        (batch_id, order_id, 1.5),
+        (batch_id, order_id, 2.5),
+    ]
+    assert rows[0]["consumed_at"].endswith("Z")
+
+    response = client.get(
+        "/admin/records/export",
+        params={"format": "csv", "batch_id": batch_id, "since": now_str},
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    lines = response.text.splitlines()
+    assert lines[0] == "id,batch_id,consumed_at,order_id,qty"
+    assert [line.split(",")[-1] for line in lines[1:]] == ["1.5", "2.5"]
+
+
+def test_list_responses_are_compressed_when_enabled(monkeypatch):
+    settings = get_settings_cached()
+    plain = client.get("/api/batches", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in plain.headers
+
+    monkeypatch.setattr(settings, "response_compression_min_bytes", 1)
+    for accept in ("gzip", "br, gzip;q=0.5"):
+        response = client.get(
+            "/api/batches", headers={"Accept-Encoding": accept}
+        )
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert response.headers["content-encoding"] in accept
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.json() == plain.json()
+    identity = client.get(
+        "/api/batches", headers={"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in identity.headers
+
+
+def test_metrics_expose_route_latency_and_repository_timings():
+    client.get("/api/batches/1")
+    client.get("/api/batches/near-expiry", params={"n_days": 3})
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE dairy_http_request_duration_seconds histogram" in body
+    assert 'route="/api/batches/{id}"' in body
+    assert 'route="/api/batches/near-expiry",status="200"' in body
+    assert "dairy_repository_call_duration_seconds_count{" in body
+    if get_settings_cached().env != "dev":
+        assert "dairy_db_pool_checked_out{" in body
+
+
+def test_consume_conflicts_answer_409_with_retry_after():
+    class AlwaysConflicting:
+        def consume(self, batch_id, qty, order_id):
+            raise RetriesExhaustedError(5)
+
+    app.dependency_overrides[get_batch_service] = AlwaysConflicting
+    try:
+        response = client.post(
+            "/api/batches/1/consume", json={"qty": 1.0, "order_id": None}
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_bulk_conflicts_answer_409_with_retry_after():
+    class AlwaysConflicting:
+        def create_many(self, batches):
+            raise ConcurrencyError()
+
+    app.dependency_overrides[get_batch_service] = AlwaysConflicting
+    try:
+        response = client.post(
+            "/api/batches/bulk",
+            json=[
+                {
+                    "batch_code": f"SCH-{n_len_rand(8)}-{n_len_rand(4)}",
+                    "received_at": now_str,
+                    "volume_liters": 10.0,
+                }
+            ],
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_fefo_conflicts_answer_409_with_retry_after():
+    class AlwaysConflicting:
+        def consume_fefo(self, **_):
+            raise ConcurrencyError()
+
+    app.dependency_overrides[get_batch_service] = AlwaysConflicting
+    try:
+        response = client.post("/api/batches/consume", json={"qty": 1})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_pool_health_reports_the_replica_pool_separately(
+    monkeypatch, tmp_path
+):
+    monkeypatch.setattr(get_settings_cached(), "env", "db")
+    primary = client.get("/admin/pool")
+    assert primary.status_code == status.HTTP_200_OK, primary.text
+    assert "replica" not in primary.json()
+
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    monkeypatch.setattr(admin_endpoints, "read_engine", replica)
+    body = client.get("/admin/pool").json()
+    assert body.keys() - {"replica"} == primary.json().keys()
+    assert body["replica"]["checkouts"] == 0
+    replica.dispose()
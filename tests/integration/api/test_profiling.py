@@ -0,0 +1,30 @@
+import pstats
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.__main__ import app
+from app.observability.profiling import ProfilingMiddleware
+
+
+def test_profiles_only_requests_that_ask_for_it(tmp_path):
+    client = TestClient(ProfilingMiddleware(app, tmp_path, interval=0.0001))
+
+    response = client.get("/api/batches/near-expiry?n_days=3")
+    assert response.status_code == status.HTTP_200_OK
+    assert list(tmp_path.iterdir()) == []
+
+    response = client.get(
+        "/api/batches/near-expiry?n_days=3", headers={"X-Profile": "1"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    (prof,) = tmp_path.glob("*.prof")
+    assert "-GET_api_batches_near_expiry-" in prof.name
+    assert prof.name.endswith("ms.prof")
+    stats = pstats.Stats(str(prof))
+    assert any(name == "list_near_expiry" for _, _, name in stats.stats)
+    folded = prof.with_suffix(".folded").read_text()
+    for line in folded.splitlines():
+        stack, samples = line.rsplit(" ", 1)
+        assert stack
+        assert int(samples) > 0
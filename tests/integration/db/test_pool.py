@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.observability.pool import (
+    TimedQueuePool,
+    async_warm_up,
+    pool_stats,
+    warm_up,
+)
+
+WARM = 3  # connections opened ahead of the first request
+POOL_TIMEOUT = 0.01
+
+
+def test_warm_up_fills_the_pool(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool
+    )
+    assert engine.pool.checkedin() == 0
+
+    warm_up(engine, WARM)
+
+    assert (engine.pool.checkedin(), engine.pool.checkedout()) == (WARM, 0)
+    engine.dispose()
+
+
+def test_async_warm_up_fills_the_pool(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+
+    async def run():
+        await async_warm_up(engine, WARM)
+        checked_in = engine.sync_engine.pool.checkedin()
+        await engine.dispose()
+        return checked_in
+
+    assert asyncio.run(run()) == WARM
+
+
+def test_pool_stats_count_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=TimedQueuePool,
+        pool_logging_name="stats-test",
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=POOL_TIMEOUT,
+    )
+
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        stats = pool_stats(engine, "stats-test")
+
+    # One checkout got the connection, the other timed out waiting
+    assert (stats["checkouts"], stats["checkout_timeouts"]) == (2, 1)
+    assert stats["checkout_wait_seconds_total"] >= POOL_TIMEOUT
+    assert (stats["size"], stats["checked_in"], stats["checked_out"]) == (
+        1,
+        0,
+        1,
+    )
+    assert stats["timeout_seconds"] == POOL_TIMEOUT
+    engine.dispose()
@@ -0,0 +1,128 @@
+"""
+EXPLAIN regression suite for the repository queries.
+
+Needs a scratch Postgres database. The schema is created from the models
+(which declare the same indexes as the alembic head) and seeded with 1M
+batches and 1M consumption records on first use:
+
+    DAIRY_STORE_PLAN_DATABASE_URL=postgresql+psycopg2://... pytest \
+        tests/integration/db
+"""
+
+import os
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import Engine, Select, create_engine, func, select, text
+from sqlalchemy.dialects import postgresql
+
+from app.repositories.db.models import Base
+from app.repositories.db.models import Batch as BatchModel
+from app.repositories.db_batch_repo import (
+    BATCH_COLUMNS,
+    select_available,
+    select_fefo,
+)
+from app.repositories.db_record_repo import select_export
+
+PLAN_DATABASE_URL = os.environ.get("DAIRY_STORE_PLAN_DATABASE_URL")
+SEED_ROWS = 1_000_000
+PROBE_ID = 4242  # any id inside the seeded range
+
+pytestmark = pytest.mark.skipif(
+    not PLAN_DATABASE_URL,
+    reason="set DAIRY_STORE_PLAN_DATABASE_URL to a scratch Postgres DB",
+)
+
+# Three years of history: nearly every batch is expired or consumed and
+# only a thin slice is live, as in production.
+SEED_BATCHES = text(
+    """
+    INSERT INTO batches (batch_code, received_at, shelf_life_days,
+                         volume_liters, fat_percent, is_deleted, version,
+                         expiry)
+    SELECT 'PLN-' || lpad(g::text, 8, '0') || '-0000',
+           now() - (g % 1095) * interval '1 day',
+           1 + g % 30,
+           CASE WHEN g % 20 = 0 THEN 500.0 ELSE 0.0 END,
+           3.0 + (g % 30) / 10.0,
+           g % 97 = 0,
+           1,
+           now() - (g % 1095) * interval '1 day'
+                 + (1 + g % 30) * interval '1 day'
+    FROM generate_series(1, :rows) AS g
+    """
+)
+SEED_RECORDS = text(
+    """
+    INSERT INTO consumption_records (batch_id, consumed_at, order_id, qty)
+    SELECT b.id, b.received_at + (g % 24) * interval '1 hour',
+           'ORDER-' || g, 1.0
+    FROM generate_series(1, :rows) AS g
+    JOIN batches b ON b.id = (SELECT min(id) FROM batches) + g % :rows
+    """
+)
+
+
+@pytest.fixture(scope="module")
+def plan_engine() -> Engine:
+    engine = create_engine(PLAN_DATABASE_URL)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        seeded = conn.scalar(select(func.count()).select_from(BatchModel))
+        if seeded < SEED_ROWS:
+            conn.execute(SEED_BATCHES, {"rows": SEED_ROWS})
+            conn.execute(SEED_RECORDS, {"rows": SEED_ROWS})
+        conn.execute(text("ANALYZE batches"))
+        conn.execute(text("ANALYZE consumption_records"))
+    yield engine
+    engine.dispose()
+
+
+def _explain(engine: Engine, stmt: Select) -> str:
+    compiled = stmt.compile(dialect=postgresql.psycopg2.dialect())
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params)
+        return "\n".join(row[0] for row in rows)
+
+
+def _between_dates() -> Select:
+    now = datetime.now(UTC)
+    return select_available(*BATCH_COLUMNS).where(
+        BatchModel.expiry >= now, BatchModel.expiry <= now + timedelta(3)
+    )
+
+
+LIVE = "ix_batches_live_expiry"
+RECORDS = "ix_consumption_records_batch_id_consumed_at"
+
+# Query builder and the index its plan must use
+REPOSITORY_QUERIES = {
+    "list_all_available": (lambda: select_available(*BATCH_COLUMNS), LIVE),
+    "list_all_between_dates": (_between_dates, LIVE),
+    "read_by_id": (
+        lambda: select_available(*BATCH_COLUMNS).where(
+            BatchModel.id == PROBE_ID
+        ),
+        "batches_pkey",
+    ),
+    "consume_fefo": (lambda: select_fefo(None, None), LIVE),
+    "consume_fefo_fat_range": (lambda: select_fefo(3.5, 4.5), LIVE),
+    "export_by_batch": (lambda: select_export(None, None, PROBE_ID), RECORDS),
+    "export_by_batch_and_window": (
+        lambda: select_export(
+            datetime.now(UTC) - timedelta(days=30),
+            datetime.now(UTC),
+            PROBE_ID,
+        ),
+        RECORDS,
+    ),
+}
+
+
+@pytest.mark.parametrize("name", REPOSITORY_QUERIES)
+def test_repository_query_uses_its_index(plan_engine, name):
+    build, index = REPOSITORY_QUERIES[name]
+    plan = _explain(plan_engine, build())
+    assert "Seq Scan" not in plan, f"{name} plan:\n{plan}"
+    assert index in plan, f"{name} plan:\n{plan}"
@@ -0,0 +1,135 @@
+import asyncio
+import shutil
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.repositories.async_db_batch_repo import AsyncDBBatchRepository
+from app.repositories.db.models import Base
+from app.repositories.db.unit_of_work import (
+    async_request_unit_of_work,
+    read_from_primary,
+    unit_of_work,
+)
+from app.repositories.db_batch_repo import DBBatchRepository
+from app.repositories.db_record_repo import DBRecordRepository
+from app.schemas.batches_schema import Batch
+
+VOLUME, DRAWN = 10.0, 4.0  # the primary has seen the draw, the replica not
+LEFT = VOLUME - DRAWN
+DRAW = 1.0
+
+
+@pytest.fixture
+def databases(tmp_path):
+    """
+    A primary holding one batch of VOLUME l that has since been drawn down
+    to LEFT l, and a replica that stopped replicating at VOLUME l.
+    """
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    engine = create_engine(f"sqlite:///{primary}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    repo = DBBatchRepository()
+    with unit_of_work(session_factory):
+        batch = repo.upsert(
+            Batch(
+                batch_code="SCH-20250101-0001",
+                received_at=datetime.now(UTC),
+                volume_liters=VOLUME,
+            )
+        )
+    engine.dispose()
+    shutil.copy(primary, replica)
+    engine = create_engine(f"sqlite:///{primary}")
+    with unit_of_work(sessionmaker(bind=engine, autoflush=False)):
+        repo.consume(batch.id, DRAWN, None)
+    engine.dispose()
+    return primary, replica, batch.id
+
+
+@pytest.fixture
+def session_factories(databases):
+    *paths, batch_id = databases
+    engines = [create_engine(f"sqlite:///{path}") for path in paths]
+    primary, replica = (
+        sessionmaker(bind=engine, autoflush=False) for engine in engines
+    )
+    yield primary, replica, batch_id
+    for engine in engines:
+        engine.dispose()
+
+
+def test_reads_go_to_the_replica_until_the_unit_of_work_writes(
+    session_factories,
+):
+    primary, replica, batch_id = session_factories
+    repo, records = DBBatchRepository(), DBRecordRepository()
+
+    with unit_of_work(primary, replica):
+        assert repo.read_by_id(batch_id).volume_liters == VOLUME
+        assert [b.volume_liters for b in repo.list_page(10)] == [VOLUME]
+        assert records.list_all() == []
+
+        consumed = repo.consume(batch_id, DRAW, None)
+        assert consumed.volume_liters == LEFT - DRAW
+        # Read-your-writes: the primary from here on
+        assert repo.read_by_id(batch_id).volume_liters == LEFT - DRAW
+        assert [r.qty for r in records.list_all()] == [DRAWN, DRAW]
+
+
+def test_read_from_primary_pins_reads(session_factories):
+    primary, replica, batch_id = session_factories
+    repo = DBBatchRepository()
+
+    with unit_of_work(primary, replica):
+        assert repo.read_by_id(batch_id).volume_liters == VOLUME
+        with read_from_primary():
+            assert repo.read_by_id(batch_id).volume_liters == LEFT
+    # Pinned before the unit of work starts
+    with read_from_primary(), unit_of_work(primary, replica):
+        assert repo.read_by_id(batch_id).volume_liters == LEFT
+
+
+def test_streams_read_where_they_were_asked_for(session_factories):
+    primary, replica, batch_id = session_factories
+    repo, records = DBBatchRepository(), DBRecordRepository()
+
+    with unit_of_work(primary, replica):
+        stale = repo.iter_all()
+        with read_from_primary():
+            fresh = repo.iter_all()
+            chunks = records.iter_export_chunks(batch_id=batch_id)
+    # Iterated once the pin and the unit of work are over, like a response
+    assert [b.volume_liters for b in stale] == [VOLUME]
+    assert [b.volume_liters for b in fresh] == [LEFT]
+    assert [len(chunk) for chunk in chunks] == [1]
+
+
+def test_async_reads_go_to_the_replica(databases):
+    primary_path, replica_path, batch_id = databases
+    engines = [
+        create_async_engine(f"sqlite+aiosqlite:///{path}")
+        for path in (primary_path, replica_path)
+    ]
+    primary, replica = (
+        async_sessionmaker(bind=engine, expire_on_commit=False)
+        for engine in engines
+    )
+    repo = AsyncDBBatchRepository()
+
+    async def run():
+        async with async_request_unit_of_work(primary, replica):
+            stale = await repo.read_by_id(batch_id)
+            with read_from_primary():
+                fresh = await repo.read_by_id(batch_id)
+                stream = repo.iter_all()
+        streamed = [batch.volume_liters async for batch in stream]
+        for engine in engines:
+            await engine.dispose()
+        return stale.volume_liters, fresh.volume_liters, streamed
+
+    assert asyncio.run(run()) == (VOLUME, LEFT, [LEFT])
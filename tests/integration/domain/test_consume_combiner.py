@@ -0,0 +1,178 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+
+import pytest
+
+from app.domain.batch_port import ConcurrencyError
+from app.domain.batch_service import BatchService, ResourceNotFoundError
+from app.domain.consume_combiner import (
+    AsyncConsumeCombiner,
+    ConsumeCombiner,
+    accept_in_order,
+)
+from app.repositories.batch_repository import BatchRepository
+from app.repositories.record_repository import RecordRepository
+from app.schemas.batches_schema import Batch
+from app.schemas.consumption_record import ConsumptionRecord
+
+VOLUME = 10.0
+CONSUMERS = 12  # two more than VOLUME covers, one liter each
+
+
+class CountingRepository(BatchRepository):
+    def __init__(self) -> None:
+        super().__init__(RecordRepository())
+        self.groups: list[int] = []
+
+    def consume_many(self, batch_id, records):
+        self.groups.append(len(records))
+        return super().consume_many(batch_id, records)
+
+
+class AsyncCountingRepository:
+    def __init__(self) -> None:
+        self.repo = CountingRepository()
+
+    async def consume_many(self, batch_id, records):
+        return self.repo.consume_many(batch_id, records)
+
+
+def _batch(volume_liters: float) -> Batch:
+    return Batch(
+        batch_code="SCH-20250101-0001",
+        received_at=datetime.now(UTC),
+        volume_liters=volume_liters,
+    )
+
+
+def _record(batch_id: int, qty: float) -> ConsumptionRecord:
+    return ConsumptionRecord(
+        batch_id=batch_id,
+        consumed_at=datetime.now(UTC),
+        order_id=None,
+        qty=qty,
+    )
+
+
+def test_accept_in_order_skips_draws_the_volume_no_longer_covers():
+    assert accept_in_order(5.0, [2.0, 4.0, 3.0, 1.0]) == [3.0, None, 0.0, None]
+
+
+def test_concurrent_consumes_are_applied_in_groups():
+    repo = CountingRepository()
+    batch = repo.upsert(_batch(VOLUME))
+    records_before = len(repo._record_port.list_all())
+    combiner = ConsumeCombiner(repo, window=0.05)
+    service = BatchService(
+        repo,
+        RecordRepository(),
+        consume_strategy="combined",
+        combiner=combiner,
+    )
+
+    def consume(_):
+        try:
+            return service.consume(batch.id, 1.0, None).volume_liters
+        except (ValueError, ResourceNotFoundError):  # drained: not found
+            return None
+
+    with ThreadPoolExecutor(max_workers=CONSUMERS) as pool:
+        volumes = list(pool.map(consume, range(CONSUMERS)))
+
+    drawn = int(VOLUME)
+    assert sorted(v for v in volumes if v is not None) == [
+        float(n) for n in range(drawn)
+    ]
+    assert volumes.count(None) == CONSUMERS - drawn
+    assert sum(repo.groups) == CONSUMERS
+    assert len(repo.groups) < CONSUMERS
+    assert repo.read_by_id(batch.id) is None  # drained
+    assert len(repo._record_port.list_all()) == records_before + drawn
+    with pytest.raises(ResourceNotFoundError):
+        service.consume(batch.id, 1.0, None)
+
+
+def test_async_combiner_applies_one_group_per_window():
+    port = AsyncCountingRepository()
+    batch = port.repo.upsert(_batch(VOLUME))
+    combiner = AsyncConsumeCombiner(port, window=0.05)
+
+    async def burst():
+        return await asyncio.gather(
+            *(combiner.consume(_record(batch.id, 3.0)) for _ in range(4))
+        )
+
+    results = asyncio.run(burst())
+
+    assert [r and r.volume_liters for r in results] == [7.0, 4.0, 1.0, None]
+    assert port.repo.groups == [4]
+
+
+def test_cancelled_leader_still_applies_its_group():
+    port = AsyncCountingRepository()
+    batch = port.repo.upsert(_batch(VOLUME))
+    combiner = AsyncConsumeCombiner(port, window=0.05)
+
+    async def cancel_leader():
+        leader = asyncio.create_task(combiner.consume(_record(batch.id, 1.0)))
+        await asyncio.sleep(0)
+        member = asyncio.create_task(combiner.consume(_record(batch.id, 1.0)))
+        await asyncio.sleep(0)
+        leader.cancel()  # still inside the window
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        result = await asyncio.wait_for(member, 1)
+        assert not combiner._open
+        return result
+
+    assert asyncio.run(cancel_leader()).volume_liters == VOLUME - 2
+    assert port.repo.groups == [2]
+
+
+def test_leader_cancelled_mid_commit_hands_members_their_results():
+    port = AsyncCountingRepository()
+    batch = port.repo.upsert(_batch(VOLUME))
+    in_commit, commit = asyncio.Event(), asyncio.Event()
+
+    @asynccontextmanager
+    async def transaction():
+        yield
+        # consume_many is done; the commit is still awaiting the database
+        in_commit.set()
+        await commit.wait()
+
+    combiner = AsyncConsumeCombiner(port, transaction, window=0.01)
+
+    async def cancel_leader():
+        leader = asyncio.create_task(combiner.consume(_record(batch.id, 1.0)))
+        await asyncio.sleep(0)
+        member = asyncio.create_task(combiner.consume(_record(batch.id, 1.0)))
+        await in_commit.wait()
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        commit.set()
+        return await asyncio.wait_for(member, 1)
+
+    # Not a retryable error: the member's draw is committed
+    assert asyncio.run(cancel_leader()).volume_liters == VOLUME - 2
+    assert port.repo.groups == [2]
+
+
+def test_group_cancelled_before_applying_asks_members_to_retry():
+    port = AsyncCountingRepository()
+    batch = port.repo.upsert(_batch(VOLUME))
+    combiner = AsyncConsumeCombiner(port, window=10)
+
+    async def shut_down():
+        member = asyncio.create_task(combiner.consume(_record(batch.id, 1.0)))
+        await asyncio.sleep(0)
+        combiner._open[batch.id].applied.cancel()  # e.g. loop shutdown
+        with pytest.raises(ConcurrencyError):
+            await asyncio.wait_for(member, 1)
+        assert not combiner._open
+
+    asyncio.run(shut_down())
+    assert port.repo.groups == []
@@ -0,0 +1,139 @@
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+
+from app.domain.batch_port import ConcurrencyError
+from app.domain.batch_service import AsyncBatchService, BatchService
+from app.domain.retry_policy import RetriesExhaustedError, RetryPolicy
+from app.repositories.batch_repository import BatchRepository
+from app.repositories.record_repository import RecordRepository
+from app.schemas.batches_schema import Batch
+
+DRAW = 10.0
+
+
+class ConflictingRepository(BatchRepository):
+    """Loses the optimistic race `conflicts` times, then lets writes in."""
+
+    def __init__(self, conflicts: int) -> None:
+        super().__init__(RecordRepository())
+        self.conflicts = conflicts
+        self.upserts = 0
+
+    def upsert(self, batch: Batch) -> Batch:
+        self.upserts += 1
+        if batch.id and self.upserts <= self.conflicts:
+            raise ConcurrencyError()
+        return super().upsert(batch)
+
+
+class ConflictingFefoRepository(BatchRepository):
+    """FEFO draws find their batches changed `conflicts` times."""
+
+    def __init__(self, conflicts: int) -> None:
+        super().__init__(RecordRepository())
+        self.conflicts = conflicts
+        self.draws = 0
+
+    def consume_fefo(self, qty, order_id, min_fat=None, max_fat=None):
+        self.draws += 1
+        if self.draws <= self.conflicts:
+            raise ConcurrencyError()
+        return super().consume_fefo(qty, order_id, min_fat, max_fat)
+
+
+class AsyncConflictingRepository:
+    def __init__(self, conflicts: int) -> None:
+        self.repo = ConflictingRepository(conflicts)
+
+    async def read_by_id(self, batch_id: int) -> Batch | None:
+        return self.repo.read_by_id(batch_id)
+
+    async def upsert(self, batch: Batch) -> Batch:
+        return self.repo.upsert(batch)
+
+
+class AsyncRecords:
+    async def insert(self, record):
+        return record
+
+
+def test_full_jitter_delays_grow_exponentially_up_to_the_cap():
+    policy = RetryPolicy(base_delay=0.01, max_delay=0.05, jitter=lambda: 1)
+    assert [policy.delay(n) for n in range(5)] == [
+        0.01,
+        0.02,
+        0.04,
+        0.05,
+        0.05,
+    ]
+    assert RetryPolicy(jitter=lambda: 0).delay(3) == 0
+
+
+def test_run_retries_conflicts_then_gives_up():
+    calls, retries = [], []
+
+    def conflict():
+        calls.append(1)
+        raise ConcurrencyError()
+
+    policy = RetryPolicy(attempts=4, jitter=lambda: 0)
+    with pytest.raises(RetriesExhaustedError) as info:
+        policy.run(conflict, on_retry=lambda: retries.append(1))
+    assert (len(calls), len(retries), info.value.attempts) == (4, 3, 4)
+
+    # A retry that would end past the deadline is not made
+    calls.clear()
+    with pytest.raises(RetriesExhaustedError):
+        RetryPolicy(
+            attempts=4,
+            base_delay=1,
+            max_delay=1,
+            deadline=0.5,
+            jitter=lambda: 1,
+        ).run(conflict)
+    assert len(calls) == 1
+
+
+def test_optimistic_consume_retries_until_the_write_lands():
+    repo = ConflictingRepository(conflicts=2)
+    service = BatchService(
+        repo,
+        RecordRepository(),
+        consume_strategy="optimistic",
+        retry_policy=RetryPolicy(attempts=3, jitter=lambda: 0),
+    )
+    volume = repo.read_by_id(1).volume_liters
+    assert service.consume(1, DRAW, None).volume_liters == volume - DRAW
+
+    repo.conflicts, repo.upserts = 3, 0
+    with pytest.raises(RetriesExhaustedError):
+        service.consume(1, DRAW, None)
+    assert repo.read_by_id(1).volume_liters == volume - DRAW
+
+
+def test_async_optimistic_consume_uses_the_same_policy():
+    repo = AsyncConflictingRepository(conflicts=2)
+    service = AsyncBatchService(
+        repo,
+        AsyncRecords(),
+        consume_strategy="optimistic",
+        retry_policy=RetryPolicy(attempts=3, jitter=lambda: 0),
+    )
+    volume = repo.repo.read_by_id(2).volume_liters
+    batch = asyncio.run(service.consume(2, DRAW, None))
+    assert (batch.volume_liters, repo.repo.upserts) == (volume - DRAW, 3)
+    assert datetime.now(UTC) < batch._expiry
+
+
+def test_fefo_draws_retry_conflicts_through_the_policy():
+    repo = ConflictingFefoRepository(conflicts=2)
+    policy = RetryPolicy(attempts=3, jitter=lambda: 0)
+    service = BatchService(repo, RecordRepository(), retry_policy=policy)
+    records = service.consume_fefo(DRAW, None)
+    assert (sum(r.qty for r in records), repo.draws) == (DRAW, 3)
+
+    repo.conflicts, repo.draws = 3, 0
+    with pytest.raises(RetriesExhaustedError):
+        service.consume_fefo(DRAW, None)
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.repositories.db.unit_of_work import request_unit_of_work
+from tests.benchmarks.common import sqlite_database
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{sqlite_database(str(tmp_path))}")
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def in_request(session_factory):
+    """Run repository calls like an endpoint would, in one unit of work."""
+
+    def run(*calls):
+        async def request():
+            async with request_unit_of_work(session_factory):
+                return [await run_in_threadpool(call) for call in calls]
+
+        return asyncio.run(request())
+
+    return run
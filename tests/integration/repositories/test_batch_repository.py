@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+from app.repositories.batch_repository import BatchRepository
+from app.repositories.record_repository import RecordRepository
+from app.schemas.batches_schema import Batch
+
+CONCURRENT = 500
+QTY = 0.25
+
+
+def _batch(code: str, shelf_life_days: int, volume_liters: float) -> Batch:
+    return Batch(
+        batch_code=code,
+        received_at=datetime.now(UTC),
+        shelf_life_days=shelf_life_days,
+        volume_liters=volume_liters,
+    )
+
+
+def test_concurrent_consumes_do_not_lose_updates():
+    records = RecordRepository()
+    repo = BatchRepository(records)
+    batch = repo.upsert(_batch("SCH-20250101-0001", 7, 1000.0))
+    records_before = len(records.list_all())
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(
+            pool.map(
+                lambda _: repo.consume(batch.id, QTY, None), range(CONCURRENT)
+            )
+        )
+
+    assert all(result is not None for result in results)
+    assert repo.read_by_id(batch.id).volume_liters == 1000.0 - CONCURRENT * QTY
+    assert len(records.list_all()) == records_before + CONCURRENT
+
+
+def test_expiry_index_tracks_writes():
+    repo = BatchRepository()
+    now = datetime.now(UTC)
+    soon = repo.upsert(_batch("SCH-20250101-0002", 1, 10.0))
+    later = repo.upsert(_batch("SCH-20250101-0003", 2, 10.0))
+
+    def near_expiry_ids(n_days: int) -> list[int]:
+        return [
+            batch.id
+            for batch in repo.list_all_between_dates(
+                now, now + timedelta(days=n_days)
+            )
+        ]
+
+    assert near_expiry_ids(3) == [soon.id, later.id]
+    repo.consume(soon.id, 10.0, None)  # drained batches leave the index
+    repo.soft_delete(later.id)
+    assert near_expiry_ids(3) == []
+    assert repo.read_by_id(later.id) is None
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from functools import partial
+
+import pytest
+from sqlalchemy import func, select
+
+from app.domain.batch_service import BatchService
+from app.observability.metrics import AUDIT_FLUSH_SIZE
+from app.repositories.buffered_record_repo import (
+    AsyncAuditWriter,
+    AsyncBufferedRecordRepository,
+    AuditWriter,
+    BufferedRecordRepository,
+)
+from app.repositories.db.models import ConsumptionRecord as RecordModel
+from app.repositories.db.unit_of_work import (
+    async_request_unit_of_work,
+    unit_of_work,
+)
+from app.repositories.db_batch_repo import DBBatchRepository
+from app.repositories.db_record_repo import DBRecordRepository
+from app.repositories.record_repository import RecordRepository
+from app.schemas.batches_schema import Batch
+from app.schemas.consumption_record import ConsumptionRecord
+
+GROUP = 8
+
+
+class DiskFullError(RuntimeError):
+    pass
+
+
+class FailingRecords(RecordRepository):
+    def insert_many(self, records: list[ConsumptionRecord]) -> None:
+        raise DiskFullError
+
+
+class ListedRecords:
+    def __init__(self) -> None:
+        self.records: list[ConsumptionRecord] = []
+
+    async def insert_many(self, records: list[ConsumptionRecord]) -> None:
+        self.records.extend(records)
+
+
+def _record(qty: float) -> ConsumptionRecord:
+    return ConsumptionRecord(
+        batch_id=1, consumed_at=datetime.now(UTC), order_id=None, qty=qty
+    )
+
+
+def _count_records(session_factory) -> int:
+    with session_factory() as session:
+        return session.scalar(select(func.count(RecordModel.id)))
+
+
+def test_concurrent_inserts_commit_as_one_group(session_factory):
+    writer = AuditWriter(
+        DBRecordRepository(),
+        partial(unit_of_work, session_factory),
+        max_batch=GROUP,
+        interval=5.0,
+    )
+    repo = BufferedRecordRepository(DBRecordRepository(), writer, wait=False)
+    flushes = AUDIT_FLUSH_SIZE.count()
+
+    with ThreadPoolExecutor(GROUP) as pool:
+        list(pool.map(repo.insert, [_record(i + 1) for i in range(GROUP)]))
+    writer.close()
+
+    # A full group is written at once, not split by close()
+    assert AUDIT_FLUSH_SIZE.count() == flushes + 1
+    assert _count_records(session_factory) == GROUP
+
+
+def test_close_drains_queued_records():
+    records = RecordRepository()
+    before = len(records.list_all())
+    writer = AuditWriter(records, interval=60.0)
+    repo = BufferedRecordRepository(records, writer, wait=False)
+
+    for qty in (1.0, 2.0, 3.0):
+        repo.insert(_record(qty))
+    writer.close()
+
+    assert [r.qty for r in records.list_all()[before:]] == [1.0, 2.0, 3.0]
+
+
+def test_failed_groups_are_logged_and_dropped(caplog):
+    writer = AsyncAuditWriter(FailingRecords(), max_batch=2, interval=60.0)
+
+    async def run():
+        writer.write(_record(1.0))
+        writer.write(_record(2.0))
+        await writer.stop()
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(run())
+    (logged,) = caplog.records
+    assert logged.getMessage() == "dropped 2 audit records"
+    assert logged.exc_info[0] is DiskFullError
+
+
+def test_waiting_consumes_write_their_record_in_the_request(
+    session_factory, in_request
+):
+    writer = AuditWriter(
+        DBRecordRepository(), partial(unit_of_work, session_factory)
+    )
+    repo = DBBatchRepository()
+    service = BatchService(
+        repo,
+        BufferedRecordRepository(DBRecordRepository(), writer, wait=True),
+        consume_strategy="pessimistic",
+    )
+    (batch,) = in_request(
+        lambda: repo.upsert(
+            Batch(
+                batch_code="SCH-20250101-0001",
+                received_at=datetime.now(UTC),
+                volume_liters=10.0,
+            )
+        )
+    )
+
+    # The request holds the batch locked while it stores the record; a
+    # group in the writer's transaction would have to wait for it
+    def consume_then_fail():
+        service.consume(batch.id, 4.0, None)
+        raise DiskFullError
+
+    with pytest.raises(DiskFullError):
+        in_request(consume_then_fail)
+    assert _count_records(session_factory) == 0
+
+    (consumed,) = in_request(lambda: service.consume(batch.id, 4.0, None))
+    assert consumed.volume_liters == batch.volume_liters - 4.0
+    assert _count_records(session_factory) == 1
+    assert writer._thread is None
+
+
+def test_queued_records_wait_for_the_request_to_commit(
+    session_factory, in_request
+):
+    writer = AuditWriter(
+        DBRecordRepository(), partial(unit_of_work, session_factory)
+    )
+    repo = DBBatchRepository()
+    service = BatchService(
+        repo,
+        BufferedRecordRepository(DBRecordRepository(), writer, wait=False),
+        consume_strategy="pessimistic",
+    )
+    (batch,) = in_request(
+        lambda: repo.upsert(
+            Batch(
+                batch_code="SCH-20250101-0002",
+                received_at=datetime.now(UTC),
+                volume_liters=10.0,
+            )
+        )
+    )
+
+    def consume_then_fail():
+        service.consume(batch.id, 4.0, None)
+        raise DiskFullError
+
+    with pytest.raises(DiskFullError):
+        in_request(consume_then_fail)
+    # Rolled back before anything was queued: no record without its draw
+    assert writer._thread is None
+
+    in_request(lambda: service.consume(batch.id, 4.0, None))
+    writer.close()
+    assert _count_records(session_factory) == 1
+
+
+def test_async_queued_records_wait_for_the_request_to_commit():
+    records = ListedRecords()
+    writer = AsyncAuditWriter(records, interval=60.0)
+    repo = AsyncBufferedRecordRepository(records, writer, wait=False)
+
+    async def insert_then_fail():
+        async with async_request_unit_of_work():
+            await repo.insert(_record(1.0))
+            raise DiskFullError
+
+    async def run():
+        with pytest.raises(DiskFullError):
+            await insert_then_fail()
+        async with async_request_unit_of_work():
+            await repo.insert(_record(2.0))
+            assert writer._task is None
+        await writer.stop()
+
+    asyncio.run(run())
+    assert [r.qty for r in records.records] == [2.0]
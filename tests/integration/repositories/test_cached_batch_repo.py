@@ -0,0 +1,85 @@
+from datetime import UTC, datetime
+
+from app.repositories.batch_repository import BatchRepository
+from app.repositories.cached_batch_repo import (
+    BatchCache,
+    CachedBatchRepository,
+)
+from app.schemas.batches_schema import Batch
+
+VOLUME = 100.0
+DRAW = 40.0
+
+
+def _cached_repo(max_size: int = 10) -> CachedBatchRepository:
+    return CachedBatchRepository(BatchRepository(), BatchCache(max_size, 60))
+
+
+def _create(repo: CachedBatchRepository, code: str) -> Batch:
+    return repo.upsert(
+        Batch(
+            batch_code=code,
+            received_at=datetime.now(UTC),
+            volume_liters=VOLUME,
+        )
+    )
+
+
+def test_reads_are_served_from_cache_and_writes_refresh_it():
+    repo = _cached_repo()
+    batch = _create(repo, "SCH-20250101-0001")
+    assert repo.read_by_id(batch.id).volume_liters == VOLUME
+    assert repo.read_by_id(batch.id).volume_liters == VOLUME
+    assert (repo.cache.hits, repo.cache.misses) == (1, 1)
+
+    repo.consume(batch.id, DRAW, None)
+    assert repo.read_by_id(batch.id).volume_liters == VOLUME - DRAW
+    assert (repo.cache.hits, repo.cache.misses) == (1, 2)
+
+    repo.soft_delete(batch.id)
+    assert repo.read_by_id(batch.id) is None
+
+
+def test_drained_batches_are_not_served_from_cache():
+    repo = _cached_repo()
+    batch = _create(repo, "SCH-20250101-0005")
+    repo.read_by_id(batch.id)
+
+    drained = repo.consume(batch.id, VOLUME, None)
+
+    assert drained.volume_liters == 0
+    assert repo.read_by_id(batch.id) is None
+    repo.cache.put(drained)
+    assert repo.cache.get(batch.id) is None
+
+
+def test_older_versions_never_replace_newer_entries():
+    cache = BatchCache(10, 60)
+    batch = Batch(
+        id=1,
+        batch_code="SCH-20250101-0002",
+        received_at=datetime.now(UTC),
+        volume_liters=VOLUME,
+    )
+    newer = batch.model_copy(update={"volume_liters": VOLUME - DRAW})
+    newer.update_version()
+    cache.put(newer)
+    cache.put(batch)
+    assert cache.get(1).volume_liters == VOLUME - DRAW
+
+    # A read that started before a write cannot put the old row back
+    written = newer.model_copy(update={"volume_liters": DRAW})
+    cache.invalidate(1, written.update_version())
+    cache.put(newer)
+    assert cache.get(1) is None
+    cache.put(written)
+    assert cache.get(1).volume_liters == DRAW
+
+
+def test_least_recently_used_entries_are_evicted():
+    repo = _cached_repo(max_size=1)
+    first = _create(repo, "SCH-20250101-0003")
+    second = _create(repo, "SCH-20250101-0004")
+    repo.read_by_id(first.id)
+    repo.read_by_id(second.id)
+    assert repo.cache.stats()["evictions"] == 1
@@ -0,0 +1,93 @@
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import event, select
+
+from app.domain.batch_port import ConcurrencyError
+from app.repositories.db.models import Batch as BatchModel
+from app.repositories.db.models import ConsumptionRecord as RecordModel
+from app.repositories.ledger_batch_repo import LedgerBatchRepository
+from app.schemas.batches_schema import Batch
+
+
+def _stored(session_factory, batch_id):
+    with session_factory() as session:
+        batch = session.get(BatchModel, batch_id)
+        ledger = session.execute(
+            select(RecordModel.seq, RecordModel.balance)
+            .where(RecordModel.batch_id == batch_id)
+            .order_by(RecordModel.id)
+        ).all()
+        return (batch.volume_liters, batch.version, batch.ledger_seq), ledger
+
+
+def test_consumes_append_to_the_ledger_until_compacted(
+    session_factory, in_request
+):
+    repo = LedgerBatchRepository()
+    (batch,) = in_request(
+        lambda: repo.upsert(
+            Batch(
+                batch_code="SCH-20250101-0001",
+                received_at=datetime.now(UTC),
+                volume_liters=10.0,
+            )
+        ),
+    )
+    updates = []
+    event.listen(
+        session_factory.kw["bind"],
+        "before_cursor_execute",
+        lambda _conn, _cursor, sql, *_: (
+            updates.append(sql) if sql.startswith("UPDATE") else None
+        ),
+    )
+
+    (first,) = in_request(lambda: repo.consume(batch.id, 4.0, None))
+    (second,) = in_request(lambda: repo.consume(batch.id, 4.0, None))
+    (refused,) = in_request(lambda: repo.consume(batch.id, 4.0, None))
+
+    assert (first.volume_liters, first._version) == (6.0, 2)
+    assert (second.volume_liters, second._version) == (2.0, 3)
+    assert refused is None
+    assert updates == []
+    assert _stored(session_factory, batch.id) == (
+        (10.0, 1, 0),
+        [(1, 6.0), (2, 2.0)],
+    )
+    (read,) = in_request(lambda: repo.read_by_id(batch.id))
+    assert (read.volume_liters, read._version) == (2.0, 3)
+
+    assert in_request(repo.compact) == [1]
+    assert in_request(repo.compact) == [0]
+    assert _stored(session_factory, batch.id)[0] == (2.0, 3, 2)
+    assert in_request(repo.list_all_available) == [[read]]
+
+    in_request(lambda: repo.consume(batch.id, 2.0, None))
+    assert in_request(lambda: repo.read_by_id(batch.id)) == [None]
+
+
+def test_upsert_from_a_stale_read_conflicts(session_factory, in_request):
+    repo = LedgerBatchRepository()
+    (batch,) = in_request(
+        lambda: repo.upsert(
+            Batch(
+                batch_code="SCH-20250101-0002",
+                received_at=datetime.now(UTC),
+                volume_liters=10.0,
+            )
+        ),
+    )
+    (stale,) = in_request(lambda: repo.read_by_id(batch.id))
+    in_request(lambda: repo.consume(batch.id, 3.0, None))
+
+    stale.volume_liters = 1.0
+    with pytest.raises(ConcurrencyError):
+        in_request(lambda: repo.upsert(stale))
+
+    (fresh,) = in_request(lambda: repo.read_by_id(batch.id))
+    fresh.volume_liters = 5.0
+    in_request(lambda: repo.upsert(fresh))
+    (read,) = in_request(lambda: repo.read_by_id(batch.id))
+    assert (read.volume_liters, read._version) == (5.0, 3)
+    assert _stored(session_factory, batch.id)[0] == (5.0, 3, 1)
@@ -0,0 +1,46 @@
+from datetime import UTC, datetime, timedelta
+
+from app.repositories.batch_repository import BatchRepository
+from app.repositories.near_expiry_view import (
+    NearExpiryBatchRepository,
+    NearExpiryView,
+)
+from app.schemas.batches_schema import Batch
+
+
+def _window(repo, n_days: int) -> list[tuple[int, float]]:
+    now = datetime.now(UTC)
+    return [
+        (batch.id, batch.volume_liters)
+        for batch in repo.list_all_between_dates(
+            now, now + timedelta(days=n_days)
+        )
+    ]
+
+
+def test_view_matches_repository_through_writes():
+    inner = BatchRepository()
+    repo = NearExpiryBatchRepository(inner, NearExpiryView(3600))
+    assert _window(repo, 30) == _window(inner, 30)
+
+    received = datetime.now(UTC) - timedelta(days=5)
+    created = [
+        repo.upsert(
+            Batch(
+                batch_code=f"SCH-20250101-{i:04d}",
+                received_at=received,
+                shelf_life_days=6 + i,
+                volume_liters=100.0,
+            )
+        )
+        for i in range(5)
+    ]
+    repo.consume(created[0].id, 100.0, None)  # consumed to zero
+    repo.consume(created[1].id, 30.0, None)
+    repo.soft_delete(created[2].id)
+    repo.consume_fefo(50.0, None)
+
+    for n_days in (1, 2, 3, 7, 30):
+        assert _window(repo, n_days) == _window(inner, n_days)
+    assert created[0].id not in dict(_window(repo, 30))
+    assert created[2].id not in dict(_window(repo, 30))
@@ -0,0 +1,39 @@
+from datetime import UTC, datetime, timedelta
+
+from app.repositories.db_batch_repo import row_to_schema
+from app.schemas.batches_schema import Batch
+
+
+def test_trusted_rows_match_validated_schemas():
+    received_at = datetime(2025, 1, 1, 6, 30)  # naive, as SQLite returns it
+    validated = Batch(
+        id=7,
+        batch_code="SCH-20250101-0007",
+        received_at=received_at,
+        shelf_life_days=5,
+        volume_liters=12.5,
+    )
+    trusted = row_to_schema(
+        (
+            7,
+            "SCH-20250101-0007",
+            received_at,
+            5,
+            12.5,
+            None,
+            True,
+            4,
+            received_at + timedelta(days=5),
+        )
+    )
+
+    assert trusted.model_dump() == validated.model_dump()
+    assert trusted.model_dump_json() == validated.model_dump_json()
+    assert trusted._expiry == validated._expiry
+    assert trusted._expiry.tzinfo is UTC
+    assert (trusted._is_deleted, trusted._version) == (True, 4)
+
+    copy = trusted.model_copy(update={"volume_liters": 2.5})
+    copy.update_version()
+    assert (copy.volume_liters, copy._version) == (2.5, 5)
+    assert (trusted.volume_liters, trusted._version) == (12.5, 4)
@@ -0,0 +1,190 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+
+from app.domain.batch_port import ConcurrencyError
+from app.domain.batch_service import BatchService
+from app.domain.retry_policy import RetryPolicy
+from app.observability.metrics import SHARD_REBALANCES
+from app.repositories.db.models import Batch as BatchModel
+from app.repositories.db.models import BatchShard as ShardModel
+from app.repositories.db_record_repo import DBRecordRepository
+from app.repositories.sharded_batch_repo import (
+    ShardedBatchRepository,
+    lock_batch_statement,
+    select_sharded_fefo,
+)
+from app.schemas.batches_schema import Batch
+
+
+def _create(in_request, repo, code, volume, received_at=None):
+    (batch,) = in_request(
+        lambda: repo.upsert(
+            Batch(
+                batch_code=code,
+                received_at=received_at or datetime.now(UTC),
+                volume_liters=volume,
+            )
+        )
+    )
+    return batch
+
+
+def _stored(session_factory, batch_id):
+    with session_factory() as session:
+        batch = session.get(BatchModel, batch_id)
+        shards = session.execute(
+            select(ShardModel.volume_liters, ShardModel.version)
+            .where(ShardModel.batch_id == batch_id)
+            .order_by(ShardModel.shard)
+        ).all()
+        return (batch.volume_liters, batch.version), shards
+
+
+def test_consumes_draw_from_one_shard_until_none_covers(
+    session_factory, in_request
+):
+    repo = ShardedBatchRepository(shards=4)
+    batch = _create(in_request, repo, "SCH-20250101-0001", 8.0)
+    assert _stored(session_factory, batch.id) == ((8.0, 1), [(2.0, 0)] * 4)
+
+    (first,) = in_request(lambda: repo.consume(batch.id, 1.5, None))
+    assert (first.volume_liters, first._version) == (6.5, 2)
+    row, shards = _stored(session_factory, batch.id)
+    assert row == (8.0, 1)
+    assert sorted(shards) == [(0.5, 1), (2.0, 0), (2.0, 0), (2.0, 0)]
+
+    rebalances = SHARD_REBALANCES.value()
+    (second,) = in_request(lambda: repo.consume(batch.id, 4.0, None))
+    assert (second.volume_liters, second._version) == (2.5, 3)
+    assert SHARD_REBALANCES.value() == rebalances + 1
+    assert [volume for volume, _ in _stored(session_factory, batch.id)[1]] == [
+        0.625
+    ] * 4
+
+    (refused,) = in_request(lambda: repo.consume(batch.id, 3.0, None))
+    assert refused is None
+    (read,) = in_request(lambda: repo.read_by_id(batch.id))
+    assert (read.volume_liters, read._version) == (2.5, 3)
+    assert in_request(repo.list_all_available) == [[read]]
+
+
+def test_upsert_folds_the_shards_and_splits_again(session_factory, in_request):
+    repo = ShardedBatchRepository(shards=2)
+    batch = _create(in_request, repo, "SCH-20250101-0002", 10.0)
+    (stale,) = in_request(lambda: repo.read_by_id(batch.id))
+    in_request(lambda: repo.consume(batch.id, 3.0, None))
+
+    stale.volume_liters = 1.0
+    with pytest.raises(ConcurrencyError):
+        in_request(lambda: repo.upsert(stale))
+
+    (fresh,) = in_request(lambda: repo.read_by_id(batch.id))
+    assert (fresh.volume_liters, fresh._version) == (7.0, 2)
+    fresh.volume_liters = 5.0
+    in_request(lambda: repo.upsert(fresh))
+    assert _stored(session_factory, batch.id) == (
+        (5.0, 3),
+        [(2.5, 0), (2.5, 0)],
+    )
+
+
+def test_upsert_locks_the_batch_before_its_shards(session_factory, in_request):
+    repo = ShardedBatchRepository(shards=2)
+    batch = _create(in_request, repo, "SCH-20250101-0007", 10.0)
+    (fresh,) = in_request(lambda: repo.read_by_id(batch.id))
+    selects = []
+    event.listen(
+        session_factory.kw["bind"],
+        "before_cursor_execute",
+        lambda _conn, _cursor, sql, *_: (
+            selects.append(sql.split("FROM ")[1].split()[0])
+            if sql.startswith("SELECT")
+            else None
+        ),
+    )
+
+    in_request(lambda: repo.upsert(fresh))
+
+    # The order consume_fefo locks them in, so the two cannot deadlock
+    assert selects[:2] == ["batches", "batch_shards"]
+    # NO KEY: a consume's record insert holds the row FOR KEY SHARE
+    assert str(
+        lock_batch_statement(batch.id).compile(dialect=postgresql.dialect())
+    ).endswith("FOR NO KEY UPDATE")
+    assert str(
+        select_sharded_fefo(None, None).compile(dialect=postgresql.dialect())
+    ).endswith("FOR NO KEY UPDATE OF batches")
+
+
+def test_fefo_draws_across_sharded_and_small_batches(
+    session_factory, in_request
+):
+    repo = ShardedBatchRepository(shards=4, min_liters=5.0)
+    now = datetime.now(UTC)
+    small = _create(
+        in_request,
+        repo,
+        "SCH-20250101-0003",
+        2.0,
+        received_at=now - timedelta(days=5),
+    )
+    large = _create(in_request, repo, "SCH-20250101-0004", 8.0)
+    assert _stored(session_factory, small.id)[1] == []
+
+    (records,) = in_request(lambda: repo.consume_fefo(5.0, None))
+
+    assert [(r.batch_id, r.qty) for r in records] == [
+        (small.id, 2.0),
+        (large.id, 3.0),
+    ]
+    assert _stored(session_factory, small.id)[0] == (0.0, 2)
+    assert _stored(session_factory, large.id)[1] == [
+        (1.25, 1),
+        (1.25, 0),
+        (1.25, 0),
+        (1.25, 0),
+    ]
+    available, read = in_request(
+        repo.list_all_available, lambda: repo.read_by_id(large.id)
+    )
+    assert available == [read]
+
+
+def test_fefo_conflict_rolls_back_its_draws_for_the_retry(
+    session_factory, in_request
+):
+    outrun = []
+
+    class OutrunRepository(ShardedBatchRepository):
+        def _draw_fefo(self, session, batch, qty):
+            if batch.id == large.id and not outrun:
+                outrun.append(batch.id)  # drained between scan and lock
+                return 0.0
+            return super()._draw_fefo(session, batch, qty)
+
+    repo = OutrunRepository(shards=4, min_liters=5.0)
+    service = BatchService(
+        repo,
+        DBRecordRepository(),
+        retry_policy=RetryPolicy(attempts=2, jitter=lambda: 0),
+    )
+    small = _create(
+        in_request,
+        repo,
+        "SCH-20250101-0005",
+        2.0,
+        received_at=datetime.now(UTC) - timedelta(days=5),
+    )
+    large = _create(in_request, repo, "SCH-20250101-0006", 8.0)
+
+    (records,) = in_request(lambda: service.consume_fefo(5.0, None))
+
+    assert outrun == [large.id]
+    assert [(r.batch_id, r.qty) for r in records] == [
+        (small.id, 2.0),
+        (large.id, 3.0),
+    ]
+    assert _stored(session_factory, small.id)[0] == (0.0, 2)
@@ -0,0 +1,157 @@
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import event, func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from app.domain.batch_service import BatchService
+from app.repositories.db.models import ConsumptionRecord as RecordModel
+from app.repositories.db_batch_repo import (
+    DBBatchRepository,
+    select_fefo,
+    select_for_update,
+)
+from app.repositories.db_record_repo import DBRecordRepository
+from app.schemas.batches_schema import Batch
+from app.schemas.consumption_record import ConsumptionRecord
+
+VOLUME = 100.0
+DRAW = 40.0
+
+
+class HandlerFailedError(RuntimeError):
+    pass
+
+
+def _fail():
+    raise HandlerFailedError
+
+
+def test_request_shares_one_connection_and_rolls_back_as_a_whole(
+    session_factory, in_request
+):
+    repo = DBBatchRepository()
+    (batch,) = in_request(
+        lambda: repo.upsert(
+            Batch(
+                batch_code="SCH-20250101-0001",
+                received_at=datetime.now(UTC),
+                volume_liters=VOLUME,
+            )
+        ),
+    )
+    checkouts = []
+    event.listen(
+        session_factory.kw["bind"], "checkout", lambda *_: checkouts.append(1)
+    )
+
+    with pytest.raises(HandlerFailedError):
+        in_request(
+            lambda: repo.consume(batch.id, DRAW, None),
+            lambda: repo.consume(batch.id, DRAW, None),
+            _fail,
+        )
+    _, read = in_request(
+        lambda: repo.consume(batch.id, DRAW, None),
+        lambda: repo.read_by_id(batch.id),
+    )
+
+    assert read.volume_liters == VOLUME - DRAW
+    assert checkouts == [1, 1]  # one per request
+    with session_factory() as session:
+        records = session.scalar(select(func.count(RecordModel.id)))
+    assert records == 1
+
+
+def test_pessimistic_consume_locks_the_row_it_reads(in_request):
+    repo = DBBatchRepository()
+    service = BatchService(
+        repo, DBRecordRepository(), consume_strategy="pessimistic"
+    )
+    (batch,) = in_request(
+        lambda: repo.upsert(
+            Batch(
+                batch_code="SCH-20250101-0002",
+                received_at=datetime.now(UTC),
+                volume_liters=VOLUME,
+            )
+        ),
+    )
+
+    in_request(
+        lambda: service.consume(batch.id, DRAW, None),
+        lambda: service.consume(batch.id, DRAW, None),
+    )
+    with pytest.raises(ValueError, match="available volume"):
+        in_request(lambda: service.consume(batch.id, DRAW, None))
+
+    (read,) = in_request(lambda: repo.read_by_id(batch.id))
+    assert read.volume_liters == VOLUME - 2 * DRAW
+    dialect = postgresql.dialect()
+    assert str(select_for_update(batch.id).compile(dialect=dialect)).endswith(
+        "FOR UPDATE"
+    )
+    assert str(
+        select_for_update(batch.id, nowait=True).compile(dialect=dialect)
+    ).endswith("FOR UPDATE NOWAIT")
+    assert str(
+        select_fefo(None, None, "skip_locked").compile(dialect=dialect)
+    ).endswith("FOR UPDATE SKIP LOCKED")
+
+
+def test_consume_many_is_one_update_and_one_insert(
+    session_factory, in_request
+):
+    repo = DBBatchRepository()
+    (batch,) = in_request(
+        lambda: repo.upsert(
+            Batch(
+                batch_code="SCH-20250101-0003",
+                received_at=datetime.now(UTC),
+                volume_liters=5.0,
+            )
+        ),
+    )
+    records = [
+        ConsumptionRecord(
+            batch_id=batch.id,
+            consumed_at=datetime.now(UTC),
+            order_id=None,
+            qty=qty,
+        )
+        for qty in (2.0, 4.0, 3.0)
+    ]
+    statements = []
+    event.listen(
+        session_factory.kw["bind"],
+        "before_cursor_execute",
+        lambda _conn, _cursor, sql, *_: statements.append(sql.split()[0]),
+    )
+
+    (results,) = in_request(lambda: repo.consume_many(batch.id, records))
+
+    assert [r and r.volume_liters for r in results] == [3.0, None, 0.0]
+    assert statements == ["SELECT", "UPDATE", "INSERT"]
+    with session_factory() as session:
+        qty = session.scalars(select(RecordModel.qty)).all()
+    assert qty == [2.0, 3.0]
+
+
+def test_bulk_insert_only_retries_duplicate_codes(session_factory, in_request):
+    with session_factory() as session:
+        session.execute(
+            text(
+                "CREATE TRIGGER reject_batch BEFORE INSERT ON batches "
+                "BEGIN SELECT RAISE(ABORT, 'rejected by trigger'); END"
+            )
+        )
+        session.commit()
+    batch = Batch(
+        batch_code="SCH-20250101-0009",
+        received_at=datetime.now(UTC),
+        volume_liters=1.0,
+    )
+
+    with pytest.raises(IntegrityError, match="rejected by trigger"):
+        in_request(lambda: DBBatchRepository().bulk_insert([batch]))